@@ -0,0 +1,335 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# script benchBufMan.py
+'''
+  **benchBufMan** throughput and latency benchmark of BufferMan
+
+  drives an instance of BufferMan with a synthetic data producer and
+  consumer processes of different types:
+
+    - oblig:  obligatory consumer, sees all events (mode 0)
+    - random: random consumer, requests copies of events (mode 1)
+    - mpQ:    consumer reading from a BufferMan mp-Queue
+
+  for each point of a sweep over NBuffers, NChannels, NSamples and
+  consumer mixes the following quantities are determined:
+
+    - sustained event rate (events/s)
+    - dispatch latency (time of trigger to arrival at consumer),
+      mean and percentiles per consumer type
+    - dead-time fraction of the data acquisition, i.e. the fraction of
+      time the producer is not ready to accept triggers
+    - CPU time per process (producer, manageDataBuffer, consumers)
+
+  results are written as JSON, and are compared to a baseline file
+  if given; differences larger than the tolerance are flagged
+  as regressions.
+
+  usage: benchBufMan.py [-c benchConfig.yaml] [-o results.json]
+                        [-b baseline.json] [-t tolerance]
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import sys, os, time, platform, json, argparse, itertools
+import threading, yaml, numpy as np
+import multiprocessing as mp
+
+# import BufferMan from the parent directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..') )
+import picodaqa
+import picodaqa.BufferMan as BMan
+
+# --------------------------------------------------------------
+
+class SynthDev(object):
+  '''
+  synthetic data producer with the interface of PSconfig used by BufferMan
+
+    triggers are Poisson-distributed with mean rate "rate",
+    free running at maximum speed if rate is 0
+  '''
+
+  def __init__(self, NChannels, NSamples, rate=0.):
+    self.NChannels = NChannels
+    self.NSamples = NSamples
+    self.TSampling = 1E-8
+    self.NSegments = 1
+    self.rate = rate
+    self.ADCscale = [1./32512 for i in range(NChannels)]
+    self.ADCoffset = [0. for i in range(NChannels)]
+    self.OscConfDict = {}
+    # waveform copied to each buffer, noise on top of a pulse
+    self.pattern = np.random.normal(0., 0.002, (NChannels, NSamples))
+    self.pattern[:, NSamples//20:NSamples//20+10] -= 0.035
+    self.tnext = 0.
+    self.tdead = 0.   # time spent outside of acquireDataBM
+    self.tret = None  # time of last return
+
+  def setBufferManagerPointer(self, BM):
+    self.BM = BM
+
+  def acquireDataBM(self, buffer):
+    '''fill buffer with synthetic data,
+       Returns: time of trigger and life time'''
+    ti = time.time()
+    if self.tret is not None: self.tdead += ti - self.tret
+    if self.rate > 0.:
+      if self.tnext < ti: self.tnext = ti   # dead time, triggers lost
+      self.tnext += np.random.exponential(1./self.rate)
+      while time.time() < self.tnext:   # wait for trigger
+        if not self.BM.ACTIVE.value: return None
+        dt = self.tnext - time.time()
+        if dt > 0.001: time.sleep(dt - 0.0005)
+    ttrg = time.time()
+    buffer[:] = self.pattern
+    self.tret = time.time()
+    return ttrg, ttrg - ti
+# - end class SynthDev
+
+# --------------------------------------------------------------
+#   consumers, run as sub-processes, return results via resQ
+
+def cpuTime(pid=None):
+  '''user and system CPU time (s) of a process, None if unavailable'''
+  if pid is None:
+    t = os.times()
+    return t[0] + t[1]
+  try:  # linux only
+    with open('/proc/%i/stat' % pid) as f:
+      fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+  except Exception:
+    return None
+
+def latencyStats(lat):
+  '''mean and percentiles of latencies (in ms)'''
+  if not len(lat): return {}
+  lat = 1E3 * np.asarray(lat)
+  p = np.percentile(lat, [50., 90., 99., 100.])
+  return {'mean': float(lat.mean()), 'p50': float(p[0]),
+          'p90': float(p[1]), 'p99': float(p[2]), 'max': float(p[3])}
+
+def benchConsumer(BM, cId, ctype, resQ, tproc=0.):
+  '''
+    obligatory or random consumer, records dispatch latency
+
+      Args:
+        BM:     Buffer Manager instance
+        cId:    client id
+        ctype:  'oblig' or 'random'
+        resQ:   multiprocessing Queue for results
+        tproc:  mean processing time per event (s)
+  '''
+  mode = 0 if ctype == 'oblig' else 1
+  lat = []
+  evcnt = 0
+  cpu0 = cpuTime()
+  while BM.ACTIVE.value:
+    e = BM.getEvent(cId, mode=mode)
+    if e == None: break
+    lat.append(time.time() - BM.BMT0.value - e[1])
+    evcnt += 1
+    if tproc > 0.: time.sleep(np.random.exponential(tproc))
+  resQ.put({'type': ctype, 'events': evcnt, 'cpu': cpuTime() - cpu0,
+            'latency': latencyStats(lat)})
+
+def benchQConsumer(BM, Q, resQ, tproc=0.):
+  '''consumer reading events from BufferMan mp-Queue'''
+  lat = []
+  evcnt = 0
+  cpu0 = cpuTime()
+  while BM.ACTIVE.value:
+    e = Q.get()
+    if e == None: break
+    lat.append(time.time() - BM.BMT0.value - e[1])
+    evcnt += 1
+    if tproc > 0.: time.sleep(np.random.exponential(tproc))
+  resQ.put({'type': 'mpQ', 'events': evcnt, 'cpu': cpuTime() - cpu0,
+            'latency': latencyStats(lat)})
+
+# --------------------------------------------------------------
+
+def runPoint(NBuffers, NChannels, NSamples, consumers,
+             duration=3., rate=0., tproc=0., dataType='float32'):
+  '''
+    run BufferMan with one configuration
+
+      Returns: dictionary with results
+  '''
+  dev = SynthDev(NChannels, NSamples, rate)
+  BMdict = {'NBuffers': NBuffers, 'BMmodules': [], 'verbose': 0,
+            'logTime': 2*duration, 'dataType': dataType}
+  BM = BMan.BufferMan(BMdict, dev)
+  dev.setBufferManagerPointer(BM)
+
+  # register consumers (must be done before sub-processes are started)
+  resQ = mp.Queue()
+  procs = []
+  for ctype in consumers:
+    if ctype == 'mpQ':
+      cId, Q = BM.BMregister_mpQ()
+      procs.append(mp.Process(name=ctype, target=benchQConsumer,
+                              args=(BM, Q, resQ, tproc) ) )
+    elif ctype == 'oblig' or ctype == 'random':
+      cId = BM.BMregister()
+      procs.append(mp.Process(name=ctype, target=benchConsumer,
+                              args=(BM, cId, ctype, resQ, tproc) ) )
+    else:
+      print('!!! benchBufMan: unknown consumer type ' + ctype)
+      sys.exit(1)
+
+  # start producer thread (as in BufferMan.start(), but without GUI)
+  BM.ACTIVE.value = True
+  BM.runStarted = False
+  BM.start_manageDataBuffer = True
+  thr = threading.Thread(target=BM.acquireData)
+  thr.daemon = True
+  thr.start()
+  for prc in procs: prc.start()
+  cpu0 = cpuTime()
+  BM.run()
+  tstart = time.time()
+  time.sleep(duration)
+
+  # collect statistics before ending
+  BM.RUNNING.value = False
+  trun = time.time() - tstart
+  Ntrig = BM.Ntrig.value
+  deadFrac = dev.tdead/trun  # producer not ready for triggers
+  lifeFrac = BM.Tlife.value/trun  # producer waiting for triggers
+  cpuProd = cpuTime() - cpu0
+  cpuMan = cpuTime(BM.procs[-1].pid)
+  BM.ACTIVE.value = False
+
+  results = []
+  for prc in procs:
+    try:
+      results.append(resQ.get(timeout=5.) )
+    except Exception:
+      pass
+  for prc in procs + BM.procs:
+    prc.join(1.)
+    if prc.is_alive(): prc.terminate()
+
+  cTypes = {}  # summary per consumer type
+  for r in results:
+    cTypes.setdefault(r['type'], []).append(r)
+  return {'config': {'NBuffers': NBuffers, 'NChannels': NChannels,
+                     'NSamples': NSamples, 'consumers': list(consumers),
+                     'rate': rate, 'tproc': tproc, 'dataType': dataType},
+          'events': Ntrig,
+          'rate': Ntrig/trun,
+          'deadFrac': deadFrac,
+          'lifeFrac': lifeFrac,
+          'cpu': {'producer': cpuProd, 'manageDataBuffer': cpuMan},
+          'consumers': cTypes}
+
+def pointKey(cfg):
+  '''unique key of a configuration, to compare with baseline'''
+  return '%i/%i/%i/%s/%s/%s/%s' % (cfg['NBuffers'], cfg['NChannels'],
+    cfg['NSamples'], '+'.join(cfg['consumers']), cfg['rate'],
+    cfg['tproc'], cfg['dataType'])
+
+def compareBaseline(results, baseline, tol):
+  '''
+    compare event rates and latency percentiles with a baseline
+
+      Returns: list of regressions
+  '''
+  bpoints = dict((pointKey(p['config']), p) for p in baseline['points'])
+  regressions = []
+  for p in results['points']:
+    key = pointKey(p['config'])
+    if key not in bpoints: continue
+    b = bpoints[key]
+    if p['rate'] < (1. - tol) * b['rate']:
+      regressions.append('%s: rate %.4g < %.4g'%(key, p['rate'], b['rate']))
+    for ctype in p['consumers']:
+      if ctype not in b['consumers']: continue
+      for c, bc in zip(p['consumers'][ctype], b['consumers'][ctype]):
+        if not c['latency'] or not bc['latency']: continue
+        if c['latency']['p99'] > (1. + tol) * bc['latency']['p99']:
+          regressions.append('%s: %s latency p99 %.3gms > %.3gms'%(key,
+             ctype, c['latency']['p99'], bc['latency']['p99']) )
+  return regressions
+
+def printPoint(p):
+  cfg = p['config']
+  print('  %3i bufs %i x %5i samples  %-22s %8.0f ev/s  dead %5.1f%%' %
+    (cfg['NBuffers'], cfg['NChannels'], cfg['NSamples'],
+     '+'.join(cfg['consumers']), p['rate'], 100.*p['deadFrac']) )
+  print('      cpu producer %.2fs  manageDataBuffer %s' % (
+     p['cpu']['producer'], '%.2fs' % p['cpu']['manageDataBuffer']
+     if p['cpu']['manageDataBuffer'] is not None else 'n.a.') )
+  for ctype, cl in sorted(p['consumers'].items()):
+    for c in cl:
+      l = c['latency']
+      if l:
+        print('      %-6s %8i ev  latency p50 %.3gms p99 %.3gms  cpu %.2fs'%
+          (ctype, c['events'], l['p50'], l['p99'], c['cpu']) )
+
+if __name__ == "__main__": # - - - - - - - - - - - - - - - - - - - - - -
+
+  parser = argparse.ArgumentParser(description='BufferMan benchmark')
+  parser.add_argument('-c', '--config', default=os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchConfig.yaml'),
+    help='yaml file defining the sweep')
+  parser.add_argument('-o', '--output', default='benchBufMan.json',
+    help='output file (JSON)')
+  parser.add_argument('-b', '--baseline', default=None,
+    help='baseline results to compare with (JSON)')
+  parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+    help='relative tolerance before flagging a regression')
+  args = parser.parse_args()
+
+  with open(args.config) as f:
+    bconf = yaml.safe_load(f)
+  if "duration" in bconf:
+    duration = bconf["duration"]  # duration of each point (s)
+  else:
+    duration = 3.
+  if "rate" in bconf:
+    rate = bconf["rate"]          # trigger rate, 0: free running
+  else:
+    rate = 0.
+  if "tproc" in bconf:
+    tproc = bconf["tproc"]        # processing time per event in consumers
+  else:
+    tproc = 0.
+  if "dataType" in bconf:
+    dataType = bconf["dataType"]
+  else:
+    dataType = 'float32'
+  sweep = bconf["sweep"]
+
+  results = {'picodaqa': picodaqa.__version__,
+             'python': platform.python_version(),
+             'platform': platform.platform(),
+             'cpus': mp.cpu_count(),
+             'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+             'points': []}
+  print('*==* benchBufMan: %i s per point'%(duration) )
+  for NBuffers, NChannels, NSamples, consumers in itertools.product(
+        sweep['NBuffers'], sweep['NChannels'], sweep['NSamples'],
+        sweep['consumers']):
+    p = runPoint(NBuffers, NChannels, NSamples, consumers,
+                 duration, rate, tproc, dataType)
+    printPoint(p)
+    results['points'].append(p)
+
+  with open(args.output, 'w') as f:
+    json.dump(results, f, indent=1, sort_keys=True)
+  print('*==* benchBufMan: results written to ' + args.output)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = compareBaseline(results, baseline, args.tolerance)
+    if regressions:
+      print('!!! regressions w.r.t. ' + args.baseline)
+      for r in regressions: print('    ' + r)
+      sys.exit(1)
+    print('*==* no regressions w.r.t. ' + args.baseline)
@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import time, numpy as np
+import sys, time, numpy as np
 
 # - - - - some examples of consumers connected to BufferManager- - - - 
 
@@ -36,6 +36,38 @@ def obligConsumer(BM, cId):
   return
 #-end def obligComsumer
 
+def leaseConsumer(BM, cId, NLeases=4):
+  '''
+    obligatory consumer holding several events at a time
+      - leases up to NLeases events and processes them out of order, 
+        each event is released independently when done
+
+      Args:  
+        BM:   Buffer Manager instance
+        cId:  Buffer Manager client id, registered with maxLeases=NLeases
+        NLeases: number of events held concurrently
+  '''
+
+  if not BM.ACTIVE.value: sys.exit(1)
+
+  evcnt=0
+  leases = []
+  while BM.ACTIVE.value:
+    while len(leases) < NLeases: # check out events 
+      e = BM.leaseEvent(cId)
+      if e == None: return
+      leases.append(e)
+# process a randomly chosen event and release it
+    handle, evNr, evtime, evData = leases.pop(np.random.randint(len(leases)))
+    evcnt+=1
+    print('*==* leaseConsumer: event Nr %i, %i events seen'%(evNr,evcnt))
+    BM.releaseEvent(cId, handle)
+
+#    introduce random wait time to mimick processing activity
+    time.sleep(-0.25 * np.log(np.random.uniform(0.,1.)) )
+  return
+#-end def leaseConsumer
+
 def randConsumer(BM, cId):
   '''
     test readout speed: 
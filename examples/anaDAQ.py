@@ -7,8 +7,8 @@
 
 # ->>> code from here inserted as 'anaDAQ.py' in runDAQ.py
 
-from picodaqa.mpBDisplay import mpBDisplay
-from picodaqa.mpHists import mpHists
+import multiprocessing as mp
+from picodaqa.SharedHists import SharedHists
 
 # import analysis code as library
 from pulseFilter import *
@@ -29,14 +29,13 @@ if pFconfdict:
 filtRateQ = None
 if 'RMeter' in pFmodules:
   filtRateQ = mp.Queue(1) # information queue for Filter
-  procs.append(mp.Process(name='RMeter',
-          target = mpRMeter, 
-          args=(filtRateQ, 12., 2500., 'muon rate history') ) )
-#               mp.Queue  rate  update interval          
+  prc = BM.addDisplay('RMeter', 'mpRMeter', 
+          (filtRateQ, 12., 2500., 'muon rate history') )
+#          mp.Queue  rate  update interval          
+  if prc is not None: procs.append(prc)
 
-histQ = None
+hists = None
 if 'Hists' in pFmodules:
-  histQ = mp.Queue(1) # information queue for Filter
 #  book histograms and start histogrammer
   Hdescriptors = []
   Hdescriptors.append([0., 0.4, 50, 20., 'noise Trg. Pulse (V)', 0] )
@@ -44,35 +43,40 @@ if 'Hists' in pFmodules:
   Hdescriptors.append([0., 0.8, 50, 15., 'valid Trg. Pulse (V)', 0] )
   Hdescriptors.append([0., 0.8, 50, 15., 'Pulse height (V)', 0] )
   Hdescriptors.append([0., 15., 45, 7.5, 'Tau (µs)', 1] )
-  procs.append(mp.Process(name='Hists',
-          target = mpHists, 
-          args=(histQ, Hdescriptors, 2000., 'Filter Histograms') ) )
-#             data Queue, Hist.Desrc  interval    
+  hists = SharedHists(Hdescriptors) # filled by pulseFilter
+  prc = BM.addDisplay('Hists', 'mpHists', 
+          (hists, Hdescriptors, 2000., 'Filter Histograms') )
+#      shared hists, Hist.Desrc  interval    
+  if prc is not None: procs.append(prc)
 
 VSigQ = None
 if 'Display' in pFmodules:
   VSigQ = mp.Queue(1) # information queue for Filter
   mode = 2 # 0:signed, 1: abs. 2: symmetric
   size = 1. # stretch factor for display
-  procs.append(mp.Process(name = 'ChannelSignals',
-          target = mpBDisplay, 
-          args=(VSigQ, PSconf, mode, size, 'Panel Signals') ) )
-#               mp.Queue Chan.Conf.           name          
+  prc = BM.addDisplay('ChannelSignals', 'mpBDisplay', 
+          (VSigQ, PSconf, mode, size, 'Panel Signals') )
+#          mp.Queue Chan.Conf.           name          
+  if prc is not None: procs.append(prc)
 
 # run pulse analysis
-cId = BM.BMregister() # get a Buffer Manager Client Id
+if pFconfdict and 'batchSize' in pFconfdict:
+  NBatch = pFconfdict['batchSize'] # events leased and analysed together
+else:
+  NBatch = 8
+cId = BM.BMregister(maxLeases=NBatch) # get a Buffer Manager Client Id
 
   # pulse analysis as thread
 #thrds.append(threading.Thread(target=pulseFilter,
-#      args = ( BM, PSconf, cId, filtRateQ, histQ, VSigQ, True, 1) ) )
-#                      BMclientId  RMeterQ  histQ  fileout verbose    
+#      args = ( BM, PSconf, cId, filtRateQ, hists, VSigQ, True, 1) ) )
+#                      BMclientId  RMeterQ  hists  fileout verbose    
 
   # pulse analysis as sub-process
 procs.append(mp.Process(name='pulseFilter', target=pulseFilter, 
-       args = ( BM, cId, pFconfdict, filtRateQ, histQ, VSigQ, True, 1) ) )
-#              BMclientId  config    RMeterQ  histQ  fileout verbose    
+       args = ( BM, cId, pFconfdict, filtRateQ, hists, VSigQ, True, 1) ) )
+#              BMclientId  config    RMeterQ  hists  fileout verbose    
 
 #   could also run this in main thread
-#pulseFilter( BM, PSconf, cId, filtRateQ, histQ, VSigQ, True, 1)  
+#pulseFilter( BM, PSconf, cId, filtRateQ, hists, VSigQ, True, 1)  
 
 # <<< - end of inserted code
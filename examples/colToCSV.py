@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# script colToCSV.py
+'''
+  convert binary column files (e.g. logFile of pulseFilter, 
+  see picodaqa.ColumnFile) to CSV 
+
+  usage: colToCSV.py <file.col> [<file.col> ...]
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import sys
+
+from picodaqa.ColumnFile import toCSV
+
+if __name__ == "__main__": # -----------------------------
+
+  if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+  for fnam in sys.argv[1:]:
+    try:
+      print('*= ' + fnam + ' -> ' + toCSV(fnam))
+    except Exception as e:
+      print('     failed to convert file ' + fnam + ': ' + str(e))
+      sys.exit(1)
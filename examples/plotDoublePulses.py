@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt, matplotlib.animation as anim
 
 # animated displays running as background processes/threads
 from picodaqa.Oscilloscope import *
+from picodaqa.EventFile import EventFileReader, isEventFile
 
 def yieldEvt():
   cnt = 0
@@ -31,23 +32,29 @@ if __name__ == "__main__": # -----------------------------
   if len(sys.argv)==2:
     fnam = sys.argv[1]
   else: 
-    fnam = 'rawDPtest.dat'
+    fnam = 'rawDPtest.evt'
   print('    input from file ' + fnam)
   try:
-    with open(fnam) as f:
-      print("*= loading data")
-      obj = yaml.load(f)
+    if isEventFile(fnam): # binary event file, memory mapped
+      evf = EventFileReader(fnam)
+      data = (evf.toVolts(d) for evNr, evTime, d in evf)
+      Ndat = len(evf)
+      conf = evf.OscConf
+    else:  # old format: yaml text file
+      with open(fnam) as f:
+        print("*= loading data")
+        obj = yaml.load(f)
+      data = obj['data']
+      Ndat = len(data)
+      conf = obj['OscConf']
   except:
     print('     failed to read input file ' + fnam)
     exit(1)
 
-  data = obj['data']
-  Ndat = len(data)
   print("*= %i data sets found"%(Ndat) )
   
   plt.ion()  
   print("*= start animation")
-  conf = obj['OscConf']
   Osci = Oscilloscope(conf, 'DoublePulse') 
   figOs = Osci.fig
   twait = 0.5  # time between figure updates in s
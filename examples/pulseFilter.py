@@ -1,12 +1,19 @@
 from __future__ import print_function,division,absolute_import,unicode_literals
 
-import sys, os, time, yaml, numpy as np
-from scipy.signal import argrelmax
+import sys, os, time, numpy as np
+from numpy.lib.stride_tricks import as_strided
+try:
+  from scipy import fft as fftpack # supports float32
+except ImportError:
+  from numpy import fft as fftpack
 from scipy.interpolate import interp1d
-from multiprocessing import Queue
+from multiprocessing import Queue, Process
+if sys.version_info[0] < 3:
+  from Queue import Empty
+else:
+  from queue import Empty
 
-# animated displays running as background processes/threads
-from picodaqa.Oscilloscope import *
+from picodaqa.ColumnFile import ColumnFileWriter
 
   # helper function to generate general unipolar or bipolar template
 def trapezoidPulse(t, tr, ton, tf, tf2=0, toff=0., tr2=0., mode=0):
@@ -32,14 +39,11 @@ def trapezoidPulse(t, tr, ton, tf, tf2=0, toff=0., tr2=0., mode=0):
   if mode: # for bipolar pulse
   # normalize neg. pulse to same integral as positive part
     voff = -(0.5*(tr+tf)+ton) / (0.5*(tf2+tr2)+toff) 
-    ti = ti.append(tr+ton+tf+tf2)
-    ri = ri.append(voff) 
-    ti = ti.append(tr+ton+tf+tf2+toff)
-    ri = ri.append(voff) 
-    ti = ti.append(tr+ton+tf+tf2+toff+tr2)
-    ri = ri.append(0.) 
-
-  fpulse = interp1d(ti, ri, kind='linear', copy=False, assume_sorted= True)
+    ti += [tr+ton+tf+tf2, tr+ton+tf+tf2+toff, tr+ton+tf+tf2+toff+tr2]
+    ri += [voff, voff, 0.]
+
+  fpulse = interp1d(ti, ri, kind='linear', copy=False, assume_sorted= True,
+                    bounds_error=False, fill_value=0.)
   return fpulse(t)
 
 def setRefPulse(dT, taur=20E-9, tauon=12E-9, tauf=128E-9, mode=0,
@@ -50,19 +54,718 @@ def setRefPulse(dT, taur=20E-9, tauon=12E-9, tauf=128E-9, mode=0,
       time step
       rise time in sec
       fall-off time in sec
-      pulse height in Volt
       mode : 0 uni-polar  1 bi-polar
+      fall, off and rise time of negative part of bi-polar pulse
+      pulse height in Volt
   '''
   tp = taur + tauon + tauf
+  if mode: tp += tauf2 + tauoff + taur2
   l = np.int32( tp/dT +0.5 ) + 1  
   ti = np.linspace(0, tp, l)    
-  rp = trapezoidPulse(ti, taur, tauon, tauf, mode) # uni-polar pulse
+  rp = trapezoidPulse(ti, taur, tauon, tauf, 
+                      tauf2, tauoff, taur2, mode=mode)
   rp = pheight * rp   # normalize to pulse height
 
   return rp
 
+class FFTCorrelator(object):
+  '''
+  cross-correlation of a stack of waveforms with a reference pulse 
+    in one pass, using FFTs with overlap-save; the FFT of the 
+    reference pulse is computed once and cached
+
+    correlate(data) is equivalent to np.correlate(x, refp, mode='valid')
+    for all traces x along the last axis of data
+
+    a bank of reference pulses, given as 2d array (zero-padded to 
+    common length), is evaluated with a single FFT of the data
+  '''
+
+  def __init__(self, refp, nfft=None):
+    '''Args: 
+         refp: reference pulse, or 2d array of reference pulses
+         nfft: length of FFT blocks, default 8 times length of refp
+    '''
+    refp = np.asarray(refp, dtype=np.float32)
+    self.bank = refp.ndim == 2
+    self.lref = refp.shape[-1]
+    if nfft is None:
+      nfft = 2**int(np.ceil(np.log2(8 * self.lref)))
+    self.nfft = nfft
+    self.L = nfft - self.lref + 1 # valid output samples per block
+    # cached FFT of reference (single precision, as data in buffers)
+    self.Rf = np.conj(fftpack.rfft(refp, nfft))
+    if self.bank: 
+      self.Rf = self.Rf[:, None, :] # broadcast over blocks
+
+  def correlate(self, data):
+    '''
+      Args: waveforms, shape (..., NSamples), e.g. NEvents x NChan x NSamples
+      Returns: correlation, shape (..., NSamples - len(refp) + 1),
+               for a bank of reference pulses 
+               shape (..., NRefPulses, NSamples - len(refp) + 1)
+    '''
+    shp = data.shape[:-1]
+    nout = data.shape[-1] - self.lref + 1
+    nb = -(-nout // self.L)  # number of blocks
+    x = np.zeros(shp + ((nb-1) * self.L + self.nfft,), dtype=np.float32)
+    x[..., :data.shape[-1]] = data
+    # overlapping blocks as strided view, shifted by L
+    blocks = as_strided(x, shape=shp + (nb, self.nfft), 
+                        strides=x.strides[:-1] + (self.L * x.strides[-1], 
+                                                  x.strides[-1]) )
+    Xf = fftpack.rfft(blocks)
+    if self.bank:
+      Xf = Xf[..., None, :, :]  # new axis for reference pulses
+      shp += (self.Rf.shape[0],)
+    c = fftpack.irfft(Xf * self.Rf, self.nfft)[..., :self.L]
+    return c.reshape(shp + (nb * self.L,))[..., :nout]
+
+  @staticmethod
+  def peaks(cor, thr):
+    '''
+      local maxima of correlation above threshold
+
+      Returns: tuple of index arrays (as from np.nonzero) 
+               and correlation values at maxima
+    '''
+    m = np.zeros(cor.shape, dtype=bool)
+    c = cor[..., 1:-1]
+    m[..., 1:-1] = (c > thr) & (c > cor[..., :-2]) & (c > cor[..., 2:])
+    idx = np.nonzero(m)
+    return idx, cor[idx]
+# - end class FFTCorrelator
+
+# properties of accepted pulses, as returned by validatePulses
+pulseType = np.dtype([('iC', np.int32),   # channel 
+                      ('id', np.int32),   # index of pulse start
+                      ('V', np.float32),  # pulse height (Volt)
+                      ('cor', np.float32), # correlation / threshold
+                      ('iRef', np.int32)]) # best-matching reference pulse
+
+def validatePulses(evData, iC, id, cor, iRef, refpms, pthrms):
+  '''
+  check pulse shape of all candidates at once by requesting 
+    match with mean-subtracted reference pulse
+
+    Args:
+      evData: waveforms, NChan x NSamples
+      iC, id: channel and index of pulse candidates 
+      cor: normalised correlation of candidates
+      iRef: best-matching reference pulse of candidates
+      refpms: mean-subtracted reference pulses
+      pthrms: norms of mean-subtracted reference pulses
+
+    Returns: 
+      structured array (pulseType) of accepted pulses, 
+      ordered as candidates
+  '''
+  acc = np.zeros(len(id), dtype=bool)
+  V = np.zeros(len(id), dtype=np.float32)
+  for k, rpm in enumerate(refpms):
+    ik = np.nonzero(iRef == k)[0]
+    if not len(ik): continue
+    l = len(rpm)
+    # all windows of length l as strided view, NChan x NWindows x l
+    win = as_strided(evData, 
+            shape=(evData.shape[0], evData.shape[1] - l + 1, l),
+            strides=evData.strides + evData.strides[-1:] )
+    w = win[iC[ik], id[ik]]  # copy of candidate windows
+    w -= w.mean(axis=1, keepdims=True) # center around zero
+    acc[ik] = np.sum(w * rpm, axis=1) > pthrms[k]
+    V[ik] = np.max(np.abs(win[iC[ik], id[ik]]), axis=1)
+  pulses = np.zeros(np.count_nonzero(acc), dtype=pulseType)
+  pulses['iC'] = iC[acc]
+  pulses['id'] = id[acc]
+  pulses['V'] = V[acc]
+  pulses['cor'] = cor[acc]
+  pulses['iRef'] = iRef[acc]
+  return pulses
+
+def logTypes(NChan):
+  '''
+  row types of binary logFile (accepted events) and logFile2 
+    (double pulses); pulse times in musec, relative to event time 
+    for channels with pulse, V2/T2 and V3/T3: 2nd and 3rd pulse 
+
+    Returns: numpy structured types 
+  '''
+  accType = np.dtype([('evNr', np.int32), ('evTime', np.float64),
+                      ('tevt', np.float32), ('Ncoinc', np.int8), 
+                      ('V', np.float32, (NChan,)), ('T', np.float32, (NChan,)),
+                      ('iRef', np.int8, (NChan,)),
+                      ('V2', np.float32, (NChan,)), 
+                      ('T2', np.float32, (NChan,)), 
+                      ('iRef2', np.int8, (NChan,)),
+                      ('V3', np.float32, (NChan,)), 
+                      ('T3', np.float32, (NChan,)) ])
+  dpType = np.dtype([('Nacc', np.int32), ('Ndble', np.int32), 
+                     ('evNr', np.int32), ('tau', np.float32), 
+                     ('delT', np.float32, (NChan,)), 
+                     ('V', np.float32, (NChan,)) ])
+  return accType, dpType
+
+def openLogFiles(logFile, logFile2, logFormat, NChan, confDict, tag=''):
+  '''
+  open log files of accepted events and double pulses
+
+    Args:
+      logFile, logFile2: file names without extension, or None
+      logFormat: text (.dat) or binary (.col, see logTypes)
+      NChan: number of channels
+      confDict: configuration of pulseFilter, stored in binary files 
+      tag: added to file names, e.g. date and time
+
+    Returns: text files or ColumnFileWriters (None if not wanted)
+  '''
+  if logFormat == 'binary': # columns in blocks, see picodaqa.ColumnFile
+    accType, dpType = logTypes(NChan)
+  if logFile is not None and logFormat == 'binary':
+    logf = ColumnFileWriter(logFile + tag + '.col', accType,
+                            userConf={'pFConf': confDict})
+  elif logFile is not None:
+    logf = open(logFile + tag + '.dat', 'w')
+    print("# EvNr, EvT, Vs ...., Ts ...T" + 
+          (",  iRef ..." if len(confDict['pulseShape']) > 1 else ""), 
+      file=logf) # header line
+  else:
+    logf = None
+
+  if logFile2 is not None and logFormat == 'binary':
+    logf2 = ColumnFileWriter(logFile2 + tag + '.col', dpType,
+                             userConf={'pFConf': confDict}, blockSize=256)
+  elif logFile2 is not None:
+    logf2 = open(logFile2 + tag + '.dat', 'w', 1)
+    print("# Nacc, Ndble, Tau, delT(iChan), ... V(iChan)", 
+      file=logf2) # header line 
+  else:
+    logf2 = None
+  return logf, logf2
+
+def setupAnalysis(OscConf, refPulseDicts, verbose=1, prlog=print):
+  '''
+  set up reference pulses, thresholds and matched filter bank
+
+    Args:
+      OscConf: oscilloscope configuration (as PSconfig.OscConfDict)
+      refPulseDicts: list of pulse shapes (see setRefPulse)
+
+    Returns: dictionary of analysis parameters for analyseEvent
+  '''
+# relevant configuration parameters of oscilloscope
+  dT = OscConf['TSampling'] # get sampling interval
+  idTprec = 2 # precision on time resolution of pulse search 
+  idT0 = int(OscConf['NSamples'] * OscConf['pretrig']) # index of trigger T0
+  iCtrg = -1
+  for i, C in enumerate(OscConf['Channels']):   
+    if C == OscConf['trgChan']: 
+      iCtrg = i       # number of trigger Channel
+      break
+
+# generate reference pulses, one for each entry in pulseShape
+  refps = [setRefPulse(dT, **d) for d in refPulseDicts]
+  NRef = len(refps)
+  if verbose:
+    print('pF: pulse parameters set')
+    for d in refPulseDicts:
+      print('  taur: %.3g, tauon: %.3g, tauf: %.3g, height: %.3g'\
+          %(d['taur'], d['tauon'], d['tauf'], d['pheight']) )
+  # search windows around trigger cover all reference pulses
+  taur = max([d['taur'] for d in refPulseDicts])
+  tauon = max([d['taur'] + d['tauon'] for d in refPulseDicts]) - taur
+  refpms = [rp - rp.mean() for rp in refps] # mean subtracted
+  lrefs = [len(rp) for rp in refps]
+
+# calculate thresholds for correlation analysis
+  pthrs = np.array([np.sum(rp * rp) for rp in refps]) # norm of ref. pulses
+  pthrms = [np.sum(rpm * rpm) for rpm in refpms] # norm of mean-subtracted
+  if verbose > 1:
+    prlog('*==* pulse Filter: reference pulses')
+    for rp, pthr, pthrm in zip(refps, pthrs, pthrms):
+      prlog(np.array_str(rp) )
+      prlog('  thresholds: %.2g, %2g ' %(pthr, pthrm))
+
+# matched filter bank for batches of events, reference pulses 
+#   zero-padded to common length
+  refBank = np.zeros( (NRef, max(lrefs)) )
+  for k, rp in enumerate(refps): refBank[k, :len(rp)] = rp
+  FFTcor = FFTCorrelator(refBank)
+
+  return {'dT':dT, 'idT0':idT0, 'idTprec':idTprec, 'iCtrg':iCtrg, 
+          'taur':taur, 'tauon':tauon, 'NRef':NRef, 'lrefs':lrefs, 
+          'refpms':refpms, 'pthrs':pthrs, 'pthrms':pthrms, 
+          'FFTcor':FFTcor, 'keepRaw':False}
+
+def analyseEvent(evData, evCor, evRef, pars):
+  '''
+  pulse analysis of one event 
+
+    Args:
+      evData: waveforms in Volt, NChan x NSamples
+      evCor: correlation with best-matching reference pulse, 
+             normalised to its threshold
+      evRef: index of best-matching reference pulse
+      pars: dictionary of analysis parameters, see setupAnalysis
+
+    Returns:
+      dictionary with results: flags validated, accepted, doublePulse,
+      signal heights for histograms, pulse heights (VSig), times (TSig)
+      and reference pulses (KSig) per channel, number of coincidences 
+      and event time; for double pulses time differences and heights
+  '''
+  dT = pars['dT']
+  idT0 = pars['idT0']
+  idTprec = pars['idTprec']
+  iCtrg = pars['iCtrg']
+  taur = pars['taur']
+  tauon = pars['tauon']
+  lrefs = pars['lrefs']
+  refpms = pars['refpms']
+  pthrms = pars['pthrms']
+  NChan = evData.shape[0]
+
+  r = {'validated':False, 'accepted':False, 'doublePulse':False,
+       'Vnoise':None, 'Vtrg':None, 'hVSigs':[], 'iRefs':[] }
+
+# find signal candidates by convoluting signal with reference pulse
+#   data structure to collect properties of selected pulses:
+  VSig = [ [0., 0.] for i in range(NChan)]  # signal height in Volts
+  TSig = [ [0., 0.] for i in range(NChan)]  # time of valid pulse
+  KSig = [ [-1, -1] for i in range(NChan)] # best-matching ref. pulse
+
+# 1. validate trigger pulse
+  if iCtrg >= 0:  
+    offset = max(0, idT0 - int(taur/dT) - idTprec)
+    # set all values below threshold to threshold
+    cort = np.maximum(evCor[iCtrg, offset:idT0+idTprec+1], 1.)
+    idtr = np.argmax(cort) + offset # index of 1st maximum 
+    if idtr > idT0 + (taur + tauon)/dT + idTprec:
+      r['Vnoise'] = 0.
+      return r # no pulse near trigger, skip rest of event analysis
+  # check pulse shape by requesting match with time-averaged pulse
+    k = evRef[iCtrg, idtr]  # best-matching reference pulse
+    lref = lrefs[k]
+    evdt = evData[iCtrg, idtr:idtr+lref]
+    evdtm = evdt - evdt.mean()  # center signal candidate around zero
+    cc = np.sum(evdtm * refpms[k]) # convolution with mean-corrected ref.
+    if cc > pthrms[k]:
+      r['validated'] = True # valid trigger pulse found, store
+      r['iRefs'].append(k)
+      KSig[iCtrg][0] = k
+      V = max(abs(evdt)) # signal Voltage  
+      VSig[iCtrg][0] = V 
+      r['Vtrg'] = V
+      T = idtr*dT*1E6      # signal time in musec
+      TSig[iCtrg][0] = T 
+      tevt = T  # time of event
+    else:   # no valid trigger
+      r['Vnoise'] = max(abs(evdt))
+      return r # skip rest of event analysis
+
+# 2. find coincidences
+  Ncoinc = 1
+  for iC in range(NChan):
+    if iC != iCtrg:
+      offset = max(0, idtr - idTprec)  # search around trigger pulse
+  #  analyse channel to find pulse near trigger
+      # set all values below threshold to threshold
+      cor = np.maximum(evCor[iC, offset:idT0+idTprec+1], 1.)
+      id = np.argmax(cor)+offset # find index of (1st) maximum 
+      if id > idT0 + (taur + tauon)/dT + idTprec:
+        continue # no pulse near trigger, skip
+      k = evRef[iC, id]
+      evd = evData[iC, id:id+lrefs[k]]
+      evdm = evd - evd.mean()  # center signal candidate around zero
+      cc = np.sum(evdm * refpms[k]) # convolution with mean-corrected ref.
+      if cc > pthrms[k]:
+        r['iRefs'].append(k)
+        KSig[iC][0] = k
+        Ncoinc += 1 # valid, coincident pulse
+        V = max(abs(evd))
+        VSig[iC][0] = V         # signal voltage  
+        r['hVSigs'].append(V)         
+        T = id*dT*1E6 # signal time in musec
+        TSig[iC][0] = T 
+        tevt += T
+
+# check wether event should be accepted 
+  if (NChan == 1 and r['validated']) or (NChan > 1 and Ncoinc >=2):
+    r['accepted'] = True
+  else:
+    return r
+
+# fix event time:
+  tevt /= Ncoinc
+
+# 3. find subsequent pulses in accepted events
+  offset = idtr + lref # search after trigger pulse
+  # maxima of correlation above threshold on all channels 
+  (iCmx, idmx), cmx = pars['FFTcor'].peaks(evCor[:, offset:], 1.)
+  idmx += offset # index of maxima in evData array
+# clean-up pulse candidates by requesting match with time-averaged pulse
+  pulses = validatePulses(evData, iCmx, idmx, cmx, evRef[iCmx, idmx],
+                          refpms, pthrms)
+  for iC in range(NChan):
+    iacc = 0
+    for p in pulses[pulses['iC'] == iC]:
+      iacc+=1
+      r['iRefs'].append(p['iRef'])
+      V = p['V'] # signal Voltage 
+      if iacc == 1:
+        VSig[iC][1] = V 
+        TSig[iC][1] = p['id']*dT*1E6   # signal time in musec
+        KSig[iC][1] = p['iRef']
+      else: 
+        VSig[iC].append(V) # extend arrays if more than 1 extra pulse
+        TSig[iC].append(p['id']*dT*1E6)   
+        KSig[iC].append(p['iRef'])
+#     -- end loop over accepted pulses
+#   -- end for loop over channels
+     
+#  statistics on double pulses on either channel
+  delT2s=np.zeros(NChan)
+  sig2s=np.zeros(NChan)
+  sumdT2 = 0.
+  N2nd = 0.
+  for iC in range(NChan):
+    if VSig[iC][1] > 0.:
+      r['doublePulse'] = True
+      N2nd += 1
+      delT2s[iC] = TSig[iC][-1] - tevt  # take last pulse found 
+      sig2s[iC] = VSig[iC][-1]
+      sumdT2 += delT2s[iC]
+  if r['doublePulse']:
+    r['tau'] = sumdT2 / N2nd
+
+  r.update({'Ncoinc':Ncoinc, 'tevt':tevt, 'VSig':VSig, 'TSig':TSig, 
+            'KSig':KSig, 'delT2s':delT2s, 'sig2s':sig2s})
+  return r
+
+def analyseBatch(evStack, pars):
+  '''
+  pulse analysis of a stack of events
+
+    Args:
+      evStack: waveforms in Volt, NEvents x NChan x NSamples
+      pars: analysis parameters, see setupAnalysis
+
+    Returns: list of results, see analyseEvent
+  '''
+  # correlation of all channels of all events with all reference
+  #  pulses, normalised to threshold of each reference pulse
+  corStack = pars['FFTcor'].correlate(evStack) \
+               / pars['pthrs'][:, None].astype(np.float32)
+  # best-matching reference pulse at each position
+  if corStack.shape[2] == 1: # only one reference pulse
+    corStack = corStack[:, :, 0]
+    refStack = np.zeros(corStack.shape, dtype=np.int8)
+  else:
+    refStack = np.argmax(corStack, axis=2)
+    corStack = np.max(corStack, axis=2)
+  return [analyseEvent(evStack[ib], corStack[ib], refStack[ib], pars)
+          for ib in range(len(evStack))]
+
+def pFworker(BM, cId, pars, NBatch, putResults):
+  '''
+  lease events from BufferMan, analyse them as a batch and pass
+    results to putResults; several workers may share client cId,
+    each event is analysed by one of them
+
+    Args: 
+      BM: Buffer Manager
+      cId: client index
+      pars: analysis parameters, see setupAnalysis
+      NBatch: max. number of events analysed together
+      putResults: function receiving list of results of a batch
+  '''
+  preMon = BM.preFilter is not None and BM.preFilter.monitor
+  evStack = np.zeros( (NBatch, BM.NChannels, BM.NSamples), dtype=np.float32)
+
+  while BM.ACTIVE.value:
+    leases = []
+    e = BM.leaseEvent(cId)
+    if e == None:
+      break             # end if BM no longer active
+    leases.append(e + (BM.clientSeq[cId],) )
+    while len(leases) < NBatch: # add events already waiting
+      e = BM.leaseEvent(cId, block=False)
+      if e == None: break
+      leases.append(e + (BM.clientSeq[cId],) )
+    for k, l in enumerate(leases):
+      evStack[k] = BM.toVolts(l[3]) # raw ADC codes to Volts, if needed
+    results = analyseBatch(evStack[:len(leases)], pars)
+    for r, (handle, evNr, evTime, evRaw, seq) in zip(results, leases):
+      r.update({'seq':seq, 'evNr':evNr, 'evTime':evTime,
+                'preRej': preMon and not BM.preFlag[handle]})
+      if r['doublePulse'] and pars['keepRaw']: 
+        r['evRaw'] = np.array(evRaw) # copy raw waveforms for output
+    for l in leases: BM.releaseEvent(cId, l[0])
+    putResults(results)
+
+def pFworkerProcess(BM, cId, pars, NBatch, resultQ):
+  '''worker as sub-process, results sent to merging process'''
+  pFworker(BM, cId, pars, NBatch, resultQ.put)
+  resultQ.put(None) # signal end of worker
+
+class ResultMerger(object):
+  '''
+  collect results of pulse analysis in order of events, 
+    keep statistics and provide output to files and display processes 
+  '''
+
+  def __init__(self, NChan, NRef, logf, logf2, rawf=None, pDir=None, 
+               Osci=None, filtRateQ=None, hists=None, VSigQ=None, 
+               verbose=1, BM=None):
+    '''Args: 
+         NChan: number of channels
+         NRef: number of reference pulses
+         logf, logf2: text files or ColumnFileWriters (binary output) 
+         rawf: EventFileWriter for raw waveforms of double pulses
+         pDir, Osci: directory and Oscilloscope for pictures 
+         filtRateQ, VSigQ: Queues for display processes
+         hists: SharedHists, filled with quantities of events
+         BM: Buffer Manager, None for offline analysis
+    '''
+    self.BM = BM
+    self.prlog = BM.prlog if BM is not None else print
+    self.NChan = NChan
+    self.NRef = NRef
+    self.logf = logf
+    self.logf2 = logf2
+    self.binary = isinstance(logf, ColumnFileWriter) or \
+                  isinstance(logf2, ColumnFileWriter)
+    self.rawf = rawf
+    self.pDir = pDir
+    self.Osci = Osci
+    self.filtRateQ = filtRateQ
+    self.hists = hists
+    self.VSigQ = VSigQ
+    self.verbose = verbose
+
+    self.nextSeq = 0  # sequence number of next event to process
+    self.pending = {} # results received ahead of order
+
+    self.evcnt=0  # events seen
+    self.Nval=0  # events with valid pulse shape on trigger channel
+    self.Nacc=0
+    self.Nacc2=0  # dual coincidences
+    self.Nacc3=0     # triple coincidences
+    self.Ndble=0  # double pulses
+    self.NSig_ref = np.zeros(NRef, dtype=np.int64) # valid pulses per ref.
+# pre-filter of BufferMan in monitor mode: compare with this analysis 
+    self.preMon = BM is not None and BM.preFilter is not None \
+                  and BM.preFilter.monitor
+    self.NpreRej=0  # events failing pre-filter
+    self.NaccRej=0  # accepted events failing pre-filter
+
+# quantities to be histogrammed, filled into hists for each batch
+    self.hnTrSigs = [] #  pulse height of noise signals
+    self.hvTrSigs = [] #  pulse height of valid triggers
+    self.hVSigs = [] # pulse heights non-triggering channels
+    self.hTaus = []  # deltaT of double pulses
+
+  def add(self, results):
+    '''add results of a batch, processed once all earlier events are in'''
+    for r in results:
+      self.pending[r['seq']] = r
+    while self.nextSeq in self.pending:
+      self.process(self.pending.pop(self.nextSeq))
+      self.nextSeq += 1
+    self.fillHists()
+
+  def flush(self):
+    '''process remaining results, e.g. after end of a worker'''
+    for seq in sorted(self.pending):
+      self.process(self.pending.pop(seq))
+    self.fillHists()
+
+  def fillHists(self):
+    '''add collected quantities to shared histograms'''
+    if self.hists is not None:
+      self.hists.fill( [self.hnTrSigs, self.hvTrSigs, self.hVSigs, 
+                        self.hTaus] )
+      self.hnTrSigs = []
+      self.hvTrSigs = []
+      self.hVSigs = []
+      self.hTaus = []
+
+  def process(self, r):
+    '''statistics and output for one event'''
+    NChan = self.NChan
+    prlog = self.prlog
+    verbose = self.verbose
+    evNr = r['evNr']
+    evTime = r['evTime']
+    self.evcnt += 1
+    if r['preRej']: self.NpreRej += 1
+    if verbose > 1:
+      prlog('*==* pulseFilter: event Nr %i, %i events seen'\
+            %(evNr, self.evcnt))
+    if self.hists is not None:
+      if r['Vnoise'] is not None: self.hnTrSigs.append(r['Vnoise'])
+      if r['Vtrg'] is not None: self.hvTrSigs.append(r['Vtrg'])
+      self.hVSigs += r['hVSigs']
+    if r['validated']: self.Nval += 1
+    for k in r['iRefs']: self.NSig_ref[k] += 1
+    if not r['accepted']: return
+
+    self.Nacc += 1
+    if r['preRej']: self.NaccRej += 1
+    Ncoinc = r['Ncoinc']
+    if Ncoinc == 2:
+      self.Nacc2 += 1
+    elif Ncoinc == 3:
+      self.Nacc3 += 1
+    doublePulse = r['doublePulse']
+    VSig = r['VSig']
+    TSig = r['TSig']
+    KSig = r['KSig']
+    tevt = r['tevt']
+    if doublePulse:
+      self.Ndble += 1
+      tau = r['tau']
+      delT2s = r['delT2s']
+      sig2s = r['sig2s']
+      if self.hists is not None: self.hTaus.append(tau)
+    Nacc = self.Nacc
+    Ndble = self.Ndble
+    
+# eventually store results in file(s)
+# 1. all accepted events
+    logf = self.logf
+    if self.binary and logf is not None:
+      row = [evNr, evTime, tevt, Ncoinc]
+      for i in range(3): # 1st, 2nd and 3rd pulse
+        row.append([v[i] if len(v) > i else 0. for v in VSig])
+        row.append([t[i] - tevt if len(v) > i and v[i] > 0. else 0. 
+                    for v, t in zip(VSig, TSig)])
+        if i < 2: row.append([k[i] for k in KSig])
+      logf.write(tuple(row))
+    elif logf is not None:
+      print('%i, %.2f'%(evNr, evTime), end='', file=logf)
+      for ic in range(NChan):
+        v = VSig[ic][0]
+        t = TSig[ic][0]
+        if v>0: t -=tevt
+        print(', %.3f, %.3f'%(v,t), end='', file=logf)
+      if doublePulse:
+        for ic in range(NChan):
+          v = VSig[ic][1]
+          t = TSig[ic][1]
+          if v>0: t -=tevt
+          print(', %.3f, %.3f'%(v,t), end='', file=logf)
+        for ic in range(NChan):
+          if len(VSig[ic]) > 2:
+            print(', %i, %.3f, %.3f'%(ic, VSig[ic][2],TSig[ic][2] ),
+                  end='', file=logf)
+      if self.NRef > 1: # best-matching reference pulses, -1 if no pulse
+        print(',  ' + ', '.join(['%i'%(k) for ks in KSig for k in ks]), 
+              end='', file=logf)
+      print('', file=logf)
+
+# 2. double pulses
+    logf2 = self.logf2
+    if self.binary and logf2 is not None and doublePulse:
+      logf2.write( (Nacc, Ndble, evNr, tau, delT2s, sig2s) )
+    elif logf2 is not None and doublePulse:
+      if NChan==1:
+        print('%i, %i, %.4g,   %.4g, %.3g'\
+              %(Nacc, Ndble, tau, delT2s[0], sig2s[0]),
+              file=logf2)
+      elif NChan==2:
+        print('%i, %i, %.4g,   %.4g, %.4g,   %.3g, %.3g'\
+              %(Nacc, Ndble, tau, 
+                delT2s[0], delT2s[1], sig2s[0], sig2s[1]),
+                file=logf2)
+      elif NChan==3:
+        print('%i, %i, %.4g,   %.4g, %.4g, %.4g,   %.3g, %.3g, %.3g'\
+              %(Nacc, Ndble, tau, 
+                delT2s[0], delT2s[1], delT2s[2], 
+                sig2s[0], sig2s[1], sig2s[2]),
+                file=logf2)
+
+    if self.rawf is not None and doublePulse: # write raw waveforms
+      self.rawf.write(evNr, evTime, r['evRaw'])
+
+    if self.pDir is not None and doublePulse:
+      self.Osci( (3, Ndble, evTime, self.BM.toVolts(r['evRaw'])) ) 
+         #  update figure, use cnt=3 each time to avoid rate statistics 
+      self.Osci.fig.savefig(self.pDir+'/DPfig%03i'%(Ndble)+'.png') 
+         # ... and save to .png
+
+# print to screen 
+    if verbose > 1:
+      if NChan ==1:
+        prlog ('*==* pF: %i, %i, %.3g, %.3g'\
+              %(self.evcnt, Nacc, tevt, VSig[0][0]) )
+      elif NChan ==2:
+        prlog ('*==* pF: %i, %i, %i, %.3g, %.3g, %.3g'\
+               %(self.evcnt, self.Nval, Nacc, tevt, VSig[0][0], VSig[1][0]) )
+      elif NChan ==3:
+        prlog ('*==* pF: %i, %i, %i, %i, %i, %.3g'\
+              %(self.evcnt, self.Nval, Nacc, self.Nacc2, self.Nacc3, tevt) )
+
+    if(verbose and self.evcnt%1000==0):
+        prlog("*==* pF: evt %i, Nval, Nacc, Nacc2, Nacc3: %i, %i, %i, %i"\
+              %(self.evcnt, self.Nval, Nacc, self.Nacc2, self.Nacc3))
+        if self.preMon:
+          prlog("*==* pF: failing pre-filter, all and accepted: %i, %i"\
+                %(self.NpreRej, self.NaccRej))
+        if self.NRef > 1:
+          prlog("*==* pF: pulses per reference pulse: " + 
+                ', '.join(['%i'%(n) for n in self.NSig_ref]) )
+
+    if verbose and doublePulse:
+        s = '%i, %i, %.4g'\
+                 %(Nacc, Ndble, tau)
+        prlog('*==* double pulse: Nacc, Ndble, dT ' + s)
+
+# provide information for background display processes
+# -- RateMeter
+    if self.filtRateQ is not None and self.filtRateQ.empty(): 
+      self.filtRateQ.put( (Nacc, evTime) ) 
+
+# -- Signal Display
+    if self.VSigQ is not None and self.VSigQ.empty(): 
+      peaks = [VSig[iC][0] for iC in range(NChan) ]
+      self.VSigQ.put( peaks ) 
+
+  def close(self):
+    '''add summary information to log-files and close them'''
+    tag = "# pulseFilter Summary: " 
+    s = tag+"last evNR %i, Nval, Nacc, Nacc2, Nacc3: %i, %i, %i, %i"\
+        %(self.evcnt, self.Nval, self.Nacc, self.Nacc2, self.Nacc3)
+    sref = "#   valid pulses per reference pulse: " + \
+           ', '.join(['%i'%(n) for n in self.NSig_ref])
+    if self.binary: # summary stored at end of file
+      summary = {'evcnt':self.evcnt, 'Nval':self.Nval, 'Nacc':self.Nacc, 
+                 'Nacc2':self.Nacc2, 'Nacc3':self.Nacc3, 'Ndble':self.Ndble,
+                 'NSig_ref':self.NSig_ref}
+      for f in [self.logf, self.logf2]:
+        if f is not None: f.close(summary)
+    if self.logf is not None and not self.binary:
+      print(s, file=self.logf )
+      if self.NRef > 1: print(sref, file=self.logf)
+      self.logf.close()
+
+    if self.preMon:
+      self.prlog('*==* pF: pre-filter efficiency %.4f, rejection %.4f'\
+          %(1. - self.NaccRej/max(self.Nacc, 1), 
+            (self.NpreRej - self.NaccRej)/max(self.evcnt - self.Nacc, 1) ) )
+
+    if self.logf2 is not None and not self.binary: 
+      print(s, file=self.logf2 )
+      print("#                       %i double pulses"%(self.Ndble), 
+          file=self.logf2 )
+      if self.NRef > 1: print(sref, file=self.logf2)
+      self.logf2.close()
+
+    if self.rawf is not None: 
+      self.rawf.close()
+# - end class ResultMerger
+
 def pulseFilter(BM, cId, confDict = None,
-                filtRateQ = None, histQ = None, VSigQ = None, 
+                filtRateQ = None, hists = None, VSigQ = None, 
                 fileout = None, verbose=1):
   '''
     Find a pulse similar to a template pulse by cross-correlatation
@@ -79,6 +782,9 @@ def pulseFilter(BM, cId, confDict = None,
           1. validation of pulse on trigger channel
           2. coincidences on other channels near validated trigger pulse
           3. seach for addtional pulses on any channel
+
+      - events may be analysed by a pool of worker processes (NWorkers),
+        results are merged in order of events 
   '''
 
 # buffermanager must be active
@@ -124,6 +830,11 @@ def pulseFilter(BM, cId, confDict = None,
     else:
       logFile2 = 'dpFilt'
 
+    if "logFormat" in confDict:
+      logFormat = confDict['logFormat'] # text or binary (ColumnFile) 
+    else:
+      logFormat = 'text'
+
     if "rawFile" in confDict:
       rawFile = confDict['rawFile']
       if rawFile == None: rawFile = None
@@ -140,6 +851,16 @@ def pulseFilter(BM, cId, confDict = None,
     else:
       modules = ['RMeter','Hists']
 
+    if "batchSize" in confDict:
+      NBatch = confDict['batchSize'] # events analysed together
+    else:
+      NBatch = 8
+
+    if "NWorkers" in confDict:
+      NWorkers = confDict['NWorkers'] # number of analysis processes
+    else:
+      NWorkers = 1
+
 #    if "analysisLevel" in confDict:
 #      analysisLevel = confDict['analysisLevel']
 #    else:
@@ -152,28 +873,12 @@ def pulseFilter(BM, cId, confDict = None,
 
 # open and initialize files
   datetime=time.strftime('%y%m%d-%H%M', time.localtime())
-  if logFile is not None:
-#    logf=None
-    logf = open(logFile + '_' + datetime+'.dat', 'w')
-    print("# EvNr, EvT, Vs ...., Ts ...T", 
-      file=logf) # header line
-  else:
-    logf = None
-
-  if logFile2 is not None:
-    logf2 = open(logFile2 + '_' + datetime+'.dat', 'w', 1)
-    print("# Nacc, Ndble, Tau, delT(iChan), ... V(iChan)", 
-      file=logf2) # header line 
-  else:
-    logf2 = None
+  logf, logf2 = openLogFiles(logFile, logFile2, logFormat, BM.NChannels,
+                             confDict, '_' + datetime)
 
-  if rawFile is not None:
-    rawf = open(rawFile + '_' + datetime+'.dat', 'w', 1)
-    print("--- #raw waveforms",
-      file=rawf) # header line     
-    yaml.dump( {'OscConf': BM.DevConf.OscConfDict}, rawf )
-    yaml.dump( {'pFConf' : confDict}, rawf )
-    print('data: ',  file=rawf) # data tag    
+  if rawFile is not None: # binary event file, see picodaqa.EventFile
+    rawf = BM.openEventFile(rawFile + '_' + datetime+'.evt', 
+                            userConf={'pFConf': confDict}, chunkSize=1)
   else:
     rawf = None  
 
@@ -181,308 +886,59 @@ def pulseFilter(BM, cId, confDict = None,
     pDir = (pictDir + '_' + datetime)
     if not os.path.exists(pDir): os.makedirs(pDir)
   # initialize oscolloscpe class used for plotting
+    from picodaqa.Oscilloscope import Oscilloscope # needs matplotlib
     Osci = Oscilloscope(BM.DevConf.OscConfDict, 'DoublePulse') 
-    figOs = Osci.fig
     Osci.init()
   else:
     pDir = None  
+    Osci = None
 
-# retrieve relevant configuration parameters (from BufferManager)
-  dT = BM.TSampling # get sampling interval
-  idTprec = 2 # precision on time resolution of pulse search 
-  dTprec = idTprec * dT  # precision on time resolution (in units of dT)
-  NChan = BM.NChannels
-  NSamples = BM.NSamples
-  trgChan = BM.DevConf.trgChan     # trigger Channel
-  idT0 = int(BM.DevConf.NSamples * BM.DevConf.pretrig) # index of trigger T0
-  iCtrg = -1
-  for i, C in enumerate(BM.DevConf.picoChannels):   
-    if C == trgChan: 
-      iCtrg = i       # number of trigger Channel
-      break
+# reference pulses, thresholds and matched filter 
+  pars = setupAnalysis(BM.DevConf.OscConfDict, refPulseDicts, verbose, prlog)
+  pars['keepRaw'] = rawf is not None or pDir is not None
+  NRef = pars['NRef']
 
-# generate reference pulse 
-#  refp = setRefPulse(dT, taur, tauon, tauf, pheight)
-  refp = setRefPulse(dT, **refPulseDicts[0])
-  print('pF: pulse parameters set')
-  taur = refPulseDicts[0]['taur'] 
-  tauon = refPulseDicts[0]['tauon'] 
-  tauf =  refPulseDicts[0]['tauf']
-  pheight = refPulseDicts[0]['pheight'] 
-
-  print('  taur: %.3g, tauon: %.3g, tauf: %.3g, height: %.3g'\
-        %(taur, tauon, tauf, pheight) )
-  refpm = refp - refp.mean()            # mean subtracted
-  lref = len(refp)
-
-# calculate thresholds for correlation analysis
-  pthr = np.sum(refp * refp) # norm of reference pulse
-  pthrm = np.sum(refpm * refpm) # norm of mean-subtracted reference pulse
-  if verbose > 1:
-    prlog('*==* pulse Filter: reference pulse')
-    prlog(np.array_str(refp) )
-    prlog('  thresholds: %.2g, %2g ' %(pthr, pthrm))
-
-# set mode for Buffer Manager
-  mode = 0    # obligatory consumer, get all events
+# obligatory consumer, all pending events are leased and analysed 
+#   as a batch, limited by number of leases of client 
+  NBatch = max(1, min(NBatch, BM.clientMaxLeases[cId]))
 
 # --- end set-up 
 
-# initialise event loop
-  evcnt=0  # events seen
-  Nval=0  # events with valid pulse shape on trigger channel
-  Nacc=0
-  Nacc2=0  # dual coincidences
-  Nacc3=0     # triple coincidences
-  Ndble=0  # double pulses
-  T0 = time.time()
-
-# arrays for quantities to be histogrammed
-  hnTrSigs = [] #  pulse height of noise signals
-  hvTrSigs = [] #  pulse height of valid triggers
-  hVSigs = [] # pulse heights non-triggering channels
-  hTaus = []  # deltaT of double pulses
-#
-
-# event loop
-  while BM.ACTIVE.value:
-    validated = False
-    accepted = False
-    doublePulse = False
-    e = BM.getEvent(cId, mode=mode)
-    if e == None:
-      break             # end if empty event or BM no longer active
-
-    evNr, evTime, evData = e
-    evcnt+=1
-    if verbose > 1:
-      prlog('*==* pulseFilter: event Nr %i, %i events seen'%(evNr,evcnt))
-
-# find signal candidates by convoluting signal with reference pulse
-#   data structure to collect properties of selected pulses:
-    idSig = [ [0, 0] for i in range(NChan)] # time slice of valid pulse
-    VSig = [ [0., 0.] for i in range(NChan)]  # signal height in Volts
-    TSig = [ [0., 0.] for i in range(NChan)]  # time of valid pulse
-    NSig = [0 for i in range(NChan)]
-
-# 1. validate trigger pulse
-    if iCtrg >= 0:  
-      offset = max(0, idT0 - int(taur/dT) - idTprec)
-      cort = np.correlate(evData[iCtrg, offset:idT0+idTprec+lref], 
-             refp, mode='valid')
-      cort[cort<pthr] = pthr # set all values below threshold to threshold
-      idtr = np.argmax(cort) + offset # index of 1st maximum 
-      if idtr > idT0 + (taur + tauon)/dT + idTprec:
-        if histQ: hnTrSigs.append(0.)
-        continue #- while # no pulse near trigger, skip rest of event analysis
-    # check pulse shape by requesting match with time-averaged pulse
-      evdt = evData[iCtrg, idtr:idtr+lref]
-      evdtm = evdt - evdt.mean()  # center signal candidate around zero
-      cc = np.sum(evdtm * refpm) # convolution with mean-corrected reference
-      if cc > pthrm:
-        validated = True # valid trigger pulse found, store
-        Nval +=1
-        V = max(abs(evdt)) # signal Voltage  
-        VSig[iCtrg][0] = V 
-        if histQ: hvTrSigs.append(V)
-        T = idtr*dT*1E6      # signal time in musec
-        TSig[iCtrg][0] = T 
-        tevt = T  # time of event
-      else:   # no valid trigger
-        hnTrSigs.append( max(abs(evdt)) )
-        continue #- while # skip rest of event analysis
-    NSig[iCtrg] +=1
-
-# 2. find coincidences
-    Ncoinc = 1
-    for iC in range(NChan):
-      if iC != iCtrg:
-        offset = max(0, idtr - idTprec)  # search around trigger pulse
-    #  analyse channel to find pulse near trigger
-        cor = np.correlate(evData[iC, offset:idT0+idTprec+lref], 
-              refp, mode='valid')
-        cor[cor<pthr] = pthr # set all values below threshold to threshold
-        id = np.argmax(cor)+offset # find index of (1st) maximum 
-        if id > idT0 + (taur + tauon)/dT + idTprec:
-          continue # no pulse near trigger, skip
-        evd = evData[iC, id:id+lref]
-        evdm = evd - evd.mean()  # center signal candidate around zero
-        cc = np.sum(evdm * refpm) # convolution with mean-corrected reference
-        if cc > pthrm:
-          NSig[iC] +=1
-          Ncoinc += 1 # valid, coincident pulse
-          V = max(abs(evd))
-          VSig[iC][0] = V         # signal voltage  
-          hVSigs.append(V)         
-          T = id*dT*1E6 # signal time in musec
-          TSig[iC][0] = T 
-          tevt += T
-
-# check wether event should be accepted 
-    if (NChan == 1 and validated) or (NChan > 1 and Ncoinc >=2):
-      accepted = True
-      Nacc += 1
-    else:
-      continue #- while 
-
-# fix event time:
-    tevt /= Ncoinc
-    if Ncoinc == 2:
-      Nacc2 += 1
-    elif Ncoinc == 3:
-      Nacc3 += 1
-
-# 3. find subsequent pulses in accepted events
-    offset = idtr + lref # search after trigger pulse
-    for iC in range(NChan):
-      cor = np.correlate(evData[iC, offset:], refp, mode='valid')
-      cor[cor<pthr] = pthr # set all values below threshold to threshold
-      idmx, = argrelmax(cor)+offset # find index of maxima in evData array
-# clean-up pulse candidates by requesting match with time-averaged pulse
-      iacc = 0
-      for id in idmx:
-        evd = evData[iC, id:id+lref]
-        evdm = evd - evd.mean()  # center signal candidate around zero
-        cc = np.sum(evdm * refpm) # convolution with mean-corrected reference
-        if cc > pthrm: # valid pulse 
-          iacc+=1
-          NSig[iC] += 1
-          V = max(abs(evd)) # signal Voltage 
-          if iacc == 1:
-            VSig[iC][1] = V 
-            TSig[iC][1] = id*dT*1E6   # signal time in musec
-          else: 
-            VSig[iC].append(V) # extend arrays if more than 1 extra pulse
-            TSig[iC].append(id*dT*1E6)   
-#     -- end loop over pulse candidates
-#   -- end for loop over channels
-     
-#  statistics on double pulses on either channel
-    delT2s=np.zeros(NChan)
-    sig2s=np.zeros(NChan)
-    sumdT2 = 0.
-    N2nd = 0.
-    for iC in range(NChan):
-      if VSig[iC][1] > 0.:
-        doublePulse = True
-        N2nd += 1
-        delT2s[iC] = TSig[iC][-1] - tevt  # take last pulse found 
-        sig2s[iC] = VSig[iC][-1]
-        sumdT2 += delT2s[iC]
-    if doublePulse:
-      Ndble += 1
-      if histQ: hTaus.append( sumdT2 / N2nd )
-    
-# eventually store results in file(s)
-# 1. all accepted events
-    if logf is not None and accepted:
-      print('%i, %.2f'%(evNr, evTime), end='', file=logf)
-      for ic in range(NChan):
-        v = VSig[ic][0]
-        t = TSig[ic][0]
-        if v>0: t -=tevt
-        print(', %.3f, %.3f'%(v,t), end='', file=logf)
-      if doublePulse:
-        for ic in range(NChan):
-          v = VSig[ic][1]
-          t = TSig[ic][1]
-          if v>0: t -=tevt
-          print(', %.3f, %.3f'%(v,t), end='', file=logf)
-        for ic in range(NChan):
-          if len(VSig[ic]) > 2:
-            print(', %i, %.3f, %.3f'%(ic, VSig[ic][2],TSig[ic][2] ),
-                  end='', file=logf)
-      print('', file=logf)
-
-# 2. double pulses
-    if logf2 is not None and doublePulse:
-      if NChan==1:
-        print('%i, %i, %.4g,   %.4g, %.3g'\
-              %(Nacc, Ndble, hTaus[-1], delT2s[0], sig2s[0]),
-              file=logf2)
-      elif NChan==2:
-        print('%i, %i, %.4g,   %.4g, %.4g,   %.3g, %.3g'\
-              %(Nacc, Ndble, hTaus[-1], 
-                delT2s[0], delT2s[1], sig2s[0], sig2s[1]),
-                file=logf2)
-      elif NChan==3:
-        print('%i, %i, %.4g,   %.4g, %.4g, %.4g,   %.3g, %.3g, %.3g'\
-              %(Nacc, Ndble, hTaus[-1], 
-                delT2s[0], delT2s[1], delT2s[2], 
-                sig2s[0], sig2s[1], sig2s[2]),
-                file=logf2)
-
-    if rawf is not None and doublePulse: # write raw waveforms
-      print( ' - ' + yaml.dump(np.around(evData, 5).tolist(),  
-                       default_flow_style=True ), 
-             file=rawf) 
-
-    if pDir is not None and doublePulse:
-      evt = Osci( (3, Ndble, evTime, evData) ) # update figure ...
-         #  use cnt=3 each time to avoid rate statistics 
-      figOs.savefig(pDir+'/DPfig%03i'%(Ndble)+'.png') # ... and save to .png
-
-# print to screen 
-    if accepted and verbose > 1:
-      if NChan ==1:
-        prlog ('*==* pF: %i, %i, %.2f, %.3g, %.3g'\
-              %(evcnt, Nacc, tevt, VSig[0][0]) )
-      elif NChan ==2:
-        prlog ('*==* pF: %i, %i, i%, %.3g, %.3g, %.3g'\
-               %(evcnt, Nval, Nacc, tevt, VSig[0][0], VSig[1][0]) )
-      elif NChan ==3:
-        prlog ('*==* pF: %i, %i, %i, %i, %i, %.3g'\
-              %(evcnt, Nval, Nacc, Nacc2, Nacc3, tevt) )
-
-    if(verbose and evcnt%1000==0):
-        prlog("*==* pF: evt %i, Nval, Nacc, Nacc2, Nacc3: %i, %i, %i, %i"\
-              %(evcnt, Nval, Nacc, Nacc2, Nacc3))
-
-    if verbose and doublePulse:
-        s = '%i, %i, %.4g'\
-                 %(Nacc, Ndble, hTaus[-1])
-        prlog('*==* double pulse: Nacc, Ndble, dT ' + s)
-
-# provide information for background display processes
-# -- RateMeter
-    if filtRateQ is not None and filtRateQ.empty(): 
-      filtRateQ.put( (Nacc, evTime) ) 
-
-# -- histograms
-    if len(hvTrSigs) and histQ is not None and histQ.empty(): 
-      histQ.put( [hnTrSigs, hvTrSigs, hVSigs, hTaus] )
-      hnTrSigs = []
-      hvTrSigs = []
-      hVSigs = []
-      hTaus = []
-
-# -- Signal Display
-    if VSigQ is not None and VSigQ.empty(): 
-      peaks = [VSig[iC][0] for iC in range(NChan) ]
-      VSigQ.put( peaks ) 
-
-# end BM.ACTIVE or break e == None  
-
-# add summary information to log-files
-  tag = "# pulseFilter Summary: " 
-  if logf is not None:
-    if logf: 
-      print(tag+"last evNR %i, Nval, Nacc, Nacc2, Nacc3: %i, %i, %i, %i"\
-        %(evcnt, Nval, Nacc, Nacc2, Nacc3),
-          file=logf )
-      logf.close()
-
-  if logf2 is not None: 
-    print(tag+"last evNR %i, Nval, Nacc, Nacc2, Nacc3: %i, %i, %i, %i"\
-      %(evcnt, Nval, Nacc, Nacc2, Nacc3),
-        file=logf2 )
-    print("#                       %i double pulses"%(Ndble), 
-        file=logf2 )
-    logf2.close()
-
-  if rawf is not None: 
-    print("--- ", file=rawf )
-    rawf.close()
+  merger = ResultMerger(BM.NChannels, NRef, logf, logf2, rawf, pDir, Osci, 
+                        filtRateQ, hists, VSigQ, verbose, BM)
+
+  if NWorkers == 1: # analysis and merging in this process
+    pFworker(BM, cId, pars, NBatch, merger.add)
+  else: # pool of workers sharing client cId, results merged here
+    resultQ = Queue()
+    workers = []
+    for i in range(NWorkers):
+      workers.append(Process(name='pFworker%i'%(i), target=pFworkerProcess,
+                             args=(BM, cId, pars, NBatch, resultQ) ) )
+      workers[-1].daemon = True
+      workers[-1].start()
+    Nrunning = NWorkers
+    while Nrunning:
+      # a worker that died does not signal its end, abort
+      failed = [w for w in workers if w.exitcode not in (None, 0)]
+      if failed:
+        prlog('!!! pulseFilter: worker %s failed (exit code %i), aborting'\
+              %(failed[0].name, failed[0].exitcode) )
+        for w in workers:
+          if w.is_alive(): w.terminate()
+        break
+      try:
+        results = resultQ.get(timeout=1.)
+      except Empty:
+        continue
+      if results is None: # worker ended
+        Nrunning -= 1
+      else:
+        merger.add(results)
+    for w in workers: w.join()
+    merger.flush()
+
+  merger.close()
 
   if pDir is not None:
     # put all figures in one zip-file 
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# script reprocessEvents.py
+'''
+  offline analysis of recorded event files (see picodaqa.EventFile)
+  with pulseFilter: events are analysed in chunks by a pool of
+  processes, results are merged in order of events
+
+  output: log files of accepted events and double pulses (as
+  pulseFilter, format set by logFormat in configuration) and
+  histograms (yaml, optionally as figure)
+
+  usage: reprocessEvents.py [-c pFconfig.yaml] [-n NProcs] [-s chunkSize]
+                            [-o outName] [-p] file.evt [file.evt ...]
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import sys, time, argparse, yaml, numpy as np, multiprocessing as mp
+
+from picodaqa.EventFile import EventFileReader
+from picodaqa.SharedHists import SharedHists
+from pulseFilter import setupAnalysis, analyseBatch, openLogFiles, \
+                        ResultMerger
+
+# histograms as in anaDAQ.py: min, max, nbins, ymax, title, lin/log
+Hdescriptors = [ [0., 0.4, 50, 20., 'noise Trg. Pulse (V)', 0],
+                 [0., 0.8, 50, 15., 'valid Trg. Pulse (V)', 0],
+                 [0., 0.8, 50, 15., 'Pulse height (V)', 0],
+                 [0., 15., 45, 7.5, 'Tau (µs)', 1] ]
+
+pFconf = None  # configuration of pulseFilter, set in worker processes
+pFpars = {}    # analysis parameters for each file
+
+def initWorker(conf):
+  global pFconf
+  pFconf = conf
+
+def analyseChunk(job):
+  '''
+    analyse events i0 to i1 of a file
+
+    Args: job: file name, i0, i1, sequence number of event i0
+    Returns: list of results, see pulseFilter.analyseEvent
+  '''
+  fname, i0, i1, seq0 = job
+  evf = EventFileReader(fname)
+  if fname not in pFpars:
+    pFpars[fname] = setupAnalysis(evf.OscConf, pFconf['pulseShape'],
+                                  verbose=0)
+  pars = pFpars[fname]
+  if "batchSize" in pFconf:
+    NBatch = pFconf['batchSize']
+  else:
+    NBatch = 8
+
+  results = []
+  for i in range(i0, i1, NBatch):
+    recs = evf.records[i:min(i + NBatch, i1)]
+    evStack = np.asarray(evf.toVolts(recs['data']), dtype=np.float32)
+    rs = analyseBatch(evStack, pars)
+    for k, r in enumerate(rs):
+      r.update({'seq':seq0 + i - i0 + k, 'evNr':int(recs['evNr'][k]),
+                'evTime':float(recs['evTime'][k]), 'preRej':False})
+    results += rs
+  evf.close()
+  return results
+
+if __name__ == "__main__": # -----------------------------
+
+  parser = argparse.ArgumentParser(
+    description='offline pulseFilter analysis of recorded event files')
+  parser.add_argument('files', nargs='+', help='event files (.evt)')
+  parser.add_argument('-c', '--config', default='pFconfig.yaml',
+                      help='pulseFilter configuration')
+  parser.add_argument('-n', '--nprocs', type=int, default=mp.cpu_count(),
+                      help='number of processes')
+  parser.add_argument('-s', '--chunk', type=int, default=2000,
+                      help='events per chunk')
+  parser.add_argument('-o', '--out', default='reproc',
+                      help='name of output files')
+  parser.add_argument('-p', '--plot', action='store_true',
+                      help='save histograms as figure')
+  args = parser.parse_args()
+
+  print('\n*==* script ' + sys.argv[0] + ' running \n')
+  try:
+    with open(args.config) as f:
+      conf = yaml.safe_load(f)
+  except Exception as e:
+    print('     failed to read pulseFilter configuration ' + args.config)
+    print(str(e))
+    sys.exit(1)
+  if "logFormat" in conf:
+    logFormat = conf['logFormat']
+  else:
+    logFormat = 'text'
+
+# event ranges of all files, numbered in order of files
+  jobs = []
+  NChan = None
+  Nevt = 0
+  for fname in args.files:
+    try:
+      evf = EventFileReader(fname)
+    except Exception as e:
+      print('     failed to open event file ' + fname + ': ' + str(e))
+      sys.exit(1)
+    if NChan is None:
+      NChan = evf.NChannels
+    elif evf.NChannels != NChan:
+      print('     number of channels differs in file ' + fname)
+      sys.exit(1)
+    print('    %s: %i events' % (fname, len(evf)) )
+    for i0 in range(0, len(evf), args.chunk):
+      jobs.append( (fname, i0, min(i0 + args.chunk, len(evf)), Nevt + i0) )
+    Nevt += len(evf)
+    evf.close()
+
+  logf, logf2 = openLogFiles(args.out + '_pFilt', args.out + '_dpFilt',
+                             logFormat, NChan, conf)
+  hists = SharedHists(Hdescriptors)
+  merger = ResultMerger(NChan, len(conf['pulseShape']), logf, logf2,
+                        hists=hists, verbose=0)
+
+  print('*= analysing %i events with %i processes' % (Nevt, args.nprocs) )
+  t0 = time.time()
+  pool = mp.Pool(args.nprocs, initializer=initWorker, initargs=(conf,))
+  for results in pool.imap(analyseChunk, jobs):
+    merger.add(results)
+    print('    %i events  (%.0f/s)' % (merger.evcnt,
+          merger.evcnt/(time.time() - t0)), end='\r')
+  pool.close()
+  pool.join()
+  merger.flush()
+  merger.close()
+  dt = time.time() - t0
+  print('\n*= %i events in %.1fs (%.0f/s)' % (merger.evcnt, dt,
+                                              merger.evcnt/dt) )
+  print('   Nval, Nacc, Nacc2, Nacc3, Ndble: %i, %i, %i, %i, %i' % (
+        merger.Nval, merger.Nacc, merger.Nacc2, merger.Nacc3, merger.Ndble) )
+
+# store histograms and summary
+  version, counts, entries = hists.snapshot()
+  hdict = {'files': args.files, 'pFConf': conf,
+           'summary': {'evcnt':merger.evcnt, 'Nval':merger.Nval,
+                       'Nacc':merger.Nacc, 'Nacc2':merger.Nacc2,
+                       'Nacc3':merger.Nacc3, 'Ndble':merger.Ndble},
+           'histograms': [ {'title':d[4], 'min':d[0], 'max':d[1],
+                            'entries':int(n), 'counts':c.tolist()}
+                           for c, n, d in zip(counts, entries, Hdescriptors)] }
+  with open(args.out + '_hists.yaml', 'w') as f:
+    yaml.dump(hdict, f, default_flow_style=None, allow_unicode=True)
+  print('*= histograms written to ' + args.out + '_hists.yaml')
+
+  if args.plot:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, axes = plt.subplots(1, len(counts), figsize=(4.*len(counts), 3.5))
+    for ax, c, d in zip(axes, counts, Hdescriptors):
+      be = np.linspace(d[0], d[1], d[2] + 1)
+      ax.bar(be[:-1], c, width=be[1]-be[0], align='edge', alpha=0.5)
+      if d[5]: ax.set_yscale('log')
+      ax.set_xlabel(d[4])
+    fig.tight_layout()
+    fig.savefig(args.out + '_hists.png')
+    print('*= figure saved as ' + args.out + '_hists.png')
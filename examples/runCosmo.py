@@ -37,18 +37,17 @@
 from __future__ import print_function, division, unicode_literals
 from __future__ import absolute_import
 
-import sys, time, yaml, numpy as np, threading
+import sys, time, yaml, numpy as np, threading, signal
 #from multiprocessing import Process, Queue
-import multiprocessing as mp
 
 # import relevant pieces from picodaqa
 import picodaqa.picoConfig
+import picodaqa.EventReplay
 import picodaqa.BufferMan as BMan
 
 # animated displays running as background processes/threads
-from picodaqa.mpOsci import mpOsci
-from picodaqa.mpVMeter import mpVMeter
-from picodaqa.mpRMeter import mpRMeter
+#   are started by name via BM.addDisplay(), graphics modules are
+#   only loaded if displays are configured
 
 # !!!!
 # import matplotlib.pyplot as plt
@@ -136,7 +135,10 @@ if __name__ == "__main__": # - - - - - - - - - - - - - - - - - - - - - -
   print(' -> initializing PicoScope')
 
 # configure and initialize PicoScope
-  PSconf = picodaqa.picoConfig.PSconfig(PSconfdict)
+  if "replayFile" in PSconfdict: # events from file instead of device
+    PSconf = picodaqa.EventReplay.EventReplay(PSconfdict)
+  else:
+    PSconf = picodaqa.picoConfig.PSconfig(PSconfdict)
   PSconf.init()
   # copy some of the important configuration variables ...
   NChannels = PSconf.NChannels # number of channels in use
@@ -169,16 +171,18 @@ if __name__ == "__main__": # - - - - - - - - - - - - - - - - - - - - - -
     
   # rate display
   if 'mpRMeter' in modules:
-    RMcidx, RMmpQ = BM.BMregister_mpQ()
-    procs.append(mp.Process(name='RMeter', target = mpRMeter, 
-              args=(RMmpQ, 75., 2500., 'trigger rate history') ) )
-#                       maxRate interval name
+    RMcidx, RMmpQ = BM.BMregister_mpQ(withData=False)
+    prc = BM.addDisplay('RMeter', 'mpRMeter', 
+              (RMmpQ, 75., 2500., 'trigger rate history') )
+#                  maxRate interval name
+    if prc is not None: procs.append(prc)
   # Voltmeter display
   if 'mpVMeter' in modules:
     VMcidx, VMmpQ = BM.BMregister_mpQ()
-    procs.append(mp.Process(name='VMeter', target = mpVMeter, 
-              args=(VMmpQ, PSconf.OscConfDict, 500., 'effective Voltage') ) )
-#                         config interval name
+    prc = BM.addDisplay('VMeter', 'mpVMeter', 
+              (VMmpQ, PSconf.OscConfDict, 500., 'effective Voltage') )
+#                    config interval name
+    if prc is not None: procs.append(prc)
 
 # ---> put your own code here 
 
@@ -192,7 +196,7 @@ if __name__ == "__main__": # - - - - - - - - - - - - - - - - - - - - - -
 
 # <---
 
-  if len(procs)==0 and len(thrds)==0 :
+  if len(procs)==0 and len(thrds)==0 and len(BM.displayPanels)==0:
     print ('!!! nothing to do - running BM only')
 # start all background processes   
   for prc in procs:
@@ -208,6 +212,11 @@ if __name__ == "__main__": # - - - - - - - - - - - - - - - - - - - - - -
 # ...start run
   BM.run() 
 
+# end run cleanly on SIGTERM (e.g. when running as a service)
+  def sigterm(signum, frame):
+    raise KeyboardInterrupt
+  signal.signal(signal.SIGTERM, sigterm)
+
 # --- LOOP
   try:
 # ->> read keyboard (control Buffermanager)<<- 
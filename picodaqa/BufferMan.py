@@ -9,12 +9,138 @@ from __future__ import absolute_import
 
 # - class BufferMan
 import numpy as np, sys, time, threading
+from importlib import import_module
 
-from multiprocessing import Queue, Process, Array
+from multiprocessing import Queue, Process, Semaphore, Lock
 from multiprocessing.sharedctypes import RawValue, RawArray
+if sys.version_info[0] < 3:
+  from Queue import Empty, Full
+else:
+  from queue import Empty, Full
 
-from .mpBufManCntrl import *
-from .mpOsci import * 
+from .EventFile import EventFileWriter
+from .PreFilter import PreFilter
+# display modules (matplotlib, Tk) are only imported when started
+
+class BMmpQue(object):
+  '''
+  multiprocessing Queue delivering events from BufferMan shared memory
+
+  get() requests an event from the Buffer Manager, which only passes
+  a handle (event number, event time, buffer index) via the Queue; 
+  event data are copied from the shared buffer by the receiving process.
+  The event number stored with the buffer acts as a sequence lock: it is
+  cleared by the producer while the buffer is re-filled, events 
+  overwritten before or during copying are detected and skipped. 
+  '''
+
+  def __init__(self, BM, withData=True, raw=False):
+    '''Args:  BM: BufferMan instance
+              withData: if False, only event number and time are delivered
+              raw: deliver ADC codes if buffer holds raw data, else Volts
+    '''
+    self.withData = withData
+    self.raw = raw
+    self.shape = (BM.NBuffers, BM.NChannels, BM.NSamples)
+    self.CBMbuf = BM.CBMbuf
+    self.dtype = BM.dtype
+    self.ChanScale = BM.ChanScale
+    self.ChanOffset = BM.ChanOffset
+    self.CtrigStamp = BM.CtrigStamp
+    self.ACTIVE = BM.ACTIVE
+    self.req = RawValue('b', 0) # event requested by consumer
+    self.Q = Queue(1)
+    self.BMbuf = None  # numpy view, set up in receiving process
+    self.requested = False # poll(): request pending
+
+  def put(self, evNr, evTime, ibuf):
+    '''Buffer Manager: serve pending request with handle to buffer ibuf'''
+    if self.req.value:
+      self.req.value = 0
+      try: # never wait for a consumer, old handle may still be queued
+        self.Q.put_nowait( (evNr, evTime, ibuf) )
+      except Full:
+        self.req.value = 1 # request remains pending
+
+  def empty(self):
+    return self.Q.empty()
+
+  def get(self):
+    '''consumer: request next event 
+      
+       Returns: event number, event time and copy of event data,
+                None if Buffer Manager ended
+    '''
+    while True:
+      self.req.value = 1
+      try:
+        evNr, evTime, ibuf = self.Q.get(timeout=0.1)
+      except Empty:
+        if not self.ACTIVE.value: return None # end of run
+        continue
+      evt = self.copyEvent(evNr, evTime, ibuf)
+      if evt is not None: return evt
+
+  def poll(self):
+    '''consumer: as get(), but does not wait for an event
+
+       Returns: event as get(), None if no event arrived yet
+    '''
+    if not self.requested:
+      self.req.value = 1
+      self.requested = True
+      return None
+    try:
+      evNr, evTime, ibuf = self.Q.get_nowait()
+    except Empty:
+      return None
+    evt = self.copyEvent(evNr, evTime, ibuf)
+    if evt is None: # overwritten since request (high rate), get recent one
+      self.req.value = 1
+      try:
+        evNr, evTime, ibuf = self.Q.get(timeout=0.05)
+      except Empty:
+        return None # request remains pending
+      evt = self.copyEvent(evNr, evTime, ibuf)
+    self.req.value = 1 # request next event right away
+    return evt
+
+  def mapBuffers(self):
+    '''numpy views on shared buffers, in receiving process'''
+    self.BMbuf = np.frombuffer(self.CBMbuf, self.dtype).reshape(self.shape)
+    self.trigStamp = np.frombuffer(self.CtrigStamp, 'i')
+    self.seenStamp = np.zeros(self.shape[0], dtype=np.int32)
+
+  def copyEvent(self, evNr, evTime, ibuf):
+    '''copy event from shared buffer, None if overwritten'''
+    if self.BMbuf is None: self.mapBuffers()
+    if not self.withData:
+      return evNr, evTime
+    if self.trigStamp[ibuf] != evNr: return None # already overwritten
+    evData = np.array(self.BMbuf[ibuf])
+    if self.trigStamp[ibuf] != evNr: return None # overwritten while copying
+    if self.dtype != np.float32 and not self.raw: # convert to Volts
+      evData = evData * self.ChanScale[:, None] + self.ChanOffset[:, None]
+    return evNr, evTime, evData
+
+  def recentEvents(self):
+    '''consumer: all events in the shared buffers not read before,
+       copied at once without request and without waiting, e.g. for 
+       displays accumulating many events; at most NBuffers events
+       per call, events overwritten while copying are skipped
+
+       Returns: event numbers, event data (one row per event)
+    '''
+    if self.BMbuf is None: self.mapBuffers()
+    stamps = self.trigStamp.copy()
+    ibufs = np.nonzero((stamps != self.seenStamp) & (stamps != 0))[0]
+    evData = self.BMbuf[ibufs] # copy of filled buffers
+    ok = self.trigStamp[ibufs] == stamps[ibufs] # not overwritten meanwhile
+    ibufs, evData = ibufs[ok], evData[ok]
+    self.seenStamp[ibufs] = stamps[ibufs]
+    if self.dtype != np.float32 and not self.raw: # convert to Volts
+      evData = evData * self.ChanScale[:, None] + self.ChanOffset[:, None]
+    return stamps[ibufs], evData
 
 class BufferMan(object):
   '''
@@ -42,6 +168,10 @@ class BufferMan(object):
       self.BMmodules = BMdict["BMmodules"] # display modules to start
     else:
       self.BMmodules = []
+    if "displayHost" in BMdict: 
+      self.displayHost = BMdict["displayHost"] # all displays in one process
+    else:
+      self.displayHost = False
     if "LogFile" in BMdict:
      self.LogFile = BMdict["LogFile"]
     else:
@@ -55,6 +185,18 @@ class BufferMan(object):
       self.logTime = BMdict["logTime"] # time between logging entries
     else:
       self.logTime = 60 # logging information once per 60 sec
+    if "dataType" in BMdict: 
+      self.dataType = BMdict["dataType"] # float32, or raw ADC codes
+    else:                                #  int16 or int8 
+      self.dataType = 'float32'
+    if "latencyTarget" in BMdict: 
+      self.latencyTarget = BMdict["latencyTarget"] # max. dispatch latency (s)
+    else:
+      self.latencyTarget = 0.5E-3
+    if "preFilter" in BMdict: 
+      self.preFilterConf = BMdict["preFilter"] # first-level event filter
+    else:
+      self.preFilterConf = None
 
 # read device congiguration and set up Buffer space
     self.DevConf = DevConf  
@@ -63,20 +205,75 @@ class BufferMan(object):
     self.TSampling = DevConf.TSampling # sampling interval
 
     # function collecting data from hardware device
-    self.rawDAQproducer = DevConf.acquireDataBM 
+    self.approxTrgTime = False # event times are measured trigger times
+    if hasattr(DevConf, 'acqMode') and DevConf.acqMode == 'streaming':
+      self.NSegments = 1 # continuous data, software trigger
+      self.rawDAQproducer = DevConf.acquireDataBMstream
+    elif hasattr(DevConf, 'NSegments') and DevConf.NSegments > 1:
+      self.NSegments = DevConf.NSegments # triggers per readout (rapid-block)
+      self.rawDAQproducer = DevConf.acquireDataBMrapid
+      self.approxTrgTime = True # trigger times of segments are interpolated
+      if self.NSegments > self.NBuffers:
+        print('!!! BufferMan: NBuffers must not be smaller than NSegments')
+        sys.exit(1)
+    else:
+      self.NSegments = 1
+      self.rawDAQproducer = DevConf.acquireDataBM 
+
+# data type of buffers: Volts or raw ADC codes 
+    if self.dataType == 'float32':
+      ctyp = 'f'
+      self.ChanScale = np.ones(self.NChannels, dtype=np.float32)
+      self.ChanOffset = np.zeros(self.NChannels, dtype=np.float32)
+    elif self.dataType == 'int16' or self.dataType == 'int8':
+      ctyp = 'h' if self.dataType == 'int16' else 'b'
+     # conversion to Volts: V = code * ChanScale + ChanOffset
+      self.ChanScale = np.array(DevConf.ADCscale, dtype=np.float32)
+      if self.dataType == 'int8': # only most significant byte is stored
+        self.ChanScale *= 256.
+      self.ChanOffset = np.array(DevConf.ADCoffset, dtype=np.float32)
+    else:
+      print('!!! BufferMan: invalid dataType ' + self.dataType)
+      sys.exit(1)
+    self.dtype = np.dtype(self.dataType).type
 
 # data structure for BufferManager in shared c-type memory ...
-    self.CBMbuf = RawArray('f', 
+    self.CBMbuf = RawArray(ctyp, 
                   self.NBuffers * self.NChannels * self.NSamples) 
     self.CtimeStamp = RawArray('f', self.NBuffers )
     self.CtrigStamp = RawArray('i', self.NBuffers )
 #  ... and map to numpy arrays
-    self.BMbuf = np.frombuffer(self.CBMbuf, 'f').reshape(self.NBuffers, 
+    self.BMbuf = np.frombuffer(self.CBMbuf, self.dtype).reshape(self.NBuffers, 
         self.NChannels, self.NSamples)
     self.timeStamp = np.frombuffer(self.CtimeStamp, 'f')
-    self.trigStamp = np.frombuffer(self.CtrigStamp, 'f')
+    self.trigStamp = np.frombuffer(self.CtrigStamp, 'i')
 
-    self.ibufr = RawValue('i', -1) # read index, synchronization with producer 
+    self.CtPost = RawArray('d', self.NBuffers ) # time when handed to manager
+
+# first-level filter on buffer contents, applied for obligatory consumers
+    if self.preFilterConf is not None:
+      self.preFilter = PreFilter(self.preFilterConf, DevConf.picoChannels,
+                                 self.ChanScale, self.ChanOffset, self.dtype)
+    else:
+      self.preFilter = None
+    self.preFlag = RawArray('b', self.NBuffers) # 1: event passed preFilter
+
+# buffer indices circulate through two rings in shared memory:
+#   filled buffers in order of events and free buffers in order of release;
+#   buffers may be released in any order 
+    self.filledRing = RawArray('i', self.NBuffers)
+    self.iwrite = RawValue('l', 0)   # write cursor: next event to store
+    self.iread = RawValue('l', 0)    # read cursor: next event to dispatch
+    self.freeRing = RawArray('i', range(self.NBuffers))
+    self.ifree = RawValue('l', 0)    # next free buffer for producer
+    self.irelease = RawValue('l', self.NBuffers) # release cursor
+    self.slotState = RawArray('i', self.NBuffers) # number of holders, 0: free
+    self.ringLock = Lock() # protects release of buffers
+
+# semaphores (in shared memory) for event-driven synchronisation
+    self.freeBufs = Semaphore(self.NBuffers) # producer waits for free buffer
+    self.filledBufs = Semaphore(0)  # manager waits for new events
+    self.tWait = 0.1 # time-out (s) to check for end of run while waiting
 
 # global variables for producer statistics
     self.Ntrig = RawValue('i', 0)     # count number of readings
@@ -85,28 +282,39 @@ class BufferMan(object):
     self.readrate = RawValue('f', 0.) # current rate                
     self.lifefrac = RawValue('f', 0.) # current life-time
     self.BMT0 = RawValue('d', 0.)     # time of run-start
+    self.latency = RawValue('f', 0.)  # mean dispatch latency (s)
+    self.extEvNr = RawValue('b', 0)   # event numbers set by producer
 
 # set up variables for Buffer Manager status and accounting  
     self.tPause = 0.  # time when last paused
     self.dTPause = 0. # total time spent in paused state
     self.ACTIVE = RawValue('b', 0) 
     self.RUNNING = RawValue('b', 0)
+    self.NPause = RawValue('i', 0) # number of pauses, seen by producers
     self.STOPPED = False
 
-  # queues ( multiprocessing Queues for communication with sub-processes)
-    self.prod_Que = Queue(self.NBuffers) # acquireData <-> manageDataBuffer
-    self.request_Ques=[] # consumer request to manageDataBuffer
-                # 0:  request event pointer, obligatory consumer
-                # 1:  request event data, random consumer 
-                # 2:  request event data, obligatoray consumer
-    self.consumer_Ques=[] # data from manageDataBuffer to consumer
+  # clients of manageDataBuffer, all in shared memory
+    self.clientReq = [] # consumer request to manageDataBuffer
+                # -1: no request
+                #  1:  request event data, random consumer 
+    self.clientOblig = []  # obligatory consumer, gets all events
+    self.clientBufs = []   # ring of buffer indices delivered to client,
+    self.clientHead = []   #  read by client at head
+    self.clientTail = []   #  and written by manageDataBuffer at tail
+    self.clientSem = []    # signals new events to client
+    self.clientLock = []   # protects head of client ring
+    self.clientMaxLeases = [] # max. number of events held by client
+    self.held = {}  # events held by client in this process
+    self.clientSeq = {} # sequence number of last event taken by client
 
   # multiprocessing Queues for data transfer to subprocesses
     self.mpQues = []
+    self.displayPanels = [] # displays shown by display host
     self.BMInfoQue = None
 
     self.BMlock = threading.Lock() 
     self.logQ = None
+    self.BMIinterval = 1000.  # update interval of status info in ms
 
  # keep track of sub-processes started by BufferManager   
     self.procs=[] # list of sub-processes started by BufferMan
@@ -127,7 +335,10 @@ class BufferMan(object):
 
        Arg: funtion handling data acquisition from device
 
-    Communicates with consumer via multiprocessing.Queue()
+    Communicates with manageDataBuffer via ring cursors in shared memory
+
+    rawDAQproducer returns time of trigger and life time, and optionally
+    the event number(s) to be used instead of the trigger count
 
     '''
 #    self.prlog('*==* BufMan:  !!! acquireData starting')
@@ -136,15 +347,15 @@ class BufferMan(object):
     ni = 0       # temporary variable
     ts = time.time()
   
-    ibufw = -1   # buffer index
     while self.ACTIVE.value:
   # sample data from Picoscope handled by instance ps
-      ibufw = (ibufw + 1) % self.NBuffers # next write buffer
-      while ibufw==self.ibufr.value:  # wait for consumer done with this buffer
-        if not self.ACTIVE.value: 
+      ibufs = [] # next buffer(s), one per trigger
+      while len(ibufs) < self.NSegments:
+        if not self.waitFor(self.freeBufs): # wait for consumers done w. buffer
           if self.verbose: self.prlog ('*==* BufMan.acquireData()  ended')
           return
-        time.sleep(0.0005)
+        ibufs.append(self.freeRing[self.ifree.value % self.NBuffers])
+        self.ifree.value += 1
 #
       while not self.RUNNING.value:   # wait for running status 
         if not self.ACTIVE.value: 
@@ -153,29 +364,44 @@ class BufferMan(object):
         time.sleep(0.01)
 
 # data acquisition from hardware
-      e = self.rawDAQproducer(self.BMbuf[ibufw])
+      for ibufw in ibufs:
+        self.trigStamp[ibufw] = 0 # invalidate buffer content while writing
+      if self.NSegments == 1:
+        e = self.rawDAQproducer(self.BMbuf[ibufs[0]])
+      else: # rapid-block mode, several triggers per readout
+        e = self.rawDAQproducer([self.BMbuf[ibufw] for ibufw in ibufs])
       if e == None: 
         if self.verbose: self.prlog('*==* BufMan.acquireData()  ended')
         return
-      ttrg, tl = e
+      if len(e) > 2: # producer provides event numbers, e.g. from file
+        ttrgs, tl, evNrs = e
+        self.extEvNr.value = 1
+      else:
+        ttrgs, tl = e
+        evNrs = None
+      if self.NSegments == 1: 
+        ttrgs = [ttrgs]
+        evNrs = [evNrs]
+      elif evNrs is None:
+        evNrs = [None for ibufw in ibufs]
       tlife += tl
       self.Tlife.value += tl
-      ttrg -= self.BMT0.value
-      self.timeStamp[ibufw] = ttrg  # store time when data became ready
-      self.Ttrig.value = ttrg
-      self.Ntrig.value += 1
-      self.trigStamp[ibufw]=self.Ntrig.value
-      self.prod_Que.put( ibufw )
-       
-# wait for free buffer       
-      while self.prod_Que.qsize() == self.NBuffers:
-        if not self.ACTIVE.value: 
-          if self.verbose: self.prlog('*==* BufMan.acquireData()  ended')
-          return
-        time.sleep(0.0005)
+      for ibufw, ttrg, evNr in zip(ibufs, ttrgs, evNrs):
+        ttrg -= self.BMT0.value
+        self.timeStamp[ibufw] = ttrg  # store time when data became ready
+                                      #  (approximate if approxTrgTime)
+        self.Ttrig.value = ttrg
+        self.Ntrig.value += 1
+        if evNr is None: evNr = self.Ntrig.value
+        self.trigStamp[ibufw] = evNr
+        self.CtPost[ibufw] = time.time()
+        self.slotState[ibufw] = 1 # held by manageDataBuffer until dispatched
+        self.filledRing[self.iwrite.value % self.NBuffers] = ibufw
+        self.iwrite.value += 1
+        self.filledBufs.release()
       
 # calculate life time and read rate
-      if (self.Ntrig.value - ni) == 10:
+      if (self.Ntrig.value - ni) >= 10:
         dt = time.time()-ts
         ts += dt
         self.readrate.value = (self.Ntrig.value-ni)/dt
@@ -197,69 +423,74 @@ class BufferMan(object):
 
     '''
     t0=time.time()
-    n0=0
     n=0
+    nw = 0      # number of wake-ups, sum and maximum of their latencies
+    dtsum = 0.
+    dtmax = 0.
     while self.ACTIVE.value:
-      while self.prod_Que.empty(): # wait for pointer to data in producer queue
-        if not self.ACTIVE.value:
-          if self.verbose: self.prlog('*==* BufMan ended')
-          return
-        time.sleep(0.0005)
-      self.ibufr.value = self.prod_Que.get()
-      evNr = self.trigStamp[self.ibufr.value]
-      evTime=self.timeStamp[self.ibufr.value]
+      tw = time.time()
+      if not self.waitFor(self.filledBufs): # wait for event from producer
+        break
+      ibufr = self.filledRing[self.iread.value % self.NBuffers]
+      evNr = self.trigStamp[ibufr]
+      evTime=self.timeStamp[ibufr]
+      tPost = self.CtPost[ibufr]
+      if tPost > tw: # was waiting for producer, account wake-up latency
+        dt = time.time() - tPost
+        nw += 1
+        dtsum += dt
+        dtmax = max(dt, dtmax)
  
-# check if other threads or sup-processes request data
-#     next request treated as "done" for obligatory consumers
-      l_obligatory=[]
-      if len(self.request_Ques):
-        for i, Q in enumerate(self.request_Ques):
-          if not Q.empty():
-            req = Q.get()
-            if req==0:                          # return poiner to Buffer      
-              self.consumer_Ques[i].put( self.ibufr.value ) 
-              l_obligatory.append(i)
-            elif req==1:                               # return a copy of data
-              self.consumer_Ques[i].put( (evNr, evTime, 
-                    self.BMbuf[self.ibufr.value]) ) 
-            elif req==2:                   # return copy and mark as obligatory
-              self.consumer_Ques[i].put( (evNr, evTime, 
-                      BMbuf[self.ibufr.value]) ) 
-              l_obligatory.append(i)
-            else:
-              self.prlog('!=! manageDataBuffer: invalid request mode', req)
-              sys.exit(1)
+# first-level filter: rejected events are not given to obligatory 
+#   consumers, in monitor mode the decision is only recorded
+      passed = True
+      if self.preFilter is not None:
+        passed = self.preFilter(self.BMbuf[ibufr])
+        self.preFlag[ibufr] = passed
+        if self.preFilter.monitor: passed = True
+
+# deliver event to all obligatory consumers and to random consumers 
+#   with pending request; the event stays in the ring until released by
+#   all consumers, while dispatching continues with the next event
+      l_deliver=[]
+      for i in range(len(self.clientReq)):
+        if (self.clientOblig[i].value and passed) \
+           or self.clientReq[i].value == 1:
+          l_deliver.append(i)
+      self.slotState[ibufr] += len(l_deliver) # protected by own hold
+      for i in l_deliver:
+        self.clientBufs[i][self.clientTail[i].value % self.NBuffers] = ibufr
+        self.clientTail[i].value += 1
+        self.clientReq[i].value = -1
+        self.clientSem[i].release()
               
-# provide data via a mp-Queue at lower priority 
-      if len(self.mpQues):
-###                 only if Buffer is not full
-#      if len(self.mpQues) and self.prod_Que.qsize() <= self.NBuffers/2 :
-        for Q in self.mpQues:
-          if Q.empty(): # put an event in the Queue
-            Q.put( (evNr, evTime, self.BMbuf[self.ibufr.value] ) )
-
-# wait until all obligatory consumers are done
-      if len(l_obligatory):
-        while self.ACTIVE.value:
-          done = True
-          for i in l_obligatory:
-            if self.request_Ques[i].empty(): done = False
-          if done: break
-          if not self.ACTIVE.value: 
-            if self.verbose: self.prlog('*==* BufMan ended')
-            return
-          time.sleep(0.0005)        
-#  signal to producer that all consumers are done with this event
-      self.ibufr.value = -1
+# provide handle to data via a mp-Queue if requested
+      for Q in self.mpQues:
+        Q.put(evNr, evTime, ibufr)
+
+#  done with this event, free buffer if no consumer holds it 
+      self.iread.value += 1
+      self.releaseBuffer(ibufr)
 
 # print event rate
       n+=1
       if time.time()-t0 >= self.logTime:
         t0 = time.time()
+        if nw: self.latency.value = dtsum/nw
         if self.verbose:
           self.prlog('evt %i:  rate: %.3gHz   life: %.2f%%' %(n,
                       self.readrate.value, self.lifefrac.value) )
-        if(evNr != n): 
+          self.prlog('      latency: %.3gms (max %.3gms)' %(
+                      self.latency.value*1E3, dtmax*1E3) )
+          if self.preFilter is not None: 
+            self.prlog('      ' + self.preFilter.summary())
+        if self.latency.value > self.latencyTarget:
+          self.prlog('!!! manageDataBuffer: latency above target %.3gms'\
+                      %(self.latencyTarget*1E3) )
+        nw = 0
+        dtsum = 0.
+        dtmax = 0.
+        if not self.extEvNr.value and evNr != n: 
           self.prlog("!!! manageDataBuffer error: ncnt != Ntrig: %i, %i"%(n,
           evNr) )
 #   - end while ACTIVE  
@@ -270,35 +501,53 @@ class BufferMan(object):
 
 # -- helper functions for interaction with BufferManager
 
-  def BMregister(self):
+  def BMregister(self, maxLeases=1):
     ''' 
     register a client to Buffer Manager
 
+    Args:
+      maxLeases: maximum number of events held at a time via leaseEvent()
+
     Returns: client index
     '''
 
+    if maxLeases >= self.NBuffers:
+      self.prlog('!=! BMregister: maxLeases must be smaller than NBuffers')
+      maxLeases = self.NBuffers - 1
+
     self.BMlock.acquire() # called by many processes, needs protection ...  
-    self.request_Ques.append(Queue(1))
-    self.consumer_Ques.append(Queue(1))
-    client_index=len(self.request_Ques)-1
+    self.clientReq.append(RawValue('i', -1))
+    self.clientOblig.append(RawValue('b', 0))
+    self.clientBufs.append(RawArray('i', self.NBuffers))
+    self.clientHead.append(RawValue('l', 0))
+    self.clientTail.append(RawValue('l', 0))
+    self.clientSem.append(Semaphore(0))
+    self.clientLock.append(Lock())
+    self.clientMaxLeases.append(maxLeases)
+    client_index=len(self.clientReq)-1
     self.BMlock.release()
   
     if self.verbose:
       self.prlog("*==* BMregister: new client id=%i" % client_index)
     return client_index
 
-  def BMregister_mpQ(self):
+  def BMregister_mpQ(self, withData=True, raw=False):
 #   multiprocessing Queue
     ''' 
     register a subprocess to Buffer Manager
     
-    data will be transferred via a multiprocess Queue
-    
+    event handles will be transferred via a multiprocess Queue, 
+    data are read from shared memory by the subprocess
+
+    Args:
+      withData: if False, only event number and time are delivered
+      raw: deliver ADC codes if dataType is int16 or int8, else Volts
+
     Returns: client index
-             multiprocess Queue
+             BMmpQue instance, get() returns (evNr, evTime, evData)
     '''
 
-    self.mpQues.append( Queue(1) )
+    self.mpQues.append( BMmpQue(self, withData, raw) )
     cid=len(self.mpQues)-1
   
     if self.verbose:
@@ -322,20 +571,125 @@ class BufferMan(object):
         event data
     '''
 
-    self.request_Ques[client_index].put(mode)
-    cQ=self.consumer_Ques[client_index]
-    while cQ.empty():
-      if not self.ACTIVE.value: return
-      time.sleep(0.0005)
-    #self.prlog('*==* getEvent: received event %i'%evNr)
-    if mode !=0: # received copy of the event data
-      return cQ.get()
-    else: # received pointer to event buffer
-      ibr = cQ.get()
-      evNr = self.trigStamp[ibr]
-      evTime = self.timeStamp[ibr]
+    # next request treated as "done" with previous event(s), incl. leases
+    self.releaseEvents(client_index)
+
+    if mode == 0 or mode == 2: 
+      self.clientOblig[client_index].value = 1
+    elif mode == 1:
+      self.clientReq[client_index].value = mode
+    else:
+      self.prlog('!=! getEvent: invalid request mode %i' % mode)
+      sys.exit(1)
+
+    ibr = self.nextEvent(client_index)
+    if ibr is None: return 
+    evNr = self.trigStamp[ibr]
+    evTime = self.timeStamp[ibr]
+    if mode !=0: # copy event data and release buffer
+      evData = np.array(self.BMbuf[ibr])
+      self.releaseBuffer(ibr)
+    else: # pointer to event buffer, released with next request
       evData = self.BMbuf[ibr]
-      return evNr, evTime, evData
+      self.held.setdefault(client_index, []).append(ibr)
+    return evNr, evTime, evData
+
+  def toVolts(self, evData):
+    '''convert event data to Volts
+
+       Args: event data, raw ADC codes or Volts
+       Returns: event data in Volts
+    '''
+    if self.dtype == np.float32: return evData
+    return evData * self.ChanScale[:, None] + self.ChanOffset[:, None]
+
+  def openEventFile(self, fname, userConf=None, chunkSize=64):
+    '''open binary file to record events as stored in buffers
+
+       Args: file name, configuration of consumer stored in file header,
+             number of events written at once
+       Returns: EventFileWriter instance, events added via write()
+    '''
+    return EventFileWriter(fname, self.DevConf.OscConfDict, 
+                           self.NChannels, self.NSamples, self.dataType,
+                           self.ChanScale, self.ChanOffset, 
+                           userConf, chunkSize)
+
+# -- leases: obligatory clients holding several events at a time
+  def leaseEvent(self, client_index, block=True):
+    ''' 
+    check out next event for obligatory client, events already
+    held by the client are kept (up to maxLeases, see BMregister())
+    
+      Arguments: 
+
+        client_index client:  index as returned by BMregister()
+        block: if False, return immediately if no event is pending
+
+      Returns: 
+
+        lease handle, event number, event time and pointer to event data,
+        None if Buffer Manager no longer active or no event pending
+
+    several processes may lease events with the same client index, 
+    each event is given to one of them; clientSeq[client_index] holds 
+    the sequence number (0, 1, ... in order of dispatch to the client) 
+    of the event just leased, e.g. to restore the order of results
+    '''
+
+    nheld = len(self.held.get(client_index, []))
+    if nheld >= self.clientMaxLeases[client_index]:
+      raise RuntimeError('leaseEvent: client %i already holds %i events'\
+                          %(client_index, nheld) )
+
+    self.clientOblig[client_index].value = 1
+    ibr = self.nextEvent(client_index, block)
+    if ibr is None: return 
+    self.held.setdefault(client_index, []).append(ibr)
+    return ibr, self.trigStamp[ibr], self.timeStamp[ibr], self.BMbuf[ibr]
+
+  def releaseEvent(self, client_index, handle):
+    ''' 
+    return an event checked out with leaseEvent() to the Buffer Manager,
+    leases may be released in any order
+
+      Arguments: 
+
+        client_index client:  index as returned by BMregister()
+        handle: lease handle as returned by leaseEvent()
+    '''
+    self.held[client_index].remove(handle)
+    self.releaseBuffer(handle)
+
+  def nextEvent(self, client_index, block=True):
+    '''wait for next event delivered to client
+
+       Returns: buffer index of event or None if no longer active
+                (or no event pending and block is False)
+    '''
+    if block:
+      if not self.waitFor(self.clientSem[client_index]): return
+    elif not self.clientSem[client_index].acquire(False): return
+    with self.clientLock[client_index]:
+      head = self.clientHead[client_index]
+      ibuf = self.clientBufs[client_index][head.value % self.NBuffers]
+      self.clientSeq[client_index] = head.value
+      head.value += 1
+    return ibuf
+
+  def releaseEvents(self, client_index):
+    '''release all events held by client in this process'''
+    for ibuf in self.held.pop(client_index, []):
+      self.releaseBuffer(ibuf)
+
+  def releaseBuffer(self, ibuf):
+    '''drop one hold on buffer ibuf, return to producer if no longer in use'''
+    with self.ringLock:
+      self.slotState[ibuf] -= 1
+      if self.slotState[ibuf] == 0:
+        self.freeRing[self.irelease.value % self.NBuffers] = ibuf
+        self.irelease.value += 1
+        self.freeBufs.release() # signal free buffer to producer
 
 #-- Run control fuctions
 # set-up Buffer Manager processes
@@ -363,23 +717,32 @@ class BufferMan(object):
 #   connects daq producer and clients)
     self.start_manageDataBuffer = True
 
-  # BufferMan Info and control always started
-    self.logQ = Queue()
-    maxBMrate = 450.
-    self.BMIinterval = 1000.  # update interval in ms
-    self.procs.append(Process(name='BufManCntrl',
-      target = mpBufManCntrl, 
-      args=(self.getBMCommandQue(), self.logQ, self.getBMInfoQue(), 
-#                  cmdQ             BM_logQue       BM_InfoQue      
-            maxBMrate, self.BMIinterval) ) )
-#             max_rate   update_interval
+  # BufferMan Info and control
+    if 'mpBufInfo' in self.BMmodules: 
+      self.logQ = Queue()
+      maxBMrate = 450.
+      prc = self.addDisplay('BufManCntrl', 'mpBufManCntrl', 
+        (self.getBMCommandQue(), self.logQ, self.getBMInfoQue(), 
+#                    cmdQ             BM_logQue       BM_InfoQue      
+              maxBMrate, self.BMIinterval) )
+#               max_rate   update_interval
+      if prc is not None: self.procs.append(prc)
 
   # waveform display 
     if 'mpOsci' in self.BMmodules: 
       OScidx, OSmpQ = self.BMregister_mpQ()
-      self.procs.append(Process(name='Osci', target = mpOsci, 
-        args=(OSmpQ, self.DevConf.OscConfDict, 100., 'event rate') ) )
+      prc = self.addDisplay('Osci', 'mpOsci', 
+        (OSmpQ, self.DevConf.OscConfDict, 100., 'event rate') )
 #                                            interval
+      if prc is not None: self.procs.append(prc)
+
+  # density of many waveforms (persistence display)
+    if 'mpDensityOsci' in self.BMmodules: 
+      DOcidx, DOmpQ = self.BMregister_mpQ()
+      prc = self.addDisplay('DensityOsci', 'mpDensityOsci', 
+        (DOmpQ, self.DevConf.OscConfDict, 100., 'density') )
+#                                            interval
+      if prc is not None: self.procs.append(prc)
 # start BufferMan background processes   
     for prc in self.procs:
 #      prc.deamon = True
@@ -388,6 +751,25 @@ class BufferMan(object):
         print('      BufferMan: starting process ', prc.name, ' PID =', prc.pid)
 #  end start()
 
+  def addDisplay(self, name, target, args):
+    '''start a display module (mpOsci, mpRMeter, ...)
+
+       with option displayHost, the display is shown as a tab of the
+       display host, started in run(), otherwise as sub-process
+
+       Args: name of process, display function (or name of 
+             display module in picodaqa) and its arguments
+       Returns: sub-process (not yet started) or None
+    '''
+    modName = target.__name__ if callable(target) else target
+    if self.displayHost:
+      self.displayPanels.append( (modName, args) )
+      return None
+    if not callable(target): # import graphics only when needed
+      target = getattr(import_module('.' + modName, 
+                         __name__.rpartition('.')[0]), modName)
+    return Process(name=name, target=target, args=args)
+
 # start run - this must not be started before all clients have registred
   def run(self):
     # start manageDataBuffer process and initialize run 
@@ -402,8 +784,21 @@ class BufferMan(object):
 
     if self.verbose: self.prlog('*==* BufferMan T0')
     self.BMT0.value = tstart
+    if self.approxTrgTime:
+      self.prlog('!!! BufferMan: event times of rapid-block segments ' +
+                 'are approximate')
     if self.verbose: self.prlog('*==* BufferMan start running')
 
+    if self.displayPanels: # all displays known, start display host
+      from .mpDisplayHost import mpDisplayHost
+      self.procs.append(Process(name='DisplayHost', target=mpDisplayHost,
+                                args=(self.displayPanels,) ) )
+      self.procs[-1].start()    
+      self.displayPanels = []
+      if self.verbose:
+        print('      BufferMan: starting process ',
+             self.procs[-1].name, ' PID =', self.procs[-1].pid)
+
     if self.start_manageDataBuffer: # delayed start of manageDataBuffer
       self.procs.append(Process(name='manageDataBuffer', 
                                  target=self.manageDataBuffer) )
@@ -426,6 +821,7 @@ class BufferMan(object):
       return
     if self.verbose: self.prlog('*==* BufferMan  pause')
     self.RUNNING.value = False  
+    self.NPause.value += 1
     self.tPause = time.time()
     self.readrate.value = 0.
 
@@ -443,6 +839,12 @@ class BufferMan(object):
     self.dTPause += (time.time() - self.tPause)  
     self.tPause = 0.
 
+  def waitFor(self, sem):
+    '''wait for semaphore, returns False if BufferMan no longer active'''
+    while not sem.acquire(True, self.tWait):
+      if not self.ACTIVE.value: return False
+    return True
+
   def setverbose(self, vlevel):
     self.verbose = vlevel
 
@@ -469,8 +871,11 @@ class BufferMan(object):
    # keyboard input as thread
 
     while self.ACTIVE.value:
-      self.kbdtxt =\
-       get_input(30*' '+'type -> E(nd), P(ause), S(top) or R(esume) + <ret> ')
+      try:
+        self.kbdtxt =\
+         get_input(30*' '+'type -> E(nd), P(ause), S(top) or R(esume) + <ret> ')
+      except EOFError: # no terminal (e.g. background service)
+        return
 
   def kbdCntrl(self):
     ''' 
@@ -525,7 +930,8 @@ class BufferMan(object):
           tuple: Running status, number of events,
                  time of last event, rate, life fraction and buffer level
     '''
-    bL = (self.prod_Que.qsize()*100)/self.NBuffers
+    bL = ((self.NBuffers + self.ifree.value - self.irelease.value)*100)\
+          /self.NBuffers
     stat = self.RUNNING.value
     if self.tPause != 0. :
       t = self.tPause
@@ -587,6 +993,8 @@ class BufferMan(object):
     self.prlog('  Trun=%.1fs  Ntrig=%i  Tlife=%.1fs\n'\
           %(self.TStop - self.BMT0.value - self.dTPause, 
             self.Ntrig.value, self.Tlife.value) )
+    if self.preFilter is not None: 
+      self.prlog('  ' + self.preFilter.summary())
     self.flog.close()
     self.flog = None
 
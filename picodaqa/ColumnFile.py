@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+'''
+.. module ColumnFile of picoDAQ
+
+  compact binary file for tables of analysis results (e.g. accepted
+  pulses), written in blocks while running; values are stored column
+  by column within each block, a whole file is read in one go
+
+  file layout:
+
+    - magic string 'picoDAQcol1' (16 bytes, zero padded)
+    - length of header (8 bytes, little-endian integer)
+    - header as yaml text: schema (column names, data types and
+      shapes) and configuration of the writing consumer (userConf)
+    - blocks: number of rows (8 bytes), followed by the data of
+      each column for all rows of the block
+    - optional trailer: negative length of text (8 bytes),
+      followed by summary information as yaml text
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import os, struct, yaml, numpy as np
+
+from .EventFile import plainTypes
+
+MAGIC = b'picoDAQcol1'.ljust(16, b'\0')
+
+def schema(dtype):
+  '''list of columns [name, data type, shape] of a structured type'''
+  cols = []
+  for name in dtype.names:
+    t = dtype.fields[name][0]
+    shape = list(t.shape)
+    t = t.base if shape else t
+    cols.append([name, t.newbyteorder('<').str, shape])
+  return cols
+
+def schemaType(cols):
+  '''structured numpy type from schema'''
+  return np.dtype([(name, t, tuple(shape)) for name, t, shape in cols])
+
+def isColumnFile(fname):
+  '''check for magic string at start of file'''
+  with open(fname, 'rb') as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+class ColumnFileWriter(object):
+  '''
+  write rows of a table to a binary column file
+
+    rows are collected in a structured array and written as a block
+    of columns when the block is full
+  '''
+
+  def __init__(self, fname, dtype, userConf=None, blockSize=4096):
+    '''Args:
+         fname: file name
+         dtype: structured numpy type of rows
+         userConf: configuration of writing consumer, stored in header
+         blockSize: number of rows written at once
+    '''
+    self.fname = fname
+    self.dtype = np.dtype(dtype)
+    self.header = {'columns': schema(self.dtype), 'userConf': userConf}
+    htxt = yaml.dump(plainTypes(self.header),
+                     default_flow_style=None).encode('utf-8')
+    self.f = open(fname, 'wb')
+    self.f.write(MAGIC)
+    self.f.write(struct.pack('<q', len(htxt)))
+    self.f.write(htxt)
+    self.f.flush()
+
+    self.block = np.zeros(blockSize, dtype=self.dtype)
+    self.nblock = 0 # rows in block
+    self.NRows = 0  # rows written
+
+  def write(self, row):
+    '''add one row (tuple of values for all columns)'''
+    self.block[self.nblock] = row
+    self.nblock += 1
+    self.NRows += 1
+    if self.nblock == len(self.block): self.flush()
+
+  def flush(self):
+    '''write collected rows to file'''
+    if self.nblock:
+      b = self.block[:self.nblock]
+      self.f.write(struct.pack('<q', self.nblock))
+      for name in self.dtype.names:
+        self.f.write(np.ascontiguousarray(b[name],
+                       dtype=b[name].dtype.newbyteorder('<')).tobytes())
+      self.nblock = 0
+    self.f.flush()
+
+  def close(self, summary=None):
+    '''write remaining rows and optional summary (dictionary)'''
+    self.flush()
+    if summary is not None:
+      stxt = yaml.dump(plainTypes(summary),
+                       default_flow_style=None).encode('utf-8')
+      self.f.write(struct.pack('<q', -len(stxt)))
+      self.f.write(stxt)
+    self.f.close()
+# - end class ColumnFileWriter
+
+def readColumnFile(fname):
+  '''
+    read complete column file
+
+    Returns: header (dict), rows (structured array),
+             summary (dict or None)
+  '''
+  with open(fname, 'rb') as f:
+    buf = f.read()
+  if buf[:len(MAGIC)] != MAGIC:
+    raise IOError('ColumnFile: ' + fname + ' is not a column file')
+  pos = len(MAGIC)
+  lhead, = struct.unpack_from('<q', buf, pos)
+  pos += 8
+  header = yaml.safe_load(buf[pos:pos+lhead].decode('utf-8'))
+  pos += lhead
+  dtype = schemaType(header['columns'])
+  coltypes = [(name, dtype.fields[name][0]) for name in dtype.names]
+
+  blocks = {name: [] for name in dtype.names}
+  summary = None
+  while pos + 8 <= len(buf):
+    n, = struct.unpack_from('<q', buf, pos)
+    pos += 8
+    if n < 0: # trailer with summary
+      summary = yaml.safe_load(buf[pos:pos-n].decode('utf-8'))
+      break
+    size = n * sum([t.itemsize for name, t in coltypes])
+    if pos + size > len(buf): break # incomplete block (still writing)
+    for name, t in coltypes:
+      a = np.frombuffer(buf, dtype=t.base, 
+                        count=n * t.itemsize // t.base.itemsize, offset=pos)
+      blocks[name].append(a.reshape((n,) + t.shape))
+      pos += n * t.itemsize
+
+  NRows = sum([len(b) for b in blocks[dtype.names[0]]])
+  rows = np.zeros(NRows, dtype=dtype)
+  for name in dtype.names:
+    if NRows: rows[name] = np.concatenate(blocks[name])
+  return header, rows, summary
+
+def toCSV(fname, csvname=None):
+  '''
+    convert column file to CSV, columns with several entries
+    (e.g. one per channel) are expanded to name_0, name_1, ...
+
+    Returns: name of CSV file
+  '''
+  if csvname is None: csvname = os.path.splitext(fname)[0] + '.csv'
+  header, rows, summary = readColumnFile(fname)
+  names = []
+  cols = []
+  fmts = []
+  for name in rows.dtype.names:
+    c = rows[name].reshape( (len(rows),
+                int(np.prod(rows.dtype[name].shape or (1,)))) )
+    if c.dtype.kind in 'iub':
+      fmt = '%i'
+    else:
+      fmt = '%.9g' if c.dtype.itemsize > 4 else '%.6g'
+    if rows.dtype.fields[name][0].shape:
+      names += ['%s_%i'%(name, i) for i in range(c.shape[1])]
+    else:
+      names.append(name)
+    cols.append(c.astype(np.float64))
+    fmts += [fmt] * c.shape[1]
+  with open(csvname, 'w') as f:
+    print(', '.join(names), file=f)
+    if len(rows):
+      np.savetxt(f, np.hstack(cols), fmt=fmts, delimiter=', ')
+    if summary is not None:
+      for l in yaml.dump(summary, default_flow_style=False).splitlines():
+        print('# ' + l, file=f)
+  return csvname
@@ -5,6 +5,8 @@ from __future__ import absolute_import
 import time, numpy as np
 import matplotlib.pyplot as plt
 
+from .History import History
+
 class DataGraphs(object):
   ''' Bar graph display of average over samples '''
 
@@ -40,68 +42,71 @@ class DataGraphs(object):
     self.Ti = self.dT* np.linspace(-self.Npoints+1, 0, self.Npoints) 
     self.ind = self.bwidth + np.arange(self.NChan) # bar position for voltages
   # 
-    self.Vhist = np.zeros( [self.NChan, self.Npoints] )
-    self.d = np.zeros( [self.NChan, self.Npoints] ) 
+    self.Vhist = History(self.Npoints, self.NChan)
 
 # set up a figure to plot actual voltage and samplings from Picoscope
+    if self.NChan <= 2:
+      nrows, ntxt = 6, 1
+    else: # 2nd history plot and more lines of text for 3-4 channels
+      nrows, ntxt = 9, 2
     if self.XYmode:
-      fig = plt.figure("DataGraphs", figsize=(10., 5.5) )
+      fig = plt.figure("DataGraphs", figsize=(10., 5.5 * nrows/6.) )
       fig.subplots_adjust(left=0.09, bottom=0.1, right=0.975, top=0.94,
                           wspace=3.5, hspace=.25)
+      grid = (nrows, 5)
+      cspan = 2
     else:
-      fig = plt.figure("DataGraphs", figsize=(4., 5.3) )
+      fig = plt.figure("DataGraphs", figsize=(4., 5.3 * nrows/6.) )
       fig.subplots_adjust(left=0.2, bottom=0.08, right=0.8, top=0.94,
                   wspace=None, hspace=.25)
+      grid = (nrows, 1)
+      cspan = 1
 
     axes=[]
 
-  # history plot
-    if self.XYmode:
-      axes.append(plt.subplot2grid((6,5),(4,0), rowspan=2, colspan=2) )
-    else:
-      axes.append(plt.subplot2grid((6,1),(4,0), rowspan=2) )
-    if self.NChan > 1:
-      axes.append(axes[0].twinx())
+  # history plots, two channels per plot
+    for i in range(0, self.NChan, 2):
+      axes.append(plt.subplot2grid(grid, (ntxt+3+i,0), rowspan=2, 
+                                   colspan=cspan) )
+      if i+1 < self.NChan:
+        axes.append(axes[-1].twinx())
 
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break # works for a maximum of 2 Channels only
       axes[i].set_ylim(*self.ChanLim[i])
       axes[i].set_ylabel('Chan ' + C + ' ' + sigName, color=self.ChanColors[i])
       axes[i].grid(True, color=self.ChanColors[i], linestyle = '--', alpha=0.3)
-    axes[0].set_xlabel('History (s)', size='x-large')
-
-  # barchart
-    if self.XYmode:
-      axes.append(plt.subplot2grid((6,5),(1,0), rowspan=3, colspan=2) )
-    else:
-      axes.append(plt.subplot2grid((6,1),(1,0), rowspan=3) )
-    axbar1 = axes[-1]
-    axbar1.set_frame_on(False)
-    if self.NChan > 1:
-      axbar2=axbar1.twinx()
-      axbar2.set_frame_on(False)
+    if self.NChan > 2:
+      axes[0].set_xticklabels([])
+    axes[2*((self.NChan-1)//2)].set_xlabel('History (s)', size='x-large')
+
+  # barchart, channels 3 and 4 scaled to channel range without axis
+    axes.append(plt.subplot2grid(grid, (ntxt,0), rowspan=3, colspan=cspan) )
+    axbars = [axes[-1]]
+    for i in range(1, self.NChan):
+      axbars.append(axbars[0].twinx())
+    for i, ax in enumerate(axbars):
+      ax.set_frame_on(False)
+      ax.set_ylim(*self.ChanLim[i])
+      if i > 1:
+        ax.get_yaxis().set_visible(False)
+    axbar1 = axbars[0]
     axbar1.get_xaxis().set_visible(False)
     axbar1.set_xlim(0., self.NChan)
     axbar1.axvline(0, color = self.ChanColors[0])
     if self.NChan > 1:
       axbar1.axvline(self.NChan, color = self.ChanColors[1])
-    axbar1.set_ylim(*self.ChanLim[0])
     axbar1.axhline(0., color='k', linestyle='-', lw=2, alpha=0.5)
-    axbar1.set_ylabel('Chan A ' + sigName, size='x-large', 
-       color = self.ChanColors[0])
+    axbar1.set_ylabel('Chan ' + self.ChanNams[0] + ' ' + sigName, 
+       size='x-large', color = self.ChanColors[0])
     axbar1.grid(True, color=self.ChanColors[0], linestyle = '--', alpha=0.3)
     if self.NChan > 1:
-      axbar2.set_ylim(*self.ChanLim[1])
-      axbar2.set_ylabel('Chan B ' + sigName, size='x-large', 
-          color = self.ChanColors[1])
-      axbar2.grid(True, color=self.ChanColors[0], linestyle = '--', alpha=0.3)
+      axbars[1].set_ylabel('Chan ' + self.ChanNams[1] + ' ' + sigName, 
+          size='x-large', color = self.ChanColors[1])
+      axbars[1].grid(True, color=self.ChanColors[0], linestyle = '--', 
+          alpha=0.3)
 
   # Voltage in Text format
-    if self.XYmode:
-      axes.append(plt.subplot2grid((6,5), (0,0), rowspan=1, colspan=2) )
-    else:
-      axes.append(plt.subplot2grid((6,1), (0,0)) )
+    axes.append(plt.subplot2grid(grid, (0,0), rowspan=ntxt, colspan=cspan) )
     axtxt=axes[-1]
     axtxt.set_frame_on(False)
     axtxt.get_xaxis().set_visible(False)
@@ -110,7 +115,7 @@ class DataGraphs(object):
 
   # XY display
     if self.XYmode:
-      axes.append(plt.subplot2grid((6,5),(0,2), rowspan=6, colspan=3) )
+      axes.append(plt.subplot2grid(grid, (0,2), rowspan=nrows, colspan=3) )
       axXY = axes[-1]
       axXY.set_xlim(*self.ChanLim[0])
       axXY.set_ylim(*self.ChanLim[1])
@@ -125,9 +130,7 @@ class DataGraphs(object):
 
     self.fig = fig
     self.axes = axes
-    self.axbar1 = axbar1
-    if self.NChan > 1:
-      self.axbar2 = axbar2
+    self.axbars = axbars
     self.axtxt = axtxt
     self.axXY = axXY
 # -- end def grVMeterIni
@@ -136,16 +139,14 @@ class DataGraphs(object):
   # initialize objects to be animated
 
   # a bar graph for the actual voltages
-    self.bgraph1, = self.axbar1.bar(self.ind[0], 0. , self.bwidth,
-       align='center', color = self.ChanColors[0], alpha=0.5) 
-    if self.NChan > 1:
-      self.bgraph2, = self.axbar2.bar(self.ind[1], 0. , self.bwidth,
-          align='center', color = self.ChanColors[1], alpha=0.5) 
+    self.bgraphs = ()
+    for i, ax in enumerate(self.axbars):
+      b, = ax.bar(self.ind[i], 0. , self.bwidth,
+         align='center', color = self.ChanColors[i], alpha=0.5) 
+      self.bgraphs += (b,)
   # history graphs
     self.graphs=()
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break  # max. of 2 channels
       g,= self.axes[i].plot(self.Ti, np.zeros(self.Npoints), 
           color=self.ChanColors[i])
       self.graphs += (g,)
@@ -159,11 +160,8 @@ class DataGraphs(object):
 
     self.t0=time.time() # remember start time
 
-    if self.NChan > 1 :
-      return (self.bgraph1,) + (self.bgraph2,) + self.graphs + (self.animtxt,)  
-    else:
+    return self.bgraphs + self.graphs + (self.animtxt,)  
 # -- end DataGraphs.init()
-      return (self.bgraph1,) + self.graphs + (self.animtxt,)  
 
   def __call__( self, data ):
     # update graphics with actual data
@@ -172,38 +170,25 @@ class DataGraphs(object):
       if n == 0:
         return self.init()
 
-      k = n % self.Npoints
+      self.Vhist.append(dat[:self.NChan])
       txt=[]
       for i, C in enumerate(self.ChanNams):
-        if i > 1: 
-          break  # works for 2 channels only
-        self.Vhist[i, k] = dat[i]
-    # update history graph
-        if n>1: # !!! fix to avoid permanent display of first object in blit mode
-          self.d[i] = np.concatenate((self.Vhist[i, k+1:], self.Vhist[i, :k+1]), axis=0)
-          self.graphs[i].set_data(self.Ti, self.d[i])
-          if self.XYmode:
-            self.graphs[-1].set_data(self.d[0], self.d[1])
-        txt.append('  %s:   %.3gV' % (C, self.Vhist[i,k]) )
-    # update bar chart
+        txt.append('  %s:   %.3gV' % (C, dat[i]) )
+    # update history graphs and bar chart
+      Vh = self.Vhist.view()
       if n>1: # !!! fix to avoid permanent display of first object in blit mode
-        self.bgraph1.set_height(dat[0])
-        if self.NChan > 1:
-          self.bgraph2.set_height(dat[1])
+        for i, C in enumerate(self.ChanNams):
+          self.graphs[i].set_data(self.Ti, Vh[i])
+          self.bgraphs[i].set_height(dat[i])
+        if self.XYmode:
+          self.graphs[-1].set_data(Vh[0], Vh[1])
       else:  
-        self.bgraph1.set_height(0.)
-        if self.NChan > 1:
-          self.bgraph2.set_height(0.)
-
-      if self.NChan > 1:
-        self.animtxt.set_text(txt[0] + '\n' + txt[1])
-      else:
-        self.animtxt.set_text(txt[0])
+        for b in self.bgraphs:
+          b.set_height(0.)
+
+      self.animtxt.set_text('\n'.join(txt))
      # -- end if != None
 
-    if self.NChan > 1 :
-      return (self.bgraph1,) + (self.bgraph2,) + self.graphs + (self.animtxt,)
-    else:
-      return (self.bgraph1,) + self.graphs + (self.animtxt,)
+    return self.bgraphs + self.graphs + (self.animtxt,)
 #- -end def DataGraphs.__call__
 #-end class VoltMeter
@@ -3,6 +3,8 @@ from __future__ import absolute_import
 
 import numpy as np, matplotlib.pyplot as plt
 
+from .History import History
+
 class DataLogger(object):
   ''' history of input data'''
 
@@ -29,24 +31,31 @@ class DataLogger(object):
 
    # data structures needed throughout the class
     self.Ti = self.dT* np.linspace(-self.Npoints+1, 0, self.Npoints) 
-    self.Vhist = np.zeros( [self.NChan, self.Npoints] )
+    self.Vhist = History(self.Npoints, self.NChan)
 
 # set up a figure to plot actual voltage and samplings from Picoscope
-    fig = plt.figure("DataLogger", figsize=(6., 3.) )
-    fig.subplots_adjust(left=0.15, bottom=0.2, right=0.85, top=0.95,
+    if self.NChan <= 2:
+      fig = plt.figure("DataLogger", figsize=(6., 3.) )
+      fig.subplots_adjust(left=0.15, bottom=0.2, right=0.85, top=0.95,
                   wspace=None, hspace=.25)
+    else:
+      fig = plt.figure("DataLogger", figsize=(6., 5.) )
+      fig.subplots_adjust(left=0.15, bottom=0.12, right=0.85, top=0.95,
+                  wspace=None, hspace=.1)
     axes=[]
-  # history plot
-    axes.append(fig.add_subplot(1,1,1, facecolor='ivory'))
-    if self.NChan > 1:
-      axes.append(axes[0].twinx())
+  # history plots, two channels per plot
+    nplt = (self.NChan + 1)//2
+    for i in range(0, self.NChan, 2):
+      axes.append(fig.add_subplot(nplt, 1, i//2 + 1, facecolor='ivory'))
+      if i+1 < self.NChan:
+        axes.append(axes[-1].twinx())
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break # works for a maximum of 2 Channels only
       axes[i].set_ylim(*self.ChanLim[i])
       axes[i].set_ylabel('Chan ' + C + ' ' + sigName, color=self.ChanColors[i])
       axes[i].grid(True, color=self.ChanColors[i], linestyle = '--', alpha=0.3)
-    axes[0].set_xlabel('History (s)')
+    if self.NChan > 2:
+      axes[0].set_xticklabels([])
+    axes[2*(nplt-1)].set_xlabel('History (s)')
 
     self.fig = fig
     self.axes = axes
@@ -58,8 +67,6 @@ class DataLogger(object):
   # history graphs
     self.graphs=()
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break  # max. of 2 channels
    # intitialize with graph outside range
       g,= self.axes[i].plot(self.Ti, 
           self.ChanLim[i][1] * 1.1 * np.ones(self.Npoints), 
@@ -74,15 +81,12 @@ class DataLogger(object):
     if data !=None: 
       n, dat = data
 
-      k = n % self.Npoints
-      for i, C in enumerate(self.ChanNams):
-        if i > 1: 
-          break  # works for 2 channels only
-        self.Vhist[i, k] = dat[i]
-    # update history graph
-        if n>1: # !!! fix to avoid permanent display of first object in blit mode
-          self.graphs[i].set_data(self.Ti,
-            np.concatenate((self.Vhist[i, k+1:], self.Vhist[i, :k+1]), axis=0) )
+      self.Vhist.append(dat[:self.NChan])
+    # update history graphs
+      if n>1: # !!! fix to avoid permanent display of first object in blit mode
+        Vh = self.Vhist.view()
+        for i, g in enumerate(self.graphs):
+          g.set_data(self.Ti, Vh[i])
 
     return self.graphs
 #- -end def DataLogger.__call__
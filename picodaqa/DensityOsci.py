@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+'''
+.. module DensityOsci of picoDAQ
+
+  persistence display of the oscilloscope: waveforms of many events
+  are accumulated in a density histogram of time vs. voltage per
+  channel (like a digital phosphor display) and shown as an image;
+  rare pulse shapes remain visible at high rates
+
+  events are added in batches (e.g. BMmpQue.recentEvents()), filling
+  is vectorized over all events, channels and samples of a batch
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import time, numpy as np, matplotlib.pyplot as plt
+from matplotlib.colors import LinearSegmentedColormap
+
+from .Oscilloscope import timeBase
+
+class DensityOsci(object):
+  ''' density of channel readings in time domain over many events'''
+
+  def __init__(self, OscConfDict, name='density', tau=0.,
+               nTbins=400, nVbins=200):
+    ''' Args:
+          OscConfDict: oscilloscope configuration
+          name: title of display
+          tau: time constant (s) for fading of old events, 0: none
+          nTbins: number of time bins (at most NSamples)
+          nVbins: number of voltage bins
+    '''
+    self.name = name
+    self.tau = tau
+    self.Channels = OscConfDict['Channels']
+    self.NChannels = OscConfDict['NChannels']
+    self.NSamples = OscConfDict['NSamples']
+    self.CRanges = OscConfDict['CRanges']
+    self.ChanOffsets = OscConfDict['ChanOffsets']
+    self.ChanColors = OscConfDict['ChanColors']
+    self.trgChan = OscConfDict['trgChan']
+    self.trgActive = OscConfDict['trgActive']
+    self.trgThr = OscConfDict['trgThr']
+    self.trgTyp = OscConfDict['trgTyp']
+    self.samplingTimes, self.TUnit = timeBase(OscConfDict)
+
+  # binning: index of bin = (channel*nV + voltage bin)*nT + time bin
+    self.nT = min(nTbins, self.NSamples)
+    self.nV = nVbins
+    self.vlo = np.array([-r - o for r, o in
+                         zip(self.CRanges, self.ChanOffsets)])
+    self.vhi = np.array([r - o for r, o in
+                         zip(self.CRanges, self.ChanOffsets)])
+    self.vscale = (self.nV / (self.vhi - self.vlo))[:, None]
+    self.vlo = self.vlo[:, None]
+    tbin = (np.arange(self.NSamples) * self.nT) // self.NSamples
+    self.ioff = (np.arange(self.NChannels)[:, None] * self.nV * self.nT
+                 + tbin[None, :]).astype(np.int32)
+    # events filled at once, limits size of temporary arrays
+    self.chunk = max(1, 2**20 // (self.NChannels * self.NSamples))
+    self.counts = np.zeros( (self.NChannels, self.nV, self.nT) )
+
+  # one set of axes per channel, common time axis
+    fig = plt.figure("DensityOscilloscope",
+                     figsize=(6., 1.5 + 1.5 * self.NChannels) )
+    axes = fig.subplots(self.NChannels, 1, sharex=True, squeeze=False)[:, 0]
+    fig.subplots_adjust(left=0.15, bottom=0.1, right=0.95, top=0.925,
+                        hspace=0.1)
+    for i, ax in enumerate(axes):
+      ax.set_facecolor('ivory')
+      ax.set_ylim(self.vlo[i, 0], self.vhi[i])
+      ax.grid(True, color=self.ChanColors[i], linestyle = '--', alpha=0.5)
+      ax.set_ylabel(self.Channels[i] + "  Voltage (V)",
+                    color=self.ChanColors[i])
+      ax.tick_params(axis='y', color = self.ChanColors[i])
+      ax.axvline(0., color='grey', linestyle='--', alpha=0.5)
+    axes[-1].set_xlabel("Time " + self.TUnit, size='large')
+
+    if self.trgActive:
+      trgidx = self.Channels.index(self.trgChan)
+      axes[trgidx].axhline(self.trgThr, color='grey',
+                           linestyle='--', alpha=0.7)
+      axes[0].set_title("Trigger: %s, %.3gV %s" \
+              % (self.trgChan, self.trgThr, self.trgTyp),
+            color=self.ChanColors[trgidx], fontstyle='italic',
+            family='monospace', horizontalalignment='right')
+    else:
+      axes[0].set_title("Trigger: none", color='lightgrey',
+            fontstyle='italic', family='monospace',
+            horizontalalignment='right')
+
+    self.fig = fig
+    self.axes = axes
+# -- end def __init__()
+
+  def init(self):
+  # initialize objects to be animated
+    extent = (self.samplingTimes[0], self.samplingTimes[-1])
+    self.images = ()
+    for i, ax in enumerate(self.axes):
+      cmap = LinearSegmentedColormap.from_list(self.Channels[i],
+                                     ['ivory', self.ChanColors[i]])
+      img = ax.imshow(np.zeros( (self.nV, self.nT) ), cmap=cmap,
+                      extent=extent + (self.vlo[i, 0], self.vhi[i]),
+                      origin='lower', aspect='auto', vmin=0., vmax=1.,
+                      interpolation='nearest')
+      self.images += (img,)
+    self.animtxt = self.axes[0].text(0.02, 0.88, ' ',
+                     transform=self.axes[0].transAxes, alpha=0.7)
+
+    self.counts[:] = 0.
+    self.Nev = 0          # number of events accumulated
+    self.evNr0 = None     # first event number
+    self.tlast = time.time()
+    return self.images + (self.animtxt,)
+
+  def fill(self, evData):
+    '''add events (array of shape NEvents, NChannels, NSamples)'''
+    for i0 in range(0, len(evData), self.chunk):
+      v = np.asarray(evData[i0:i0 + self.chunk], dtype=np.float32)
+      iv = ((v - self.vlo) * self.vscale).astype(np.int32)
+      np.clip(iv, 0, self.nV - 1, out=iv) # overflows shown at edges
+      self.counts += np.bincount( (iv * self.nT + self.ioff).ravel(),
+                         minlength=self.counts.size).reshape(self.counts.shape)
+    self.Nev += len(evData)
+
+  def __call__(self, batch):
+    '''add batch of events (event numbers, data) and update images'''
+    evNrs, evData = batch
+    if not len(evNrs): return ()
+    if self.tau > 0.: # fade out old events
+      t = time.time()
+      self.counts *= np.exp(-(t - self.tlast)/self.tau)
+      self.tlast = t
+    self.fill(evData)
+
+    for i, img in enumerate(self.images): # logarithmic density
+      d = np.log1p(self.counts[i])
+      dmax = d.max()
+      img.set_data(d/dmax if dmax > 0. else d)
+
+    if self.evNr0 is None: self.evNr0 = evNrs.min()
+    dN = evNrs.max() - self.evNr0 + 1
+    txt = self.name + ': %i events' % (self.Nev)
+    if dN >= self.Nev: # event numbers increasing
+      txt += ' (%.3g%% of triggers)' % (100. * self.Nev / dN)
+    self.animtxt.set_text(txt)
+    return self.images + (self.animtxt,)
+# -end class DensityOsci
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+'''
+.. module EventFile of picoDAQ
+
+  binary file of raw waveforms, written in chunks while running and
+  read via numpy.memmap for random access
+
+  file layout:
+
+    - magic string 'picoDAQevt1' (16 bytes, zero padded)
+    - length of header (8 bytes, little-endian integer)
+    - header as yaml text: oscilloscope configuration (OscConf),
+      configuration of the writing consumer (userConf) and
+      record layout (data type, channels, samples, conversion to Volts)
+    - fixed-size records: event number (int32), event time (float64),
+      waveforms (NChannels x NSamples, float32, int16 or int8)
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import os, struct, yaml, numpy as np
+
+MAGIC = b'picoDAQevt1'.ljust(16, b'\0')
+HEADALIGN = 64  # records start at multiple of this
+
+def recordType(dataType, NChannels, NSamples):
+  '''numpy record type of events'''
+  return np.dtype([('evNr', '<i4'), ('evTime', '<f8'),
+                   ('data', np.dtype(dataType).newbyteorder('<'),
+                    (NChannels, NSamples))])
+
+def plainTypes(obj):
+  '''convert numpy types in nested dicts/lists to python types for yaml'''
+  if isinstance(obj, dict):
+    return dict((k, plainTypes(v)) for k, v in obj.items())
+  if isinstance(obj, (list, tuple)):
+    return [plainTypes(v) for v in obj]
+  if isinstance(obj, np.ndarray):
+    return obj.tolist()
+  if isinstance(obj, np.generic):
+    return obj.item()
+  return obj
+
+def isEventFile(fname):
+  '''check for magic string at start of file'''
+  with open(fname, 'rb') as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+def readHeader(fname):
+  '''
+    Returns: header dictionary, offset of first record
+  '''
+  with open(fname, 'rb') as f:
+    if f.read(len(MAGIC)) != MAGIC:
+      raise IOError('EventFile: ' + fname + ' is not an event file')
+    lhead, = struct.unpack('<q', f.read(8))
+    head = yaml.safe_load(f.read(lhead).decode('utf-8'))
+  offset = len(MAGIC) + 8 + lhead
+  offset += -offset % HEADALIGN
+  return head, offset
+
+class EventFileWriter(object):
+  '''
+  write events to binary event file
+
+    events are collected in chunks and appended to the file,
+    the file may be read while being written
+  '''
+
+  def __init__(self, fname, OscConf, NChannels, NSamples,
+               dataType='float32', ChanScale=None, ChanOffset=None,
+               userConf=None, chunkSize=64, append=False):
+    '''Args:
+         fname: file name
+         OscConf: oscilloscope configuration dictionary
+         NChannels, NSamples: shape of waveforms
+         dataType: float32 for Volts, int16 or int8 for raw ADC codes
+         ChanScale, ChanOffset: conversion of ADC codes to Volts,
+           V = code * ChanScale + ChanOffset
+         userConf: configuration of writing consumer, stored in header
+         chunkSize: number of events written at once
+         append: append to existing file with same record layout
+    '''
+    self.fname = fname
+    self.rtype = recordType(dataType, NChannels, NSamples)
+    if ChanScale is None: ChanScale = [1. for i in range(NChannels)]
+    if ChanOffset is None: ChanOffset = [0. for i in range(NChannels)]
+    self.header = {'OscConf': OscConf, 'userConf': userConf,
+                   'dataType': str(dataType), 'NChannels': NChannels,
+                   'NSamples': NSamples,
+                   'ChanScale': [float(s) for s in ChanScale],
+                   'ChanOffset': [float(o) for o in ChanOffset],
+                   'recordSize': self.rtype.itemsize}
+
+    if append and os.path.exists(fname) and os.path.getsize(fname):
+      head, offset = readHeader(fname)
+      if head['recordSize'] != self.rtype.itemsize or \
+         head['dataType'] != self.header['dataType']:
+        raise IOError('EventFile: record layout of ' + fname +
+                      ' does not match')
+      self.f = open(fname, 'ab')
+    else:
+      htxt = yaml.dump(plainTypes(self.header), 
+                       default_flow_style=None).encode('utf-8')
+      self.f = open(fname, 'wb')
+      self.f.write(MAGIC)
+      self.f.write(struct.pack('<q', len(htxt)))
+      self.f.write(htxt)
+      # pad to alignment of first record
+      self.f.write(b'\0' * (-(len(MAGIC) + 8 + len(htxt)) % HEADALIGN))
+      self.f.flush()
+
+    self.chunk = np.zeros(chunkSize, dtype=self.rtype)
+    self.nchunk = 0 # events in chunk
+    self.NEvents = 0 # events written
+
+  def write(self, evNr, evTime, evData):
+    '''add one event, written to file when chunk is full'''
+    rec = self.chunk[self.nchunk]
+    rec['evNr'] = evNr
+    rec['evTime'] = evTime
+    rec['data'] = evData
+    self.nchunk += 1
+    self.NEvents += 1
+    if self.nchunk == len(self.chunk): self.flush()
+
+  def flush(self):
+    '''write collected events to file'''
+    if self.nchunk:
+      self.f.write(self.chunk[:self.nchunk].tobytes())
+      self.nchunk = 0
+    self.f.flush()
+
+  def close(self):
+    self.flush()
+    self.f.close()
+# - end class EventFileWriter
+
+class EventFileReader(object):
+  '''
+  random access to events in binary event file via numpy.memmap
+
+    records: structured array with fields evNr, evTime and data
+  '''
+
+  def __init__(self, fname):
+    self.fname = fname
+    self.header, self.offset = readHeader(fname)
+    self.OscConf = self.header['OscConf']
+    self.userConf = self.header['userConf']
+    self.dataType = self.header['dataType']
+    self.NChannels = self.header['NChannels']
+    self.NSamples = self.header['NSamples']
+    self.ChanScale = np.array(self.header['ChanScale'], dtype=np.float32)
+    self.ChanOffset = np.array(self.header['ChanOffset'], dtype=np.float32)
+    self.rtype = recordType(self.dataType, self.NChannels, self.NSamples)
+    self.refresh()
+
+  def refresh(self):
+    '''map events written since opening, Returns: number of events'''
+    self.NEvents = (os.path.getsize(self.fname) - self.offset) \
+                    // self.rtype.itemsize
+    if self.NEvents > 0:
+      self.records = np.memmap(self.fname, dtype=self.rtype, mode='r',
+                               offset=self.offset, shape=(self.NEvents,))
+    else:
+      self.records = np.zeros(0, dtype=self.rtype)
+    return self.NEvents
+
+  def __len__(self):
+    return self.NEvents
+
+  def __getitem__(self, i):
+    '''Returns: event number, event time, waveforms (view into file)'''
+    r = self.records[i]
+    return r['evNr'], r['evTime'], r['data']
+
+  def __iter__(self):
+    for i in range(self.NEvents):
+      yield self[i]
+
+  def toVolts(self, evData):
+    '''convert waveforms to Volts'''
+    if self.dataType == 'float32': return evData
+    return evData * self.ChanScale[:, None] + self.ChanOffset[:, None]
+
+  def close(self):
+    self.records = None
+# - end class EventFileReader
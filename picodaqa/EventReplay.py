@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+.. module EventReplay of picoDAQ
+
+  replay of recorded events from a binary event file (module EventFile)
+  as data source for BufferMan, replacing the PicoScope device
+  configured by PSconfig
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np, time, sys
+
+from .EventFile import EventFileReader
+
+class EventReplay(object):
+  '''
+  data producer reading events from file
+
+    events are provided at maximum speed or with their original
+    timing; original event numbers and times are kept
+  '''
+
+  def __init__(self, confdict=None):
+    if confdict==None: confdict={}
+
+    if "replayFile" in confdict:
+      self.replayFile = confdict["replayFile"] # binary event file
+    else:
+      print('!!! EventReplay: no replayFile given')
+      sys.exit(1)
+    if "replaySpeed" in confdict:
+      self.replaySpeed = confdict["replaySpeed"]
+    else:
+      self.replaySpeed = 0. # 0: maximum speed, 1: original timing
+    if "verbose" in confdict:
+      self.verbose = confdict["verbose"]
+    else:
+      self.verbose=1   # print (detailed) info if >0
+    self.NSegments = 1
+
+  def init(self):
+    '''open file and take configuration from file header'''
+    try:
+      self.evf = EventFileReader(self.replayFile)
+    except Exception as e:
+      print('!!! EventReplay: Error opening file ' + self.replayFile)
+      print(str(e))
+      print('  - exiting')
+      sys.exit(1)
+
+    self.OscConfDict = self.evf.OscConf
+    self.picoChannels = self.OscConfDict['Channels']
+    self.NChannels = self.evf.NChannels
+    self.NSamples = self.evf.NSamples
+    self.TSampling = self.OscConfDict['TSampling']
+    self.pretrig = self.OscConfDict['pretrig']
+    self.CRanges = self.OscConfDict['CRanges']
+    self.ChanOffsets = self.OscConfDict['ChanOffsets']
+    self.ChanColors = self.OscConfDict['ChanColors']
+    self.trgChan = self.OscConfDict['trgChan']
+    self.trgActive = self.OscConfDict['trgActive']
+    self.trgThr = self.OscConfDict['trgThr']
+    self.trgTyp = self.OscConfDict['trgTyp']
+    # conversion of ADC codes to Volts, as for PSconfig
+    self.ADCscale = list(self.evf.ChanScale)
+    if self.evf.dataType == 'int8':
+      self.ADCscale = [s/256. for s in self.ADCscale]
+    self.ADCoffset = list(self.evf.ChanOffset)
+
+    self.iev = 0 # next event to replay
+    if self.verbose:
+      print('      EventReplay: %i events from file %s'\
+            % (len(self.evf), self.replayFile) )
+
+  def setBufferManagerPointer(self, BM):
+    self.BM = BM
+
+  def acquireDataBM(self, buffer):
+    '''
+    read next event from file, interfaces to BufferMan.py
+
+      Args:
+        buffer: space to store data
+
+      Returns:
+        ttrg: original trigger time (w.r.t. start of run)
+        tlife: time waiting for event
+        evNr: original event number
+    '''
+    if self.iev >= len(self.evf): # maybe file is still being written
+      self.evf.refresh()
+      if self.iev >= len(self.evf):
+        self.BM.prlog('*==* EventReplay: end of file')
+        return None
+    evNr, evTime, evData = self.evf[self.iev]
+    if self.iev == 0:
+      self.tstart = time.time()
+      self.evTime0 = evTime
+    self.iev += 1
+
+    ti = time.time()
+    if self.replaySpeed > 0.: # wait for original time of event
+      tw = self.tstart + (evTime - self.evTime0)/self.replaySpeed
+      while time.time() < tw:
+        if not self.BM.ACTIVE.value: return None
+        time.sleep(max(0., min(tw - time.time(), 0.01)) )
+    tlife = time.time() - ti
+
+    # store data in buffer, converting between Volts and ADC codes
+    if buffer.dtype == evData.dtype:
+      buffer[:] = evData
+    elif buffer.dtype == np.float32:
+      buffer[:] = self.evf.toVolts(evData)
+    elif buffer.dtype == np.int8 and evData.dtype == np.int16:
+      np.right_shift(evData, 8, out=buffer, casting='unsafe')
+    else:
+      self.BM.prlog('!!! EventReplay: cannot store ' + str(evData.dtype) +
+                    ' data in ' + str(buffer.dtype) + ' buffers')
+      return None
+    return self.BM.BMT0.value + evTime, tlife, evNr
+
+  def closeDevice(self):
+    if self.verbose:
+      print('    EventReplay: %i events replayed' % (self.iev) )
+    self.evf.close()
+# - end class EventReplay
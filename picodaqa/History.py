@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+'''
+.. module History of picoDAQ
+
+  fixed-length history of values for displays (e.g. rate or voltage
+  history): appending is O(1), and the last Npoints values, oldest
+  first, are always available as a view without copying
+
+  each value is written twice, at positions i and i + Npoints of a
+  buffer of double length; the values in order of time are then the
+  contiguous slice buf[i+1 : i+1+Npoints]
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np
+
+class History(object):
+  '''circular history of one value or of one value per channel'''
+
+  def __init__(self, Npoints, NChan=None, fill=0.):
+    '''Args:
+         Npoints: length of history
+         NChan: number of channels, None for single values
+         fill: initial value
+    '''
+    self.Npoints = Npoints
+    shape = (2 * Npoints,) if NChan is None else (NChan, 2 * Npoints)
+    self.buf = np.full(shape, fill, dtype=np.float64)
+    self.i = 0 # position of oldest value
+
+  def append(self, v):
+    '''add value (or array of values, one per channel)'''
+    self.buf[..., self.i] = v
+    self.buf[..., self.i + self.Npoints] = v
+    self.i = (self.i + 1) % self.Npoints
+
+  def view(self):
+    '''Returns: history, oldest value first (view, not a copy)'''
+    return self.buf[..., self.i:self.i + self.Npoints]
+
+  def last(self):
+    '''Returns: most recent value(s)'''
+    return self.buf[..., self.i + self.Npoints - 1]
+# - end class History
@@ -6,6 +6,40 @@ from __future__ import unicode_literals
 
 import time, numpy as np, matplotlib.pyplot as plt
 
+def timeBase(OscConfDict):
+  '''
+    Returns: sampling times relative to trigger, in units 
+             suitable for display, and name of unit
+  '''
+  NSamples = OscConfDict['NSamples']
+  SamplingPeriod = OscConfDict['TSampling'] * NSamples
+  pretrig = OscConfDict['pretrig']
+  t = np.linspace(-pretrig * SamplingPeriod, 
+                  (1.-pretrig) * SamplingPeriod, NSamples)
+  if SamplingPeriod < 1E-3:  
+    return t * 1E6, '(µs)'
+  elif SamplingPeriod < 1.:
+    return t * 1E3, '(ms)'
+  else:
+    return t, '(s)'
+
+def minMaxEnvelope(t, v, npix):
+  '''
+    reduce a trace to the minimum and maximum in each of npix 
+    intervals of samples (vectorized), short pulses remain visible
+
+    Args: 
+      t: sampling times
+      v: samples, one row per channel
+      npix: number of intervals, e.g. width of axes in pixels
+    Returns: times and samples, 2*npix points per channel
+  '''
+  idx = np.linspace(0, len(t), npix, endpoint=False).astype(np.int64)
+  vmin = np.minimum.reduceat(v, idx, axis=-1)
+  vmax = np.maximum.reduceat(v, idx, axis=-1)
+  env = np.stack((vmin, vmax), axis=-1).reshape(v.shape[:-1] + (-1,))
+  return np.repeat(t[idx], 2), env
+
 class Oscilloscope(object):
   ''' Oscilloscope: display channel readings in time domain'''
 
@@ -29,19 +63,9 @@ class Oscilloscope(object):
     self.trgThr = OscConfDict['trgThr'] 
     self.trgTyp = OscConfDict['trgTyp'] 
 
-  # array of sampling times (in ms)
+  # array of sampling times
     self.SamplingPeriod = self.TSampling * self.NSamples
-    self.samplingTimes =\
-         np.linspace(-self.pretrig * self.SamplingPeriod, 
-            (1.-self.pretrig) * self.SamplingPeriod, self.NSamples)
-    if self.SamplingPeriod < 1E-3:  
-      self.samplingTimes *= 1E6
-      self.TUnit = '(µs)'
-    elif self.SamplingPeriod < 1.:
-      self.samplingTimes *= 1E3
-      self.TUnit = '(ms)'
-    else:
-       self.TUnit = '(s)'
+    self.samplingTimes, self.TUnit = timeBase(OscConfDict)
 
     self.BM = BM
 
@@ -133,7 +157,7 @@ class Oscilloscope(object):
 
     if n>2:    # !!! fix to avoid permanent display of first line in blit mode
       for i, C in enumerate(self.Channels):
-        self.graphsOs[i].set_data(self.samplingTimes, evData[i])
+        self.graphsOs[i].set_data(*self.visibleTrace(i, evData[i]))
     else:
       for i, C in enumerate(self.Channels):
         self.graphsOs[i].set_data([],[])
@@ -152,4 +176,21 @@ class Oscilloscope(object):
       self.animtxtOs.set_text(txt)
       self.n0=n
     return self.graphsOs + (self.animtxtOs,)
+
+  def visibleTrace(self, i, v):
+    '''
+      samples of channel i within the time range shown, decimated
+      to a min/max envelope if there are more samples than pixels;
+      zoomed-in views are shown with full resolution
+
+      Returns: times, samples
+    '''
+    ax = self.axes[i]
+    t = self.samplingTimes
+    i0, i1 = np.searchsorted(t, ax.get_xlim())
+    i0, i1 = max(0, i0 - 1), min(self.NSamples, i1 + 1) # up to axes edge
+    npix = max(1, int(ax.bbox.width))
+    if i1 - i0 > 2 * npix:
+      return minMaxEnvelope(t[i0:i1], np.asarray(v)[i0:i1], npix)
+    return t[i0:i1], v[i0:i1]
 # -end class Oscilloscope
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+'''
+.. module PreFilter of picoDAQ
+
+  fast first-level event filter on raw ADC codes, applied by BufferMan
+  before events are dispatched to obligatory consumers; rejects
+  empty or noise events before any floating-point analysis
+
+  configuration (dictionary 'preFilter' in BufferMan configuration):
+
+    - mode: 'ToT'  time over threshold: signal beyond threshold
+                   for at least 'width' consecutive samples
+            'sum'  running sum: mean signal over 'width' samples
+                   beyond threshold
+    - thr: threshold in Volt, sign gives polarity of pulses
+    - width: number of samples
+    - minChannels: number of channels with signal required
+    - channels: list of channels to check, default all
+    - monitor: if True, all events pass and the decision is only
+                recorded (for tuning against the full analysis)
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np, sys
+from multiprocessing.sharedctypes import RawValue
+
+class PreFilter(object):
+  '''
+  time-over-threshold or running-sum filter on buffer contents
+
+    thresholds are converted to ADC codes once, the event decision
+    only needs integer operations on raw data
+  '''
+
+  def __init__(self, confdict, picoChannels, ChanScale, ChanOffset,
+               dtype=np.int16):
+    '''Args:
+         confdict: filter configuration
+         picoChannels: active channels
+         ChanScale, ChanOffset: conversion of buffer content to Volts
+         dtype: data type of buffers
+    '''
+    if confdict==None: confdict={}
+    if "mode" in confdict:
+      self.mode = confdict["mode"]
+    else:
+      self.mode = 'ToT'
+    if self.mode not in ['ToT', 'sum']:
+      print('!!! PreFilter: invalid mode ' + str(self.mode))
+      sys.exit(1)
+    if "thr" in confdict:
+      self.thr = confdict["thr"] # threshold in Volts, sign = polarity
+    else:
+      print('!!! PreFilter: no threshold given')
+      sys.exit(1)
+    if "width" in confdict:
+      self.width = int(confdict["width"]) # number of samples
+    else:
+      self.width = 3
+    if "minChannels" in confdict:
+      self.minChannels = confdict["minChannels"]
+    else:
+      self.minChannels = 1
+    if "channels" in confdict:
+      self.iChans = [picoChannels.index(c) for c in confdict["channels"]]
+    else:
+      self.iChans = list(range(len(picoChannels)))
+    if "monitor" in confdict:
+      self.monitor = confdict["monitor"]
+    else:
+      self.monitor = False
+
+    self.neg = self.thr < 0.
+    scale = np.asarray(ChanScale, dtype=np.float64)[self.iChans]
+    offset = np.asarray(ChanOffset, dtype=np.float64)[self.iChans]
+    if np.dtype(dtype).kind == 'f':
+      self.ctype = np.float64 # data in Volts
+    else:
+      self.ctype = np.int32   # sums of codes fit in 32 bit
+    # ADC code of threshold for time-over-threshold, ...
+    cthr = (self.thr - offset) / scale
+    # ... and threshold on sum of codes over window, relative to 0 Volt
+    csum = (self.thr - offset) / scale * self.width
+    if self.ctype == np.int32: # round towards inside of accepted region
+      cthr = np.floor(cthr) if self.neg else np.ceil(cthr)
+      csum = np.floor(csum) if self.neg else np.ceil(csum)
+    self.cthr = cthr.astype(self.ctype)[:, None]
+    self.csum = csum.astype(self.ctype)
+
+    # counters in shared memory, filter runs in BufferMan sub-process
+    self.NTested = RawValue('l', 0)
+    self.NPassed = RawValue('l', 0)
+
+  def __call__(self, evData):
+    '''
+      Args: event data, as stored in buffer (NChannels x NSamples)
+      Returns: True if event passes
+    '''
+    d = evData[self.iChans]
+    w = self.width
+    if self.mode == 'ToT':
+      m = (d < self.cthr) if self.neg else (d > self.cthr)
+      cs = np.cumsum(m, axis=1, dtype=np.int32)
+      # longest run is at least w if any window of w samples is full
+      nover = cs[:, w-1:].copy()
+      nover[:, 1:] -= cs[:, :-w]
+      ok = np.max(nover, axis=1) >= w
+    else: # running sum of codes
+      cs = np.cumsum(d, axis=1, dtype=self.ctype)
+      s = cs[:, w-1:].copy()
+      s[:, 1:] -= cs[:, :-w]
+      if self.neg:
+        ok = np.min(s, axis=1) <= self.csum
+      else:
+        ok = np.max(s, axis=1) >= self.csum
+    passed = bool(np.count_nonzero(ok) >= self.minChannels)
+    self.NTested.value += 1
+    if passed: self.NPassed.value += 1
+    return passed
+
+  def summary(self):
+    '''Returns: text with counters and rejection fraction'''
+    n = self.NTested.value
+    r = (1. - self.NPassed.value / n) * 100. if n else 0.
+    return 'preFilter: %i events tested, %i passed, rejected %.1f%%%s'\
+           %(n, self.NPassed.value, r, ' (monitor)' if self.monitor else '')
+# - end class PreFilter
@@ -7,6 +7,8 @@ from __future__ import unicode_literals
 import time, numpy as np
 import matplotlib.pyplot as plt
 
+from .History import History
+
 class RMeter(object):
   ''' display rate history
 
@@ -24,7 +26,7 @@ class RMeter(object):
     self.interval = interval/1000. # time between updates in s
     self.BM = BM
     self.Npoints = 100  # number of history points
-    self.R = np.zeros(self.Npoints)
+    self.R = History(self.Npoints)
     self.xplt = np.linspace(-self.Npoints*self.interval, 0., self.Npoints)
 
   # create figure 
@@ -39,7 +41,7 @@ class RMeter(object):
     self.axes.set_ylim(0., self.maxRate)
 
   def init(self):
-    self.line1, = self.axes.plot(self.xplt, self.R, 
+    self.line1, = self.axes.plot(self.xplt, self.R.view(), 
       marker='.', markerfacecolor='b', linestyle='dashed', color='grey')
     self.animtxt = self.axes.text(0.2, 0.925 , ' ',
               transform=self.axes.transAxes,
@@ -55,22 +57,23 @@ class RMeter(object):
     n = evt[0]
     evNr = evt[1]
     evTime = evt[2]
-    if n < 3:
-      self.init()
+    if n < 3: # (re-)start counting, graphics objects are kept
+      self.T0 = time.time()
+      self.t0 = self.T0
+      self.n0 = 0
       self.N0 = evNr
       return self.line1, self.animtxt  
 
-    k = n%self.Npoints
     # calculate rate from event number and event Time
     
     dn = evNr - self.N0
     dt = time.time() - self.t0
     rate = dn/dt
-    self.R[k] = rate
+    self.R.append(rate)
     self.N0 = evNr
     self.t0 += dt
 
-    self.line1.set_ydata(np.concatenate( (self.R[k+1:], self.R[:k+1]) ))
+    self.line1.set_ydata(self.R.view())
 
     if self.BM == None:
       self.animtxt.set_text( \
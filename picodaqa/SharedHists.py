@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+'''
+.. module SharedHists of picoDAQ
+
+  histograms in shared memory with fixed binning: producers add
+  values in place, display processes read a consistent copy of
+  all counts (snapshot); memory and transfer cost do not depend on
+  the rate of entries or on the speed of the display
+
+  histogram descriptors as for animHists:
+    [min, max, nbins, ymax, name, type]
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np
+from multiprocessing import Lock
+from multiprocessing.sharedctypes import RawArray, RawValue
+
+class SharedHists(object):
+  '''
+  set of histograms in shared memory
+
+    create before starting processes and pass as argument to
+    producers and displays
+  '''
+
+  def __init__(self, Hdescr):
+    '''Args:
+         Hdescr: list of histogram descriptors
+    '''
+    self.Hdescr = Hdescr
+    self.nHist = len(Hdescr)
+    self.mins = [h[0] for h in Hdescr]
+    self.maxs = [h[1] for h in Hdescr]
+    self.nbins = [h[2] for h in Hdescr]
+
+    # counts of all histograms in one array, entries per histogram
+    self.rawCounts = RawArray('l', int(sum(self.nbins)) )
+    self.rawEntries = RawArray('l', self.nHist)
+    self.version = RawValue('l', 0) # incremented on every fill
+    self.lock = Lock()
+    self._setViews()
+
+  def _setViews(self):
+    '''numpy views on shared memory'''
+    self.counts = np.ctypeslib.as_array(self.rawCounts)
+    self.entries = np.ctypeslib.as_array(self.rawEntries)
+    self.hcounts = np.split(self.counts, np.cumsum(self.nbins)[:-1])
+
+  def __getstate__(self):
+    # views are recreated from shared memory in new process
+    state = self.__dict__.copy()
+    for k in ['counts', 'entries', 'hcounts']: del state[k]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._setViews()
+
+  def fill(self, vals):
+    '''
+      add values
+
+      Args: list of value lists, one per histogram (may be empty)
+    '''
+    incs = []
+    for ih in range(self.nHist):
+      v = np.asarray(vals[ih], dtype=np.float64)
+      if len(v):
+        incs.append( (ih, len(v), np.histogram(v, bins=self.nbins[ih],
+                          range=(self.mins[ih], self.maxs[ih]) )[0]) )
+    if not incs: return
+    with self.lock:
+      for ih, n, c in incs:
+        self.hcounts[ih] += c
+        self.entries[ih] += n
+      self.version.value += 1
+
+  def snapshot(self):
+    '''
+      Returns: version, list of counts per histogram, entries
+    '''
+    with self.lock:
+      c = self.counts.copy()
+      e = self.entries.copy()
+      v = self.version.value
+    return v, np.split(c, np.cumsum(self.nbins)[:-1]), e
+
+  def clear(self):
+    '''reset all histograms'''
+    with self.lock:
+      self.counts[:] = 0
+      self.entries[:] = 0
+      self.version.value += 1
+# - end class SharedHists
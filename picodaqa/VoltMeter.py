@@ -7,6 +7,8 @@ from __future__ import unicode_literals
 import time, numpy as np
 import matplotlib.pyplot as plt
 
+from .History import History
+
 class VoltMeter(object):
   ''' Bar graph and history displays of effective voltage of input samples '''
 
@@ -38,46 +40,55 @@ class VoltMeter(object):
   # 
     self.V = np.empty(self.NChan)
     self.stdV = np.empty(self.NChan)
-    self.Vhist = np.zeros( [self.NChan, self.Npoints] )
-    self.stdVhist = np.zeros( [self.NChan, self.Npoints] )
+    self.Vhist = History(self.Npoints, self.NChan)
+    self.stdVhist = History(self.Npoints, self.NChan)
 
 # set up a figure to plot actual voltage and samplings from Picoscope
-    fig = plt.figure("Voltmeter", figsize=(4., 5.3) )
+    if self.NChan <= 2:
+      nrows, ntxt = 6, 1
+    else: # 2nd history plot and more lines of text for 3-4 channels
+      nrows, ntxt = 9, 2
+    fig = plt.figure("Voltmeter", figsize=(4., 5.3 * nrows/6.) )
     fig.subplots_adjust(left=0.2, bottom=0.08, right=0.8, top=0.95,
                   wspace=None, hspace=.25)
     axes=[]
-  # history plot
-    axes.append(plt.subplot2grid((6,1),(4,0), rowspan=2) )
-    if self.NChan > 1:
-      axes.append(axes[0].twinx())
+  # history plots, two channels per plot
+    for i in range(0, self.NChan, 2):
+      axes.append(plt.subplot2grid((nrows,1),(ntxt+3+i,0), rowspan=2) )
+      if i+1 < self.NChan:
+        axes.append(axes[-1].twinx())
 # for effective Voltage
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break # works for a maximum of 2 Channels only
       axes[i].set_ylim(*self.ChanLim[i])
       axes[i].set_ylabel('Chan ' + C + ' (Veff)', color=self.ChanColors[i])
       axes[i].grid(True, color=self.ChanColors[i], linestyle = '--', alpha=0.3)
-    axes[0].set_xlabel('History')
-  # barchart
-    axes.append(plt.subplot2grid((6,1),(1,0), rowspan=3) )
-    axbar1 = axes[-1]
-    axbar1.set_frame_on(False)
-    if self.NChan > 1:
-      axbar2=axbar1.twinx()
-      axbar2.set_frame_on(False)
+    if self.NChan > 2:
+      axes[0].set_xticklabels([])
+    axes[2*((self.NChan-1)//2)].set_xlabel('History')
+  # barchart, channels 3 and 4 scaled to channel range without axis
+    axes.append(plt.subplot2grid((nrows,1),(ntxt,0), rowspan=3) )
+    axbars = [axes[-1]]
+    for i in range(1, self.NChan):
+      axbars.append(axbars[0].twinx())
+    for i, ax in enumerate(axbars):
+      ax.set_frame_on(False)
+      ax.set_ylim(*self.ChanLim[i])
+      if i > 1:
+        ax.get_yaxis().set_visible(False)
+    axbar1 = axbars[0]
     axbar1.get_xaxis().set_visible(False)
     axbar1.set_xlim(0., self.NChan)
     axbar1.axvline(0, color = self.ChanColors[0])
     if self.NChan > 1:
       axbar1.axvline(self.NChan, color = self.ChanColors[1])
-    axbar1.set_ylim(*self.ChanLim[0])
     axbar1.axhline(0., color='k', linestyle='-', lw=2, alpha=0.5)
-    axbar1.set_ylabel('Chan A (Veff)', color = self.ChanColors[0])
+    axbar1.set_ylabel('Chan ' + self.ChanNams[0] + ' (Veff)', 
+                      color = self.ChanColors[0])
     if self.NChan > 1:
-      axbar2.set_ylim(*self.ChanLim[1])
-      axbar2.set_ylabel('Chan B (Veff)', color = self.ChanColors[1])
+      axbars[1].set_ylabel('Chan ' + self.ChanNams[1] + ' (Veff)', 
+                           color = self.ChanColors[1])
   # Voltage in Text format
-    axes.append(plt.subplot2grid((6,1),(0,0)) )
+    axes.append(plt.subplot2grid((nrows,1),(0,0), rowspan=ntxt) )
     axtxt=axes[-1]
     axtxt.set_frame_on(False)
     axtxt.get_xaxis().set_visible(False)
@@ -86,27 +97,21 @@ class VoltMeter(object):
 
     self.fig = fig
     self.axes = axes
-    self.axbar1 = axbar1
-    if self.NChan > 1:
-      self.axbar2 = axbar2
+    self.axbars = axbars
 # -- end def grVMeterIni
 
   def init(self):
   # initialize objects to be animated
 
   # a bar graph for the actual voltages
-#    self.bgraph = self.axes[0].bar(ind, np.zeros(self.NChan), self.bwidth,
-#                           align='center', color='grey', alpha=0.5)
-    self.bgraph1, = self.axbar1.bar(self.ind[0], 0. , self.bwidth,
-       align='center', color = self.ChanColors[0], alpha=0.5) 
-    if self.NChan > 1:
-      self.bgraph2, = self.axbar2.bar(self.ind[1], 0. , self.bwidth,
-          align='center', color = self.ChanColors[1], alpha=0.5) 
+    self.bgraphs = ()
+    for i, ax in enumerate(self.axbars):
+      b, = ax.bar(self.ind[i], 0. , self.bwidth,
+         align='center', color = self.ChanColors[i], alpha=0.5) 
+      self.bgraphs += (b,)
   # history graphs
     self.graphs=()
     for i, C in enumerate(self.ChanNams):
-      if i > 1:
-        break  # max. of 2 channels
       g,= self.axes[i].plot(self.ix, np.zeros(self.Npoints), 
           color=self.ChanColors[i])
       self.graphs += (g,)
@@ -116,54 +121,33 @@ class VoltMeter(object):
 
     self.t0=time.time() # remember start time
 
-    if self.NChan > 1 :
-      return (self.bgraph1,) + (self.bgraph2,) + self.graphs + (self.animtxt,)  
-    else:
+    return self.bgraphs + self.graphs + (self.animtxt,)  
 # -- end VoltMeter.init()
-      return (self.bgraph1,) + self.graphs + (self.animtxt,)  
 
   def __call__( self, evt ):
     n, evNr, evTime, evData = evt
     if n == 0:
       return self.init()
 
-    k=n%self.Npoints
     txt_t='Time  %.1fs' %(evTime)            
     txt=[]
     for i, C in enumerate(self.ChanNams):
-      if i > 1: 
-        break  # works for 2 channels only
       self.V[i] = np.sqrt (np.inner(evData[i], evData[i])/len(evData[i]) )
-      self.Vhist[i, k] = self.V[i]
       self.stdV[i] = evData[i].std()
-      self.stdVhist[i, k] = self.stdV[i]
-    # update history graph
+      txt.append('  %s:   %.3gV +/-%.2gV' % (C, self.V[i], self.stdV[i]) )
+    self.Vhist.append(self.V)
+    self.stdVhist.append(self.stdV)
+    # update history graphs and bar chart
+    Vh = self.Vhist.view()
+    for i, C in enumerate(self.ChanNams):
       if n>1: # !!! fix to avoid permanent display of first object in blit mode
-        self.graphs[i].set_data(self.ix,
-          np.concatenate((self.Vhist[i, k+1:], self.Vhist[i, :k+1]), axis=0) )
+        self.graphs[i].set_data(self.ix, Vh[i])
+        self.bgraphs[i].set_height(self.V[i])
       else:
         self.graphs[i].set_data(self.ix, np.zeros(self.Npoints))
-      txt.append('  %s:   %.3gV +/-%.2gV' % (C, self.Vhist[i,k], 
-                                               self.stdVhist[i,k]) )
-    # update bar chart
-#      for r, v in zip(bgraph, V):
-#          r.set_height(v)
-    if n>1: # !!! fix to avoid permanent display of first object in blit mode
-      self.bgraph1.set_height(self.V[0])
-      if self.NChan > 1:
-        self.bgraph2.set_height(self.V[1])
-    else:  
-      self.bgraph1.set_height(0.)
-      if self.NChan > 1:
-        self.bgraph2.set_height(0.)
-    if self.NChan > 1:
-      self.animtxt.set_text(txt_t + '\n' + txt[0] + '\n' + txt[1])
-    else:
-      self.animtxt.set_text(txt_t + '\n' + txt[0])
+        self.bgraphs[i].set_height(0.)
+    self.animtxt.set_text('\n'.join([txt_t] + txt))
 #
-    if self.NChan > 1 :
-      return (self.bgraph1,) + (self.bgraph2,) + self.graphs + (self.animtxt,)
-    else:
-      return (self.bgraph1,) + self.graphs + (self.animtxt,)
+    return self.bgraphs + self.graphs + (self.animtxt,)
 #- -end def Voltmeter.__call__
 #-end class VoltMeter
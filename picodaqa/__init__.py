@@ -25,7 +25,10 @@ __version__ = _version_info._get_version_string()
 __version__ += _version_suffix
 
 # Import components to be callabel at package level
-__all__ = ["BufferMan","mpBufManCntrl","mpOsci","mpRMeter","mpVMeter",
-        "mpBDisplay","mpHists", "DataLogger", "mpDataGraphs", "mpDataLogger"]
+__all__ = ["BufferMan","mpBufManCntrl","mpOsci","mpDensityOsci",
+        "mpRMeter","mpVMeter",
+        "mpBDisplay","mpHists", "mpDisplayHost",
+        "DataLogger", "mpDataGraphs", "mpDataLogger",
+        "EventFile", "ColumnFile", "SharedHists", "History"]
 
 
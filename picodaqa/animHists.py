@@ -6,7 +6,7 @@ from __future__ import unicode_literals
 
 import time, numpy as np
 import matplotlib.pyplot as plt
-import itertools
+from matplotlib.collections import PolyCollection
 
 class animHists(object):
   ''' display histogram, as normalised frequency distibutions
@@ -31,6 +31,7 @@ class animHists(object):
     self.nHist = len(Hdescr)
     self.entries = np.zeros(self.nHist)
     self.frqs = []
+    self.ybots = [] # bottom of bars
     
   # histrogram properties
     self.mins = []
@@ -87,43 +88,77 @@ class animHists(object):
         self.axes[ih].set_yscale('log')
         ymx=self.ymxs[ih]/self.nbins[ih] 
         self.axes[ih].set_ylim(1E-3 * ymx, ymx) 
-        self.frqs.append(1E-4*ymx*np.ones(self.nbins[ih]) )
+        self.ybots.append(1E-4*ymx) # bars start below visible range
       else:                         # linear y scale
         self.axes[ih].set_ylim(0., self.ymxs[ih]/self.nbins[ih])
-        self.frqs.append(np.zeros(self.nbins[ih]))
+        self.ybots.append(0.)
+      self.frqs.append(np.zeros(self.nbins[ih]))
     
   def init(self):
-    self.rects = []
+    # all bars of a histogram are drawn as one collection of polygons,
+    #   vertices: (nbins x 4 corners x (x,y)), only heights are updated
+    self.verts = []
+    self.bars = []
     self.animtxts = []
     for ih in range(self.nHist):
+      v = np.zeros( (self.nbins[ih], 4, 2) )
+      v[:, 0:2, 0] = (self.bcents[ih] - 0.5*self.widths[ih])[:, None]
+      v[:, 2:4, 0] = (self.bcents[ih] + 0.5*self.widths[ih])[:, None]
+      v[:, :, 1] = self.ybots[ih]
+      self.verts.append(v)
     # plot an empty histogram
-      self.rects.append(self.axes[ih].bar( self.bcents[ih], self.frqs[ih], 
-           align='center', width=self.widths[ih], facecolor='b', alpha=0.7) )       
+      self.bars.append(PolyCollection(v, facecolors='b', edgecolors='none',
+                                      alpha=0.7) )
+      self.axes[ih].add_collection(self.bars[ih])
+      self.axes[ih].autoscale_view(scaley=False)
     # emty text
       self.animtxts.append(self.axes[ih].text(0.5, 0.925 , ' ',
               transform=self.axes[ih].transAxes,
               size='small', color='darkred') )
 
-    grobjs = tuple(self.animtxts) \
-              + tuple(itertools.chain.from_iterable(self.rects) )  
-    return grobjs # return tuple of graphics objects
+    return tuple(self.animtxts) + tuple(self.bars) # graphics objects
 
   def __call__(self, vals):
     # add recent values to frequency array, input is a list of arrays
+    #   or None if nothing new arrived
+    if vals is None: return () # nothing to draw
+
+    updated = []
     for ih in range(self.nHist):
-      vs = vals[ih]
+      vs = np.asarray(vals[ih], dtype=np.float64)
+      if not len(vs): continue
       self.entries[ih] += len(vs)
-      for v in vs:
-        iv = int(self.nbins[ih] * (v-self.mins[ih]) / (self.maxs[ih]-self.mins[ih]))
-        if iv >=0 and iv < self.nbins[ih]:
-          self.frqs[ih][iv]+=1
-      if(len(vs)):
-        norm = np.sum(self.frqs[ih]) # normalisation to one
+      self.frqs[ih] += np.histogram(vs, bins=self.nbins[ih], 
+                          range=(self.mins[ih], self.maxs[ih]) )[0]
+      updated.append(ih)
+    return self.setBars(updated)
+
+  def showCounts(self, snap):
+    # show histogram counts, input is a snapshot (version, counts,
+    #   entries) of SharedHists or None if nothing changed
+    if snap is None: return () # nothing to draw
+
+    version, counts, entries = snap
+    updated = []
+    for ih in range(self.nHist):
+      if entries[ih] == self.entries[ih]: continue
+      self.entries[ih] = entries[ih]
+      self.frqs[ih][:] = counts[ih]
+      updated.append(ih)
+    return self.setBars(updated)
+
+  def setBars(self, hlist):
+    # set heights of bars and texts of histograms in hlist
+    grobjs = []
+    for ih in hlist:
+      norm = np.sum(self.frqs[ih]) # normalisation to one
+      if not norm: norm = 1.       # (cleared histogram)
     # set new heights for histogram bars
-        for rect, frq in zip(self.rects[ih], self.frqs[ih]):
-          rect.set_height(frq/norm)
+      self.verts[ih][:, 1:3, 1] = \
+        np.maximum(self.frqs[ih]/norm, self.ybots[ih])[:, None]
+      self.bars[ih].set_verts(self.verts[ih])
     # update text
-        self.animtxts[ih].set_text('Entries: %i'%(self.entries[ih]) )
+      self.animtxts[ih].set_text('Entries: %i'%(self.entries[ih]) )
+      grobjs += [self.animtxts[ih], self.bars[ih]]
 
-    return tuple(self.animtxts)  \
-        + tuple(itertools.chain.from_iterable(self.rects) ) 
+    return tuple(grobjs) 
@@ -6,14 +6,16 @@ from __future__ import print_function, division, unicode_literals
 from __future__ import absolute_import
 
 import sys, time, numpy as np
-import threading, multiprocessing as mp
+import multiprocessing as mp
 
 if sys.version_info[0] < 3:
   import Tkinter as Tk
   import tkMessageBox as mbox
+  from Queue import Empty
 else:
   import tkinter as Tk
   from tkinter import messagebox as mbox
+  from queue import Empty
 
 import matplotlib
 matplotlib.use('TkAgg')
@@ -23,28 +25,26 @@ import matplotlib.pyplot as plt, matplotlib.animation as anim
 # import plotBufManInfo class
 from .plotBufManInfo import *
 
-def mpBufManCntrl(Qcmd, Qlog, Qinfo, maxRate = 100. , interval = 1000.):
-  '''show Buffer Manager logging messages and rate history and command buttons
+def BufManCntrlFrame(master, Qcmd, Qlog):
+  '''command buttons, clock and logging messages of Buffer Manager
+
     Args:
-      Qlog:     multiprocessing.Queue() for log-info  
-      Qinfo:    multiprocessing.Queue() for status info
-      maxrate: maximum rate for y-axis
-      interval: update interval
+      master:  Tk container to place widgets in
+      Qcmd:    multiprocessing.Queue() for commands
+      Qlog:    multiprocessing.Queue() for log-info
+
+    Returns: Tk frame for graphics display
   '''
 
   def wrtoLog(T):
-    while True:
-      T.insert(Tk.END, Qlog.get()+'\n' )
-      T.see("end")
-      time.sleep(0.01)
-
-  def sequence_gen():
-  # generator for sequence of integers
-    i=0
-    while True:
-      i+=1
-      yield i
-    return
+  # show all pending log messages, re-scheduled by Tk timer
+    try:
+      while True:
+        T.insert(Tk.END, Qlog.get_nowait()+'\n' )
+        T.see("end")
+    except Empty:
+      pass
+    T.after(100, wrtoLog, T)
 
   def cmdPause():
     Qcmd.put('P')
@@ -57,7 +57,7 @@ def mpBufManCntrl(Qcmd, Qlog, Qinfo, maxRate = 100. , interval = 1000.):
 
   def cmdEnd():
     Qcmd.put('E')
- 
+
   # a simple clock
   def clkLabel(TkLabel):
      t0=time.time()
@@ -69,22 +69,8 @@ def mpBufManCntrl(Qcmd, Qlog, Qinfo, maxRate = 100. , interval = 1000.):
        TkLabel.after(1000, clkUpdate)
      clkUpdate()
 
-# ------- executable part -------- 
-
-# generate window Buttons, graphics and text display 
-  Tkwin = Tk.Tk()
-  Tkwin.wm_title("Buffer Manager Information")
-
-# handle destruction of top-level window
-  def _delete_window():
-    if mbox.askokcancel("Quit", "Really destroy BufManCntrl window ?"):
-       print("Deleting BufManCntrl window")
-       Tkwin.destroy()
-  
-  Tkwin.protocol("WM_DELETE_WINDOW", _delete_window)
-
 # Comand buttons
-  frame = Tk.Frame(master=Tkwin)
+  frame = Tk.Frame(master=master)
   frame.grid(row=0, column=8)
   frame.pack(padx=5, side=Tk.BOTTOM)
 
@@ -112,40 +98,72 @@ def mpBufManCntrl(Qcmd, Qlog, Qinfo, maxRate = 100. , interval = 1000.):
   blank3 = Tk.Label(frame, width=7, text="")
   blank3.grid(row=0, column=0)
 
-#
-# graphics display 
-  BMi = plotBufManInfo(Qinfo, maxRate, interval)
-  figBMi = BMi.fig
-  canvas = FigureCanvasTkAgg(figBMi, master=Tkwin)
-  canvas.draw()
-  canvas.get_tk_widget().pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
-  canvas._tkcanvas.pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+# place for graphics display
+  gframe = Tk.Frame(master=master)
+  gframe.pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
 #
 # text window
-  S = Tk.Scrollbar(Tkwin)
-  T = Tk.Text(Tkwin, height=10, width=100, wrap=Tk.WORD,
+  S = Tk.Scrollbar(master)
+  T = Tk.Text(master, height=10, width=100, wrap=Tk.WORD,
       bg='black', fg='aquamarine' , font='Helvetica 10')
   S.pack(side=Tk.RIGHT, fill=Tk.Y)
   T.pack(side=Tk.LEFT, fill=Tk.Y)
   S.config(command=T.yview)
   T.config(yscroll=S.set)
 
-  try:
-# start display of active time
-    clkLabel(clock)
+# start display of active time and of logging information
+  clkLabel(clock)
+  wrtoLog(T)
+
+  return gframe
 
-# start an update-process for logging information as thread
-#    print("starting update thread")
-    wrthread = threading.Thread(target=wrtoLog,
-                              args=(T, ) ) 
-    wrthread.daemon = True
-    wrthread.start()
+def mpBufManCntrl(Qcmd, Qlog, Qinfo, maxRate = 100. , interval = 1000.):
+  '''show Buffer Manager logging messages and rate history and command buttons
+    Args:
+      Qlog:     multiprocessing.Queue() for log-info
+      Qinfo:    multiprocessing.Queue() for status info
+      maxrate: maximum rate for y-axis
+      interval: update interval
+  '''
+
+  def sequence_gen():
+  # generator for sequence of integers
+    i=0
+    while True:
+      i+=1
+      yield i
+    return
+
+# ------- executable part --------
+
+# generate window Buttons, graphics and text display
+  Tkwin = Tk.Tk()
+  Tkwin.wm_title("Buffer Manager Information")
+
+# handle destruction of top-level window
+  def _delete_window():
+    if mbox.askokcancel("Quit", "Really destroy BufManCntrl window ?"):
+       print("Deleting BufManCntrl window")
+       Tkwin.destroy()
+
+  Tkwin.protocol("WM_DELETE_WINDOW", _delete_window)
+
+  try:
+    gframe = BufManCntrlFrame(Tkwin, Qcmd, Qlog)
+#
+# graphics display
+    BMi = plotBufManInfo(Qinfo, maxRate, interval)
+    figBMi = BMi.fig
+    canvas = FigureCanvasTkAgg(figBMi, master=gframe)
+    canvas.draw()
+    canvas.get_tk_widget().pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+    canvas._tkcanvas.pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
 
 # set up matplotlib animation for rate history
     BMiAnim = anim.FuncAnimation(figBMi, BMi, sequence_gen,
                      interval=interval, init_func=BMi.init,
-                     blit=True, fargs=None, repeat=True, save_count=None) 
-                         # save_count=None is a (temporary) work-around 
+                     blit=True, fargs=None, repeat=True, save_count=None)
+                         # save_count=None is a (temporary) work-around
                          #     to fix memory leak in animate
     Tk.mainloop()
   except:
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+'''persistence (density) display of oscilloscope in TKinter window'''
+
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+
+import matplotlib
+matplotlib.use('TkAgg')
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+if sys.version_info[0] < 3:
+  import Tkinter as Tk
+else:
+  import tkinter as Tk
+import matplotlib.animation as anim
+
+# import DensityOsci class
+from .DensityOsci import *
+
+def mpDensityOsci(Q, conf, interval = 100., name='density', tau=0.):
+  '''density of many events, read in batches from BufferMan shared memory
+    Args:
+      Q:    BMmpQue of BufferMan (BMregister_mpQ())
+      conf: oscilloscope configuration
+      interval: update interval in ms
+      name: title of display
+      tau: time constant (s) for fading of old events, 0: none
+  '''
+
+  # Generator to provide data to animation
+  def yieldBatch_fromBM():
+  # all events in buffers since last update, never waits
+    try:
+      while True:
+        yield Q.recentEvents()
+    except:
+      print('*==* yieldBatch_fromBM: termination signal received')
+
+# ------- executable part --------
+
+  try:
+
+    DOsci = DensityOsci(conf, name, tau)
+    figOs = DOsci.fig
+
+# generate a simple window for graphics display as a tk.DrawingArea
+    root = Tk.Tk()
+    root.wm_title("Oscilloscope Density Display")
+    canvas = FigureCanvasTkAgg(figOs, master=root)
+    canvas.draw()
+    canvas.get_tk_widget().pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+    canvas._tkcanvas.pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+    button = Tk.Button(master=root, text='Quit', command=sys.exit)
+    button.pack(side=Tk.BOTTOM)
+
+# set up matplotlib animation
+    osciAnim = anim.FuncAnimation(figOs, DOsci, yieldBatch_fromBM,
+                  init_func=DOsci.init, interval=interval, blit=True,
+                  fargs=None, repeat=True, save_count=None)
+                       # save_count=None is a (temporary) work-around
+                       #     to fix memory leak in animate
+    Tk.mainloop()
+
+  except:
+    print('*==* mpDensityOsci: termination signal recieved')
+  sys.exit()
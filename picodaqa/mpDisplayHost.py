@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+'''Display host: several display modules in one TKinter window
+
+  instead of one process per display (mpOsci, mpDensityOsci, mpRMeter,
+  mpVMeter, mpHists, mpBDisplay, mpBufManCntrl), a single process shows any
+  subset of them as tabs of a notebook. All displays are updated
+  by one timer (common frame clock), data sources are polled
+  without waiting, and only the visible tab is drawn.
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import sys
+
+if sys.version_info[0] < 3:
+  import Tkinter as Tk
+  import ttk
+  import tkMessageBox as mbox
+  from Queue import Empty
+else:
+  import tkinter as Tk
+  from tkinter import ttk
+  from tkinter import messagebox as mbox
+  from queue import Empty
+
+import matplotlib
+matplotlib.use('TkAgg')
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from .Oscilloscope import Oscilloscope
+from .DensityOsci import DensityOsci
+from .RMeter import RMeter
+from .VoltMeter import VoltMeter
+from .BarDisplay import BarDisplay
+from .animHists import animHists
+from .plotBufManInfo import plotBufManInfo
+from .SharedHists import SharedHists
+from .mpBufManCntrl import BufManCntrlFrame
+
+def pollQ(Q):
+  '''next entry of a Queue or BufferMan BMmpQue, None if empty'''
+  if hasattr(Q, 'poll'): # BMmpQue
+    return Q.poll()
+  try:
+    return Q.get_nowait()
+  except Empty:
+    return None
+
+def eventSource(Q):
+  '''data for instruments expecting (count, evNr, evTime, ...)'''
+  cnt = [0]
+  def source():
+    e = pollQ(Q)
+    if e is None: return None
+    cnt[0] += 1
+    return (cnt[0],) + tuple(e)
+  return source
+
+def batchSource(Q):
+  '''events in BufferMan shared buffers since last call (BMmpQue)'''
+  def source():
+    batch = Q.recentEvents()
+    return batch if len(batch[0]) else None
+  return source
+
+def valueSource(Q):
+  '''latest entry of a Queue'''
+  def source():
+    v = None
+    while True:
+      e = pollQ(Q)
+      if e is None: return v
+      v = e
+  return source
+
+def histSource(Q):
+  '''snapshot of SharedHists or all lists of values from Queue'''
+  if isinstance(Q, SharedHists):
+    version = [-1]
+    def source():
+      if Q.version.value == version[0]: return None
+      snap = Q.snapshot()
+      version[0] = snap[0]
+      return snap
+  else:
+    def source():
+      vals = None
+      while True:
+        e = pollQ(Q)
+        if e is None: return vals
+        if vals is None:
+          vals = [list(v) for v in e]
+        else:
+          for ih in range(len(e)): vals[ih] += list(e[ih])
+  return source
+
+def counterSource():
+  '''sequence of integers, for instruments reading their own input'''
+  cnt = [0]
+  def source():
+    cnt[0] += 1
+    return cnt[0]
+  return source
+
+class DisplayPanel(object):
+  '''
+  figure of one display instrument in a tab of the display host
+
+    the instrument provides fig, init() returning the graphics objects
+    to be animated, and an update function returning the objects
+    changed; the figure is drawn by blitting onto a saved background
+  '''
+
+  def __init__(self, master, inst, source, interval, update=None):
+    '''Args:
+         master: Tk container for the canvas
+         inst: instrument object
+         source: function returning new data or None, must not wait
+         interval: time between updates in ms, None: every frame
+         update: update function of instrument, default inst()
+    '''
+    self.inst = inst
+    self.source = source
+    self.interval = interval
+    self.update = inst if update is None else update
+    self.fig = inst.fig
+
+    self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+    self.canvas.get_tk_widget().pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+    self.artists = list(inst.init())
+    for a in self.artists: a.set_animated(True)
+    self.bg = None
+    self.canvas.mpl_connect('draw_event', self.onDraw)
+    self.canvas.draw()
+
+  def onDraw(self, event):
+    # after full redraw (e.g. resize): save background, add animation
+    self.bg = self.canvas.copy_from_bbox(self.fig.bbox)
+    for a in self.artists: self.fig.draw_artist(a)
+
+  def __call__(self, visible):
+    '''get new data, update instrument and draw if visible'''
+    data = self.source()
+    if data is None: return
+    changed = self.update(data)
+    if not changed: return
+    for a in changed:
+      if a not in self.artists:
+        a.set_animated(True)
+        self.artists.append(a)
+    if visible and self.bg is not None:
+      self.canvas.restore_region(self.bg)
+      for a in self.artists: self.fig.draw_artist(a)
+      self.canvas.blit(self.fig.bbox)
+# - end class DisplayPanel
+
+# display modules, with arguments as the stand-alone versions
+#   Returns: label of tab, display panel
+def Osci(frame, Q, conf, interval=50., name='event rate'):
+  return 'Oscilloscope', DisplayPanel(frame, Oscilloscope(conf, name),
+                                      eventSource(Q), interval)
+
+def DensityOsc(frame, Q, conf, interval=100., name='density', tau=0.):
+  return 'Density', DisplayPanel(frame, DensityOsci(conf, name, tau),
+                                 batchSource(Q), interval)
+
+def RateMeter(frame, Q, maxRate=10., interval=2500., name='rate history'):
+  return name, DisplayPanel(frame, RMeter(maxRate, interval, name),
+                            eventSource(Q), interval)
+
+def VMeter(frame, Q, conf, WaitTime=500., name='effective Voltage'):
+  return name, DisplayPanel(frame, VoltMeter(conf), eventSource(Q),
+                            WaitTime)
+
+def Hists(frame, Q, Hdescripts, interval, name='Histograms'):
+  H = animHists(Hdescripts, name)
+  return name, DisplayPanel(frame, H, histSource(Q), interval,
+              update = H.showCounts if isinstance(Q, SharedHists) else H)
+
+def BDisplay(frame, Q, conf, mode=0, size=1, name='SignalSize'):
+  # updated on every tick of frame clock
+  return name, DisplayPanel(frame, BarDisplay(conf, mode, size),
+                            valueSource(Q), None)
+
+def BufManCntrl(frame, Qcmd, Qlog, Qinfo, maxRate=100., interval=1000.):
+  gframe = BufManCntrlFrame(frame, Qcmd, Qlog)
+  return 'BufferMan', DisplayPanel(gframe,
+            plotBufManInfo(Qinfo, maxRate, interval),
+            counterSource(), interval)
+
+panelTypes = {'mpOsci':Osci, 'mpDensityOsci':DensityOsc,
+              'mpRMeter':RateMeter, 'mpVMeter':VMeter,
+              'mpHists':Hists, 'mpBDisplay':BDisplay,
+              'mpBufManCntrl':BufManCntrl}
+
+def mpDisplayHost(panels, interval=50., name='picoDAQ'):
+  '''show display modules as tabs in one window
+    Args:
+      panels: list of (module name, args), with the arguments as for
+        the stand-alone display modules, e.g.
+        ('mpOsci', (Q, OscConfDict, 100., 'event rate'))
+      interval: common frame clock in ms, update intervals of
+        displays are multiples of this
+      name: window title
+  '''
+
+# ------- executable part --------
+  Tkwin = Tk.Tk()
+  Tkwin.wm_title(name)
+
+# handle destruction of top-level window
+  def _delete_window():
+    if mbox.askokcancel("Quit", "Really destroy display window ?"):
+       print("Deleting display window")
+       Tkwin.destroy()
+
+  Tkwin.protocol("WM_DELETE_WINDOW", _delete_window)
+
+  nb = ttk.Notebook(Tkwin)
+  nb.pack(side=Tk.TOP, fill=Tk.BOTH, expand=1)
+
+  tabs = [] # (Tk frame, display panel)
+  for modName, args in panels:
+    if modName not in panelTypes:
+      print('*==* mpDisplayHost: unknown display module ' + str(modName))
+      continue
+    frame = ttk.Frame(nb)
+    try:
+      label, P = panelTypes[modName](frame, *args)
+    except Exception as e:
+      print('*==* mpDisplayHost: failed to set up ' + str(modName) +
+            ': ' + str(e))
+      continue
+    nb.add(frame, text=label)
+    tabs.append( (frame, P) )
+
+  if not tabs:
+    print('*==* mpDisplayHost: nothing to display')
+    sys.exit()
+
+# update of each display every nth tick of the frame clock
+  every = [max(1, int(round(P.interval/interval))) if P.interval else 1
+           for f, P in tabs]
+  tick = [0]
+
+  def frameClock():
+    tick[0] += 1
+    current = nb.select()
+    for (frame, P), n in zip(tabs, every):
+      if tick[0] % n == 0:
+        P(str(frame) == current)
+    Tkwin.after(int(interval), frameClock)
+
+  def tabChanged(event):
+  # redraw newly visible display, it was not drawn while hidden
+    for frame, P in tabs:
+      if str(frame) == nb.select(): P.canvas.draw()
+
+  nb.bind('<<NotebookTabChanged>>', tabChanged)
+
+  try:
+    Tkwin.after(int(interval), frameClock)
+    Tk.mainloop()
+  except:
+    print('*==* mpDisplayHost: termination signal received')
+  sys.exit()
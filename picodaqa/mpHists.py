@@ -7,7 +7,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import sys, time, numpy as np
+import sys, numpy as np
 
 import matplotlib
 matplotlib.use('TkAgg')
@@ -15,11 +15,13 @@ import matplotlib.pyplot as plt, matplotlib.animation as anim
 
 # import Histogram class
 from .animHists import *
+from .SharedHists import SharedHists
 
 def mpHists(Q, Hdescripts, interval, name = 'Histograms'):
   ''' show animated histogram(s)
     Args:
-      Q:    multiprocessing.Queue() 
+      Q:    multiprocessing.Queue() with lists of values, or
+            SharedHists object filled by producer
       Hdescripts:  list of histogram descriptors, where each 
         descriptor is itself a list: [min, max, nbins, ymax, name, type]
           min: minimum value
@@ -32,28 +34,56 @@ def mpHists(Q, Hdescripts, interval, name = 'Histograms'):
 
   # Generator to provide data to animation
   def yieldData_fromQ():
-  # receive data from multiprocessing Queue 
+  # receive data from multiprocessing Queue; all entries arrived since
+  #   the last frame are combined, None if there are none, so that
+  #   the display never waits for data and never falls behind
     cnt = 0
     try:
       while True:
-        while not Q.qsize(): 
-          time.sleep(0.1)
-        valueslist = Q.get()
-        cnt+=1
+        valueslist = None
+        while not Q.empty():
+          vl = Q.get()
+          cnt+=1
+          if valueslist is None:
+            valueslist = [list(v) for v in vl]
+          else:
+            for ih in range(len(vl)):
+              valueslist[ih] += list(vl[ih])
         yield valueslist
     except:
       print('*==* yieldData_fromQ: termination signal received')
       return
 
 
+  # Generator to provide snapshots of shared histograms
+  def yieldData_fromShared():
+  # snapshot if histograms changed since last frame, None otherwise
+    version = -1
+    try:
+      while True:
+        if Q.version.value != version:
+          snap = Q.snapshot()
+          version = snap[0]
+          yield snap
+        else:
+          yield None
+    except:
+      print('*==* yieldData_fromShared: termination signal received')
+      return
+
+
 # ------- executable part -------- 
 #  print(' -> mpHist starting')
 
   try:
     H = animHists(Hdescripts, name)
     figH = H.fig
+    if isinstance(Q, SharedHists):
+      func, frames = H.showCounts, yieldData_fromShared
+    else:
+      func, frames = H, yieldData_fromQ
 # set up matplotlib animation
-    HAnim = anim.FuncAnimation(figH, H, yieldData_fromQ, 
+    HAnim = anim.FuncAnimation(figH, func, frames, 
                         init_func=H.init, interval=interval, blit=True,
                         fargs=None, repeat=True, save_count=None)
                              # save_count=None is a (temporary) work-around 
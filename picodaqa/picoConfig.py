@@ -4,6 +4,37 @@ from __future__ import absolute_import
 
 import numpy as np, time, sys
 
+from .picoStream import PSstream, streamingModels
+
+def softTrigger(x, thr, hyst, armed):
+  '''
+  vectorized level trigger with hysteresis (rising edge)
+
+    fires where x reaches thr after having been below thr - hyst
+
+    Args:
+      x: signal
+      thr: threshold
+      hyst: hysteresis
+      armed: trigger state at the start of x, True if armed
+
+    Returns:
+      indices of trigger positions in x, trigger state at end of x
+  '''
+  # +1: above threshold, -1: below re-arming level, 0: unchanged
+  s = np.zeros(len(x), dtype=np.int8)
+  s[x < thr - hyst] = -1
+  s[x >= thr] = 1
+  # propagate last defined state to all samples
+  idx = np.where(s != 0, np.arange(len(x)), -1)
+  np.maximum.accumulate(idx, out=idx)
+  s0 = -1 if armed else 1
+  st = np.where(idx >= 0, s[idx], s0)
+  trg = np.nonzero((st[1:] == 1) & (st[:-1] == -1))[0] + 1
+  if len(x) and s0 == -1 and st[0] == 1:
+    trg = np.concatenate(([0], trg))
+  return trg, (st[-1] == -1) if len(x) else armed
+
 class PSconfig(object):
   '''set PicoScope configuration'''
 
@@ -89,6 +120,38 @@ class PSconfig(object):
       self.trgTO=confdict["trgTO"] 
     else:
       self.trgTO=1000             #  and time-out
+# rapid-block mode: number of triggers captured in device memory segments
+    if "NSegments" in confdict: 
+      self.NSegments=confdict["NSegments"] 
+    else:
+      self.NSegments=1            #  1: block mode, one trigger per readout
+# acquisition mode: block or streaming with software trigger
+#   streaming is only available for the simulated device (PSmodel: sim)
+#   and for models with streaming calls in pico-python (streamingModels)
+    if "acqMode" in confdict: 
+      self.acqMode=confdict["acqMode"] 
+    else:
+      self.acqMode='block'
+    if self.acqMode not in ['block', 'streaming']:
+      print('!!! PSconfig: unknown acqMode ' + str(self.acqMode))
+      print('  - exiting')
+      sys.exit(1)
+    if self.acqMode == 'streaming':
+      if self.PSmodel != 'sim' and self.PSmodel not in streamingModels:
+        print('!!! PSconfig: acqMode streaming not supported for ps' + \
+              self.PSmodel + ', only for PSmodel sim, ' + \
+              ', '.join(streamingModels))
+        print('  - exiting')
+        sys.exit(1)
+      self.NSegments = 1
+    if "trgHyst" in confdict: 
+      self.trgHyst=confdict["trgHyst"] # hysteresis of software trigger
+    else:
+      self.trgHyst=abs(self.trgThr)/10.
+    if "streamBufSize" in confdict: 
+      self.streamBufSize=confdict["streamBufSize"] # samples per channel
+    else:
+      self.streamBufSize=2**20
 # configuration of AWG
     if "swpSG" in confdict: 
       self.swpSG=confdict["swpSG"]
@@ -130,20 +193,32 @@ class PSconfig(object):
 
     if "mode" in confdict: 
       self.mode = confdict["mode"] # "VMeter" "test"
+
+# parameters of simulated device (PSmodel: sim)
+    if "simConf" in confdict: 
+      self.simConf = confdict["simConf"]
+    else:
+      self.simConf = {}
 # - end PSconf.__init__()
 
   def init(self):
 # configuration parameters only known after initialisation
     # import libraries relevant to PS model
     try:
-      exec('from picoscope import ps'+self.PSmodel)
+      if self.PSmodel == 'sim':
+        from .picoSim import PSsim
+      else:
+        exec('from picoscope import ps'+self.PSmodel)
     except Exception as e:
       print('!!! PSconfig:  Error loading driver library ps'+self.PSmodel)
       print(str(e))
       print('  - exiting')
       sys.exit(1)
     try:      
-      exec('self.picoDevice = ps'+self.PSmodel+'.PS'+self.PSmodel+'()')  
+      if self.PSmodel == 'sim': # simulated device, no hardware needed
+        self.picoDevice = PSsim(self.simConf)
+      else:
+        exec('self.picoDevice = ps'+self.PSmodel+'.PS'+self.PSmodel+'()')  
     except Exception as e:
       print('!!! PSconfig:  Error initialising device')
       print(str(e))
@@ -175,6 +250,8 @@ class PSconfig(object):
                         'trgActive' : self.trgActive,
                         'trgThr' : self.trgThr,
                         'trgTyp' : self.trgTyp }
+    if self.NSegments > 1: # times of segments are interpolated
+      self.OscConfDict['approxTrgTime'] = True
 # - end PSconf.init()
 
   def setSamplingPars(self, dT, NSamples, CRanges):
@@ -207,19 +284,20 @@ class PSconfig(object):
       print(prompt+"number of samples = %d (%d)" % (NSamples, self.Nsamples))
       #print("  > maximum samples = %d" % maxSamples)
 # 2) Channel Ranges
-      CRanges=[]
-      for i, Chan in enumerate(self.picoChannels):
-        CRanges.append(self.picoDevice.setChannel(Chan, self.ChanModes[i], 
-                   self.ChanRanges[i], VOffset=self.ChanOffsets[i], 
-                   enabled=True, BWLimited=False) )
-        if verbose>0:
-          print(prompt+"range channel %s: %.3gV (%.3gV)" \
-          %(self.picoChannels[i], CRanges[i], self.ChanRanges[i]))
-          print(prompt+"channel offset %s: %.3gV"\
-          %(self.picoChannels[i], self.ChanOffsets[i]))
+    CRanges=[]
+    for i, Chan in enumerate(self.picoChannels):
+      CRanges.append(self.picoDevice.setChannel(Chan, self.ChanModes[i], 
+                 self.ChanRanges[i], VOffset=self.ChanOffsets[i], 
+                 enabled=True, BWLimited=False) )
+      if verbose>0:
+        print(prompt+"range channel %s: %.3gV (%.3gV)" \
+        %(self.picoChannels[i], CRanges[i], self.ChanRanges[i]))
+        print(prompt+"channel offset %s: %.3gV"\
+        %(self.picoChannels[i], self.ChanOffsets[i]))
 # 3) enable trigger
     self.picoDevice.setSimpleTrigger(self.trgChan, self.trgThr, self.trgTyp,
-          self.trgDelay, self.trgTO, enabled=self.trgActive)    
+          self.trgDelay, self.trgTO, 
+          enabled=self.trgActive and self.acqMode != 'streaming')    
     if verbose>0:
       if self.trgActive:
         print(prompt+"trigger channel %s enabled: %.3gV %s" %\
@@ -239,13 +317,49 @@ class PSconfig(object):
         print(prompt+"sweep type %s, stop %.3gHz, Tdwell %.3gs"\
             %(self.swpSG, self.stopFreqSG, self.dwellTimeSG) )
 
+# 5) memory segments for rapid-block mode or streaming 
+    if self.acqMode == 'streaming':
+      if self.PSmodel == 'sim':
+        self.streamDevice = self.picoDevice
+      else: # low-level streaming calls of driver
+        self.streamDevice = PSstream(self.picoDevice, self.PSmodel,
+                                     self.picoChannels, TSampling)
+      if verbose>0:
+        print(prompt+"streaming mode, software trigger, buffer %i samples"\
+            % (self.streamBufSize) )
+    elif self.NSegments > 1:
+      maxSegSamples = self.picoDevice.memorySegments(self.NSegments)
+      self.picoDevice.setNoOfCaptures(self.NSegments)
+      if verbose>0:
+        print(prompt+"rapid-block mode: %i segments, max. %i samples"\
+            % (self.NSegments, maxSegSamples) )
+      if NSamples > maxSegSamples:
+        print(prompt+"!!! number of samples exceeds segment size")
+
     self.setSamplingPars(TSampling, NSamples, CRanges) # store in config class
     # reserve static buffer for picoscope driver for storing raw data
     self.rawBuf = np.empty([self.NChannels, NSamples], dtype=np.int16 )
+    if self.NSegments > 1:
+      self.rawBulk = np.empty([self.NChannels, self.NSegments, NSamples], 
+                              dtype=np.int16 )
+
+    # conversion of raw ADC codes to Volts: V = code * ADCscale + ADCoffset 
+    self.ADCscale = []
+    self.ADCoffset = []
+    v = np.empty(2, dtype=np.float64)
+    for C in self.picoChannels:
+      self.picoDevice.rawToV(C, np.array([0, 1], dtype=np.int16), v,
+                             dtype=np.float64)
+      self.ADCoffset.append(v[0])
+      self.ADCscale.append(v[1] - v[0])
+
+    if self.acqMode == 'streaming':
+      self.iniStream()
 
     # estimate set-up and transfer-overhead
     #     from maximum rate with free-running trigger
     self.toverhead = 0.00038 + self.NChannels * 0.00013
+    if self.PSmodel == 'sim': self.toverhead = 0.
 
 # -- end def picoIni
 
@@ -255,7 +369,8 @@ class PSconfig(object):
       this part is hardware (i.e. driver) specific code for PicoScope device,
       interfaces to BufferMan.py 
       Args:
-        buffer: space to store data
+        buffer: space to store data, float32 for Volts, 
+                int16 or int8 for raw ADC codes
 
       Returns:
         ttrg: time when device became ready
@@ -273,15 +388,234 @@ class PSconfig(object):
     ttrg=time.time()
     # account life time, w. appr. corr. for set-up time
     tlife = ttrg - ti - self.toverhead
-  # store raw data in global array 
-    for i, C in enumerate(self.picoChannels):
-      self.picoDevice.getDataRaw(C, self.NSamples, data=self.rawBuf[i])
-      self.picoDevice.rawToV(C, self.rawBuf[i], buffer[i], dtype=np.float32)
-# alternative:
-     # self.picoDevice.getDataV(C, NSamples, dataV=VBuf[ibufw,i], dtype=np.float32)
+    self.storeData(buffer)
     return ttrg, tlife
 # - end def acquireDataBM()
 
+  def acquireDataBMrapid(self, buffers):
+    '''
+    read data from device in rapid-block mode
+      NSegments triggers are captured in device memory and 
+      transferred in bulk, interfaces to BufferMan.py 
+
+      Args:
+        buffers: list of NSegments buffers to store data 
+
+      Returns:
+        ttrgs: times of triggers, approximate: the driver does not 
+               provide trigger times of segments
+        tlife: life time of device
+    '''
+    if self.pretrig != 0.:
+      self.picoDevice.runBlock(pretrig=self.pretrig) #
+    else:
+      self.picoDevice.runBlock() #
+    ti=time.time()
+    while not self.picoDevice.isReady():
+      if not self.BM.ACTIVE.value: return None
+      time.sleep(0.0001)
+    ttrg=time.time()
+    tlife = ttrg - ti - self.toverhead
+    for i, C in enumerate(self.picoChannels):
+      self.picoDevice.getDataRawBulk(C, self.NSamples, 0, self.NSegments-1,
+                                     data=self.rawBulk[i])
+    for iseg, buffer in enumerate(buffers):
+      for i, C in enumerate(self.picoChannels):
+        self.convertRaw(C, self.rawBulk[i, iseg], buffer[i])
+    # trigger times of segments are not provided by the driver,
+    #   assume equal spacing between start of acquisition and last trigger
+    ttrgs = ti + (ttrg - ti) * np.arange(1, self.NSegments+1)/self.NSegments
+    return ttrgs, tlife
+# - end def acquireDataBMrapid()
+
+  def iniStream(self):
+    '''
+    set up ring buffer and software trigger for streaming mode
+    '''
+    NS = self.NSamples
+    if self.streamBufSize < 4 * NS:
+      self.streamBufSize = 4 * NS
+    # ring of raw ADC codes, indexed by absolute sample number modulo size
+    self.streamBuf = np.empty([self.NChannels, self.streamBufSize], 
+                              dtype=np.int16)
+    self.sWrite = 0     # number of samples received
+    self.npre = int(self.pretrig * NS) # samples before trigger 
+    self.sNextTrg = self.npre # next sample where trigger is accepted
+    # no new trigger in post-trigger part of window,
+    #   consecutive windows if trigger not active 
+    self.trgHoldoff = NS - self.npre if self.trgActive else NS
+    self.trgArmed = False
+    self.pendingTrg = [] # trigger positions waiting for complete window
+    self.NStreamLost = 0 # triggers lost due to ring buffer overrun
+    self.sLive = 0       # samples accounted for in life time
+    self.sLost = 0       # samples lost since sLive
+    self.streamStarted = False
+    # trigger threshold and hysteresis in ADC codes 
+    if self.trgActive:
+      iC = self.picoChannels.index(self.trgChan)
+      self.trgSign = -1 if self.trgTyp in ['Falling', 'Below'] else 1
+      self.iTrgChan = iC
+      self.trgCode = self.trgSign * \
+                     (self.trgThr - self.ADCoffset[iC]) / self.ADCscale[iC] 
+      self.hystCode = abs(self.trgHyst / self.ADCscale[iC])
+
+  def receiveStream(self, data, nSkip=0):
+    '''
+    callback for streaming driver: append raw data to ring buffer
+      and find trigger positions 
+
+      Args:
+        data: raw ADC codes, shape (NChannels, n)
+        nSkip: number of samples lost by the device before data
+    '''
+    n = data.shape[1]
+    RS = self.streamBufSize
+    NS = self.NSamples
+    s0 = self.sWrite
+    if nSkip: # gap in data stream, incomplete windows are lost
+      self.sLost += max(0, s0 + nSkip - max(s0, self.sLive))
+      lost = [t for t in self.pendingTrg if t - self.npre + NS > s0]
+      self.NStreamLost += len(lost)
+      self.pendingTrg = self.pendingTrg[:len(self.pendingTrg)-len(lost)]
+      s0 += nSkip
+      self.sNextTrg = max(self.sNextTrg, s0 + self.npre)
+      self.trgArmed = False
+    if n > RS: # more new samples than ring can hold, keep last part
+      data = data[:, n-RS:]
+      s0 += n - RS
+      n = RS
+    # oldest sample still needed: start of next window 
+    if len(self.pendingTrg):
+      sNeed = self.pendingTrg[0] - self.npre
+    else:
+      sNeed = self.sNextTrg - self.npre
+    sOld = s0 + n - RS # oldest sample in ring after copy
+    if sOld > sNeed: # ring overrun, data lost
+      self.sLost += max(0, sOld - max(sNeed, self.sLive))
+      lost = [t for t in self.pendingTrg if t - self.npre < sOld]
+      self.NStreamLost += len(lost)
+      self.pendingTrg = self.pendingTrg[len(lost):]
+      self.sNextTrg = max(self.sNextTrg, sOld + self.npre)
+    # copy to ring, in two parts if wrapping around
+    i0 = s0 % RS
+    n1 = min(n, RS - i0)
+    self.streamBuf[:, i0:i0+n1] = data[:, :n1]
+    self.streamBuf[:, :n-n1] = data[:, n1:]
+    self.sWrite = s0 + n
+
+    # find trigger candidates on new data
+    if self.trgActive:
+      x = data[self.iTrgChan].astype(np.int32)
+      if self.trgSign < 0: np.negative(x, out=x)
+      if self.trgTyp in ['Above', 'Below']: # level trigger
+        trg = np.nonzero(x >= self.trgCode)[0] 
+      else: # edge with hysteresis
+        trg, self.trgArmed = softTrigger(x, self.trgCode, self.hystCode, 
+                                         self.trgArmed)
+      trg += s0
+    else: # no trigger, consecutive windows 
+      trg = np.arange(self.sNextTrg, self.sWrite, NS)
+    # accept triggers outside of window of previous trigger
+    i = np.searchsorted(trg, self.sNextTrg)
+    while i < len(trg):
+      self.pendingTrg.append(trg[i])
+      self.sNextTrg = trg[i] + self.trgHoldoff
+      i = np.searchsorted(trg, self.sNextTrg)
+
+  def acquireDataBMstream(self, buffer):
+    '''
+    read data in streaming mode, 
+      cuts trigger windows from ring buffer, interfaces to BufferMan.py 
+
+      Args:
+        buffer: space to store data
+
+      Returns:
+        ttrg: time of trigger
+        tlife: life time since last call
+    '''
+    if not self.streamStarted:
+      self.streamDevice.runStreaming()
+      self.tStream0 = time.time()
+      self.nPause = self.BM.NPause.value
+      self.streamStarted = True
+    NS = self.NSamples
+    # wait for complete window after trigger
+    while not len(self.pendingTrg) or \
+          self.pendingTrg[0] - self.npre + NS > self.sWrite:
+      if not self.BM.ACTIVE.value: return None
+      if self.BM.NPause.value != self.nPause or not self.BM.RUNNING.value:
+        if not self.resumeStream(): return None
+      if not self.streamDevice.getStreamingLatestValues(self.receiveStream):
+        time.sleep(0.0005)
+    s = self.pendingTrg.pop(0) - self.npre
+    # copy window from ring
+    RS = self.streamBufSize
+    i0 = s % RS
+    if i0 + NS <= RS:
+      raw = self.streamBuf[:, i0:i0+NS]
+    else:
+      n1 = RS - i0
+      raw = self.rawBuf
+      raw[:, :n1] = self.streamBuf[:, i0:]
+      raw[:, n1:] = self.streamBuf[:, :NS-n1]
+    for i, C in enumerate(self.picoChannels):
+      self.convertRaw(C, raw[i], buffer[i])
+    ttrg = self.tStream0 + (s + self.npre) * self.TSampling
+    # no dead time in streaming mode, except for lost data: life time 
+    #   is the duration of the samples received since last call 
+    #   (or since resume) without those lost in this interval
+    tlife = (self.sWrite - self.sLive - self.sLost) * self.TSampling
+    self.sLive = self.sWrite
+    self.sLost = 0
+    return ttrg, tlife
+# - end def acquireDataBMstream()
+
+  def resumeStream(self):
+    '''
+    wait for running state after pause or stop of Buffer Manager;
+      data received in the meantime are discarded and do not count
+      as life time
+
+      Returns: False if Buffer Manager ended
+    '''
+    while not self.BM.RUNNING.value:
+      if not self.BM.ACTIVE.value: return False
+      time.sleep(0.01)
+    self.nPause = self.BM.NPause.value
+    # first sample after resume
+    sResume = max(self.sWrite, 
+                  int((time.time() - self.tStream0)/self.TSampling))
+    self.pendingTrg = []
+    self.sNextTrg = sResume + self.npre
+    self.sLive = sResume
+    self.sLost = 0
+    return True
+
+  def storeData(self, buffer):
+    '''
+    transfer data from device to buffer,
+      raw ADC codes are stored directly in int16 buffers
+    '''
+    for i, C in enumerate(self.picoChannels):
+      if buffer.dtype == np.int16:
+        self.picoDevice.getDataRaw(C, self.NSamples, data=buffer[i])
+      else:
+        self.picoDevice.getDataRaw(C, self.NSamples, data=self.rawBuf[i])
+        self.convertRaw(C, self.rawBuf[i], buffer[i])
+
+  def convertRaw(self, C, raw, buffer):
+    '''
+    copy raw ADC codes of channel C to buffer, int16 buffers receive the 
+      codes, int8 buffers only the most significant byte, others Volts
+    '''
+    if buffer.dtype == np.int16:
+      buffer[:] = raw
+    elif buffer.dtype == np.int8:
+      np.right_shift(raw, 8, out=buffer, casting='unsafe')
+    else:
+      self.picoDevice.rawToV(C, raw, buffer, dtype=np.float32)
+
   def acquireData(self, buffer):
     '''
     read data from device
@@ -320,6 +654,8 @@ class PSconfig(object):
     '''
     prompt = 4*' ' + 'PSconf: '
     if self.verbose: print(prompt + "closing connection to device")
+    if self.acqMode == 'streaming' and self.NStreamLost:
+      print(prompt + "%i triggers lost in streaming mode" % self.NStreamLost)
     self.picoDevice.stop()
     self.picoDevice.close()
     time.sleep(0.5)
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+'''
+.. module picoSim of picoDAQ
+
+  simulated PicoScope device with the interface of the device classes of
+  pico-python (runBlock, isReady, getDataRaw, rawToV, setChannel,
+  setSimpleTrigger, ...), to run and benchmark picoDAQ without hardware;
+  selected with PSmodel: sim in the PicoScope configuration
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np, time
+
+class PSsim(object):
+  '''
+  simulated PicoScope: random trapezoidal pulses on top of gaussian noise
+
+    - triggers follow a Poisson process with mean rate "rate"
+    - pulses on all channels at trigger time
+    - a fraction "doubleFrac" of events contains a second pulse on one
+      of the channels, delayed with exponential distribution (mean tauDouble)
+  '''
+
+  CHANNELS = ['A', 'B', 'C', 'D']
+  CHANNEL_RANGES = [0.02, 0.05, 0.1, 0.2, 0.5, 1., 2., 5., 10., 20.]
+  MAX_VALUE = 32512   # maximum ADC code
+
+  def __init__(self, simdict=None):
+    '''Args: dictionary with simulation parameters'''
+    if simdict == None: simdict = {}
+
+    if "rate" in simdict:
+      self.rate = simdict["rate"]   # mean trigger rate (Hz)
+    else:
+      self.rate = 100.
+    if "noise" in simdict:
+      self.noise = simdict["noise"] # rms of noise (V)
+    else:
+      self.noise = 0.002
+    if "pheight" in simdict:
+      self.pheight = simdict["pheight"] # pulse height (V)
+    else:
+      self.pheight = -0.06
+    if "taur" in simdict:
+      self.taur = simdict["taur"]   # rise time (s)
+    else:
+      self.taur = 20E-9
+    if "tauon" in simdict:
+      self.tauon = simdict["tauon"] # hold time (s)
+    else:
+      self.tauon = 12E-9
+    if "tauf" in simdict:
+      self.tauf = simdict["tauf"]   # fall time (s)
+    else:
+      self.tauf = 128E-9
+    if "doubleFrac" in simdict:
+      self.doubleFrac = simdict["doubleFrac"] # fraction of double pulses
+    else:
+      self.doubleFrac = 0.
+    if "tauDouble" in simdict:
+      self.tauDouble = simdict["tauDouble"] # mean delay of 2nd pulse (s)
+    else:
+      self.tauDouble = 2.2E-6
+    if "ADCbits" in simdict:
+      self.ADCbits = simdict["ADCbits"] # resolution of ADC
+    else:
+      self.ADCbits = 8
+
+    self.TSampling = 1E-8
+    self.NSamples = 1000
+    self.CHRange = {}
+    self.CHOffset = {}
+    self.trgChan = 'A'
+    self.trgActive = False
+    self.trgTO = 1000
+    self.NSegments = 1
+    self.tReady = 0.
+    self.data = None
+    self.rng = np.random.RandomState()
+
+  def getAllUnitInfo(self):
+    return 'simulated PicoScope, picodaqa.picoSim'
+
+  def getMaxValue(self):
+    return self.MAX_VALUE
+
+  def setSamplingInterval(self, sampleInterval, duration):
+    self.TSampling = sampleInterval
+    self.NSamples = int(round(duration / sampleInterval))
+    return self.TSampling, self.NSamples, self.maxSamples()
+
+  def maxSamples(self):
+    return 2**24 // self.NSegments
+
+  def setChannel(self, channel='A', coupling='AC', VRange=2.0,
+                 VOffset=0.0, enabled=True, BWLimited=False,
+                 probeAttenuation=1.0):
+    # next larger range available
+    r = [R for R in self.CHANNEL_RANGES if R >= VRange]
+    self.CHRange[channel] = r[0] if len(r) else self.CHANNEL_RANGES[-1]
+    self.CHOffset[channel] = VOffset
+    return self.CHRange[channel]
+
+  def setSimpleTrigger(self, trigSrc, threshold_V=0, direction='Rising',
+                       delay=0, timeout_ms=100, enabled=True):
+    self.trgChan = trigSrc
+    self.trgActive = enabled
+    self.trgTO = timeout_ms
+
+  def setSigGenBuiltInSimple(self, *args, **kwargs):
+    pass # no signal generator
+
+  def memorySegments(self, noSegments):
+    self.NSegments = noSegments
+    return self.maxSamples()
+
+  def setNoOfCaptures(self, noCaptures):
+    self.NSegments = noCaptures
+
+  def pulse(self, t):
+    '''trapezoidal pulse shape, normalised to height one'''
+    return np.interp(t,
+            [0., self.taur, self.taur+self.tauon,
+             self.taur+self.tauon+self.tauf],
+            [0., 1., 1., 0.], left=0., right=0.)
+
+  def simulate(self, nEvt, pretrig):
+    '''generate nEvt events with pulses at trigger position
+
+       Returns: signals in Volts, shape (nEvt, NChannels, NSamples)
+    '''
+    chans = sorted(self.CHRange)
+    NC = len(chans)
+    t = self.TSampling * np.arange(self.NSamples)
+    if self.trgActive:
+      t0 = np.full(nEvt, pretrig * self.NSamples * self.TSampling)
+    else:  # free running, pulse at random position
+      t0 = self.rng.uniform(0., self.NSamples * self.TSampling, nEvt)
+    V = self.rng.normal(0., self.noise, (nEvt, NC, self.NSamples))
+    V += self.pheight * self.pulse(t[None, :] - t0[:, None])[:, None, :]
+    # second pulse on randomly chosen channel
+    for iev in np.nonzero(self.rng.uniform(size=nEvt) < self.doubleFrac)[0]:
+      t2 = t0[iev] + self.rng.exponential(self.tauDouble)
+      V[iev, self.rng.randint(NC)] += self.pheight * self.pulse(t - t2)
+    return V
+
+  def runBlock(self, pretrig=0.0, segmentIndex=0):
+    # waiting times for Poisson-distributed triggers
+    twait = self.NSegments * self.NSamples * self.TSampling
+    if self.trgActive:
+      twait += self.rng.exponential(1./self.rate, self.NSegments).sum()
+      twait = min(twait, self.trgTO / 1000.)
+    self.tReady = time.time() + twait
+    # signals as ADC codes in device memory
+    V = self.simulate(self.NSegments, pretrig)
+    data = self.toRaw(V.swapaxes(0, 1))
+    self.data = {}
+    for i, C in enumerate(sorted(self.CHRange)):
+      self.data[C] = data[i]
+
+  def isReady(self):
+    return time.time() >= self.tReady
+
+  def waitReady(self):
+    while not self.isReady():
+      time.sleep(0.0001)
+
+  def getDataRaw(self, channel='A', numSamples=0, startIndex=0,
+                 downSampleRatio=1, downSampleMode=0, segmentIndex=0,
+                 data=None):
+    if numSamples == 0: numSamples = self.NSamples
+    if data is None: data = np.empty(numSamples, dtype=np.int16)
+    # as driver: numSamples from startIndex, at most up to end of capture
+    d = self.data[channel][segmentIndex, startIndex:startIndex+numSamples]
+    data[:len(d)] = d
+    return data, len(d), 0
+
+  def getDataRawBulk(self, channel='A', numSamples=0, fromSegment=0,
+                     toSegment=None, downSampleRatio=1, downSampleMode=0,
+                     data=None):
+    if numSamples == 0: numSamples = self.NSamples
+    if toSegment is None: toSegment = self.NSegments - 1
+    if data is None:
+      data = np.empty((toSegment-fromSegment+1, numSamples), dtype=np.int16)
+    data[:] = self.data[channel][fromSegment:toSegment+1, :numSamples]
+    return data, numSamples, 0
+
+  def rawToV(self, channel, dataRaw, dataV=None, dtype=np.float64):
+    if dataV is None: dataV = np.empty(len(dataRaw), dtype=dtype)
+    a2v = self.CHRange[channel] / dtype(self.MAX_VALUE)
+    np.multiply(dataRaw, a2v, dataV)
+    np.subtract(dataV, self.CHOffset[channel], dataV)
+    return dataV
+
+  def runStreaming(self, maxChunk=2**18):
+    '''start continuous sampling, data generated on request 
+       in getStreamingLatestValues() according to elapsed time;
+       at most maxChunk samples are kept, older ones are lost 
+       (overflow)'''
+    self.tStream = time.time()
+    self.sStream = 0          # number of samples delivered
+    self.maxChunk = maxChunk  # maximum number of samples per request
+    self.kernel = self.pulse(self.TSampling * np.arange(
+      int((self.taur + self.tauon + self.tauf)/self.TSampling) + 2))
+    self.tail = np.zeros((len(self.CHRange), len(self.kernel)-1))
+
+  def getStreamingLatestValues(self, callback):
+    '''pass samples acquired since last call to callback,
+         callback(data, nSkip) with nSkip: samples lost before data
+
+       Returns: number of samples
+    '''
+    n = int((time.time() - self.tStream)/self.TSampling) - self.sStream
+    if n <= 0: return 0
+    nSkip = max(0, n - self.maxChunk) # not read in time, overflow
+    if nSkip:
+      n -= nSkip
+      self.sStream += nSkip
+      self.tail[:] = 0.
+    chans = sorted(self.CHRange)
+    NC = len(chans)
+    # Poisson-distributed pulse positions, optionally with 2nd pulse
+    npulse = self.rng.poisson(self.rate * n * self.TSampling)
+    ipulse = self.rng.randint(0, n, npulse)
+    ip2 = ipulse[self.rng.uniform(size=npulse) < self.doubleFrac]
+    ip2 = ip2 + (self.rng.exponential(self.tauDouble, len(ip2))
+                 / self.TSampling).astype(int)
+    ip2 = ip2[ip2 < n]
+    impulses = np.zeros((NC, n))
+    impulses[:, ipulse] = self.pheight
+    if len(ip2):
+      np.add.at(impulses, (self.rng.randint(NC, size=len(ip2)), ip2), 
+                self.pheight)
+    # signals: pulses convoluted with pulse shape, plus noise;
+    #   tails of pulses at end of chunk are added to next chunk
+    V = self.rng.normal(0., self.noise, (NC, n))
+    nk = len(self.kernel) - 1
+    for i in range(NC):
+      v = np.convolve(impulses[i], self.kernel)
+      v[:nk] += self.tail[i]
+      V[i] += v[:n]
+      self.tail[i] = v[n:]
+    self.sStream += n
+    callback(self.toRaw(V), nSkip)
+    return n
+
+  def toRaw(self, V):
+    '''convert signals to ADC codes, first index of V is channel'''
+    lsb = 2**(16 - self.ADCbits) # ADC resolution
+    data = np.empty(V.shape, dtype=np.int16)
+    for i, C in enumerate(sorted(self.CHRange)):
+      # offset is added to input signal before digitisation
+      c = (V[i] + self.CHOffset[C]) * self.MAX_VALUE / self.CHRange[C]
+      c = lsb * np.round(c / lsb)
+      data[i] = np.clip(c, -self.MAX_VALUE, self.MAX_VALUE)
+    return data
+
+  def stop(self):
+    pass
+
+  def close(self):
+    pass
+#- end class PSsim
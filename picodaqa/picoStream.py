@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+'''
+.. module picoStream of picoDAQ
+
+  streaming interface for PicoScope devices of pico-python:
+  runStreaming() and getStreamingLatestValues(callback), as provided
+  by the simulated device (picoSim), implemented with the low-level
+  streaming calls of the drivers
+
+  only the drivers listed in streamingModels provide these calls
+  (pico-python 0.7)
+'''
+
+from __future__ import print_function, division, unicode_literals
+from __future__ import absolute_import
+
+import numpy as np
+from importlib import import_module
+
+# PicoScope models with streaming calls in pico-python driver
+streamingModels = ['4000a']
+
+class PSstream(object):
+  '''continuous sampling of PicoScope channels via driver ring buffers'''
+
+  def __init__(self, picoDevice, PSmodel, channels, TSampling,
+               bufSize=2**20):
+    '''Args:
+         picoDevice: device object of pico-python, channels set up
+         PSmodel: PicoScope model, one of streamingModels
+         channels: list of active channels
+         TSampling: sampling interval (s)
+         bufSize: samples per channel in driver buffer
+    '''
+    self.picoDevice = picoDevice
+    self.channels = channels
+    self.TSampling = TSampling
+    self.bufSize = bufSize
+    # callback type of driver library
+    self.streamingReady = import_module('picoscope.ps' + PSmodel) \
+                            .streamingReady
+    self.bufs = np.empty([len(channels), bufSize], dtype=np.int16)
+    self.chunks = [] # data received in driver callback
+
+  def runStreaming(self):
+    '''start continuous sampling without driver trigger'''
+    for i, C in enumerate(self.channels):
+      self.picoDevice._lowLevelSetDataBuffer(self.picoDevice.CHANNELS[C],
+                                             self.bufs[i], 0, 0)
+    self.picoDevice._lowLevelRunStreaming(
+          int(round(self.TSampling * 1E12)),
+          self.picoDevice.TIME_UNITS['picoseconds'],
+          0, self.bufSize, 0, 1, 0, self.bufSize)
+     # pre-/post-trigger samples, no autoStop, no down-sampling
+    # keep reference to C callback as long as streaming
+    self.cReady = self.streamingReady(self.ready)
+
+  def ready(self, handle, noOfSamples, startIndex, overflow,
+            triggerAt, triggered, autoStop, pParameter):
+    '''driver callback, copy new samples from driver buffers'''
+    self.chunks.append(
+      self.bufs[:, startIndex:startIndex + noOfSamples].copy() )
+
+  def getStreamingLatestValues(self, callback):
+    '''pass samples acquired since last call to callback,
+         callback(data, nSkip), samples lost by the driver are not
+         reported (nSkip = 0)
+
+       Returns: number of samples
+    '''
+    try:
+      self.picoDevice._lowLevelGetStreamingLatestValues(self.cReady)
+    except IOError as e:
+      if 'PICO_BUSY' in str(e): return 0 # no data yet
+      raise
+    if not self.chunks: return 0
+    if len(self.chunks) == 1:
+      data = self.chunks[0]
+    else:
+      data = np.concatenate(self.chunks, axis=1)
+    self.chunks = []
+    callback(data, 0)
+    return data.shape[1]
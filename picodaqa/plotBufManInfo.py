@@ -7,6 +7,8 @@ from __future__ import unicode_literals
 import time, numpy as np
 import matplotlib.pyplot as plt
 
+from .History import History
+
 class plotBufManInfo(object):
   ''' display statistics from Buffer Manager
 
@@ -23,7 +25,7 @@ class plotBufManInfo(object):
     self.interval = interval/1000 # time between updates in s
 
     self.Npoints = 100  # number of history points
-    self.R = np.zeros(self.Npoints)
+    self.R = History(self.Npoints)
     self.xplt = np.linspace(-self.Npoints*self.interval, 0., self.Npoints)
 
   # create figure 
@@ -45,7 +47,7 @@ class plotBufManInfo(object):
     self.axrate.grid(True, alpha=0.5)
 
   def init(self):
-    self.line1, = self.axrate.plot(self.xplt, self.R, 
+    self.line1, = self.axrate.plot(self.xplt, self.R.view(), 
       marker = '.', markerfacecolor='b', linestyle='dashed', color='grey', )
     self.animtxt1 = self.axtext.text(0.015, 0.65 , ' ',
               transform=self.axtext.transAxes, color='darkblue')
@@ -60,16 +62,15 @@ class plotBufManInfo(object):
     if n == 0:
        self.init()
 
-    k = n%self.Npoints
-    try: 
+    try: # do not wait, status is reported twice per update interval
       RUNNING,TRun,Ntrig,Ttrig,Tlife,readrate,lifefrac,bufLevel = \
-                 self.Q.get(True, 0.5)
+                 self.Q.get(False)
     except:
       return self.line1, self.animtxt1, self.animtxt2  
  
-    self.R[k] = readrate
+    self.R.append(readrate)
       
-    self.line1.set_ydata(np.concatenate( (self.R[k+1:], self.R[:k+1]) ))
+    self.line1.set_ydata(self.R.view())
     if RUNNING:
       txtStat=''
     else:
@@ -7,6 +7,8 @@
 
 # ->>> code from here inserted as 'testDAQ.py' in runDAQ.py
 
+import multiprocessing as mp
+
 # import analysis code as library
 from exampleConsumers import *
 